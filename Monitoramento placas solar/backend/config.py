@@ -35,6 +35,12 @@ class Settings(BaseSettings):
     # Coleta de dados
     DATA_COLLECTION_INTERVAL: int = 60  # segundos
     DATA_RETENTION_DAYS: int = 365
+    ENERGY_MAX_GAP_SECONDS: int = 300  # lacuna máxima integrada entre amostras
+    
+    # Localização da usina (previsão de produção)
+    SITE_LATITUDE: float = -23.55   # graus (negativo = sul)
+    SITE_LONGITUDE: float = -46.63  # graus (negativo = oeste)
+    SITE_UTC_OFFSET: int = -3       # horas (horário local das tarifas)
     
     # Alertas
     ALERT_EMAIL_ENABLED: bool = False
@@ -56,6 +62,28 @@ class Settings(BaseSettings):
     # Cache
     REDIS_URL: str = "redis://localhost:6379/0"
     CACHE_TTL: int = 300  # segundos
+    ANALYTICS_CACHE_MAX_ENTRIES: int = 1024
+    ANALYTICS_CACHE_MAX_BYTES: int = 16 * 1024 * 1024  # bytes
+    
+    # Cálculo das análises em processos separados (0 = threads do processo da API)
+    COMPUTE_WORKERS: int = 2
+    COMPUTE_MAX_PENDING: int = 16
+    COMPUTE_TIMEOUT: int = 30  # segundos
+    ANALYTICS_PRECOMPUTE_HOUR: int = 1  # hora local do pré-cálculo diário do painel
+    
+    # Ingestão em lote de coletores remotos
+    INGEST_API_KEY: str = ""  # vazio = sem autenticação (header X-API-Key)
+    INGEST_MAX_BATCH: int = 50000  # amostras por lote
+    INGEST_MAX_BYTES: int = 32 * 1024 * 1024  # bytes (descompactado)
+    REMOTE_BATCH_SIZE: int = 5  # amostras por lote enviado pelo coletor remoto
+    
+    # Registro de alterações (sincronização incremental)
+    CHANGE_FEED_RETENTION_DAYS: int = 7
+    CHANGE_FEED_SETTLE_SECONDS: int = 10  # atraso até uma alteração ser entregue
+    CHANGE_FEED_PRUNE_HOUR: int = 3  # hora local da limpeza diária
+    
+    # Compressão das respostas (Brotli se o pacote estiver instalado, senão gzip)
+    COMPRESSION_MINIMUM_SIZE: int = 1024  # bytes
     
     # Logging
     LOG_LEVEL: str = "INFO"
@@ -114,15 +142,25 @@ EQUIPMENT_CONFIG = {
 }
 
 # Configurações de alarmes
+# Entradas com "field" são regras avaliadas em cada medição recebida:
+# alerta quando `field <condition> threshold` (valores nulos ou zero são
+# ignorados). Com "per_value", cada valor distinto (ex.: código de falha)
+# gera seu próprio alerta, com o código na mensagem.
 ALARM_CONFIG = {
     "low_production": {
         "enabled": True,
+        "field": "power_output",
+        "condition": "<",
         "threshold": 300,  # W (10% de 3000W)
+        "severity": "medium",
         "message": "Baixa produção de energia detectada"
     },
     "high_temperature": {
         "enabled": True,
+        "field": "temperature",
+        "condition": ">",
         "threshold": 70.0,  # °C
+        "severity": "high",
         "message": "Temperatura elevada no inversor"
     },
     "communication_error": {
@@ -132,6 +170,53 @@ ALARM_CONFIG = {
     },
     "fault_detected": {
         "enabled": True,
+        "field": "fault_code",
+        "condition": ">",
+        "threshold": 0,
+        "per_value": True,
+        "severity": "critical",
         "message": "Falha detectada no sistema"
+    },
+    "status_warning": {
+        "enabled": True,
+        "field": "status_code",
+        "condition": "!=",
+        "threshold": 1,  # 1 = operação normal
+        "per_value": True,
+        "severity": "medium",
+        "message": "Status anômalo do inversor"
+    }
+}
+
+# Tarifas de energia (R$/kWh) para análise financeira
+# Horários em hora local (SITE_UTC_OFFSET); dias da semana 0=segunda ... 6=domingo
+TARIFF_CONFIG = {
+    "default_tariff": "convencional",
+    "degradation_rate": 0.005,  # perda anual de produção dos módulos
+    "lifetime_years": 25,
+    "tariffs": {
+        "convencional": {
+            "description": "Tarifa convencional (preço único)",
+            "base_price": 0.65,
+            "periods": []
+        },
+        "branca": {
+            "description": "Tarifa branca (fora de ponta, intermediário e ponta)",
+            "base_price": 0.55,
+            "periods": [
+                {
+                    "name": "intermediario",
+                    "price": 0.80,
+                    "hours": [17, 21],
+                    "weekdays": [0, 1, 2, 3, 4]
+                },
+                {
+                    "name": "ponta",
+                    "price": 1.25,
+                    "hours": [18, 19, 20],
+                    "weekdays": [0, 1, 2, 3, 4]
+                }
+            ]
+        }
     }
 }
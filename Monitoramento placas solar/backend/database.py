@@ -6,6 +6,7 @@ from sqlalchemy import create_engine, MetaData
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
+from starlette.concurrency import run_in_threadpool
 import logging
 
 from .config import settings
@@ -35,15 +36,52 @@ else:
 # Metadata para migrações
 metadata = MetaData()
 
+# Índices que não puderam ser criados em init_db (nome)
+missing_indexes = set()
+
 async def init_db():
     """Inicializar banco de dados e criar tabelas"""
     try:
         from .models import Base
         Base.metadata.create_all(bind=engine)
+        # create_all não adiciona índices novos a tabelas já existentes
+        for table in Base.metadata.sorted_tables:
+            for index in table.indexes:
+                try:
+                    index.create(bind=engine, checkfirst=True)
+                except Exception as e:
+                    # Ex.: índice único sobre dados antigos com duplicatas
+                    missing_indexes.add(index.name)
+                    logger.warning(f"Índice {index.name} não criado: {e}")
         logger.info("Banco de dados inicializado com sucesso")
     except Exception as e:
         logger.error(f"Erro ao inicializar banco de dados: {e}")
         raise
+    
+    # Resumos antes de atender requisições: sem eles as análises veriam 0 kWh
+    await run_in_threadpool(restore_rollups)
+
+def restore_rollups():
+    """Completar os resumos (energia, eficiência, estatísticas) das medições gravadas
+    
+    Na primeira execução recalcula todo o histórico; depois, só o que foi
+    gravado desde o último resumo de cada inversor. Síncrono: roda numa
+    thread, fora do loop de eventos.
+    """
+    from .services.energy_accumulator import energy_accumulator
+    from .services.efficiency_stats import efficiency_accumulator
+    from .services.measurement_stats import measurement_stats
+    
+    db = SessionLocal()
+    try:
+        energy_accumulator.restore(db)
+        efficiency_accumulator.restore(db)
+        measurement_stats.restore(db)
+    except Exception as e:
+        logger.error(f"Erro ao retomar acumuladores: {e}")
+        db.rollback()
+    finally:
+        db.close()
 
 def get_db():
     """Dependency para obter sessão do banco de dados"""
@@ -13,17 +13,23 @@ from datetime import datetime, timedelta
 import logging
 
 from .config import settings
-from .database import init_db
+from .database import init_db, SessionLocal
 from .models import Base
 from .routers import (
     inverter_router,
     data_router,
     analytics_router,
     system_router,
-    alerts_router
+    alerts_router,
+    live_router
 )
 from .services.data_collector import DataCollectorService
 from .services.alert_service import AlertService
+from .services.alert_index import alert_index
+from .services.change_feed import prune_changes
+from .services.compute_service import compute_service
+from .services.report_scheduler import ReportScheduler
+from .services.compression import CompressionMiddleware
 
 # Configuração de logging
 logging.basicConfig(
@@ -35,11 +41,13 @@ logger = logging.getLogger(__name__)
 # Serviços globais
 data_collector = None
 alert_service = None
+report_scheduler = None
+change_feed_pruner = None
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Gerenciamento do ciclo de vida da aplicação"""
-    global data_collector, alert_service
+    global data_collector, alert_service, report_scheduler, change_feed_pruner
     
     # Inicialização
     logger.info("Inicializando sistema de monitoramento solar...")
@@ -48,20 +56,52 @@ async def lifespan(app: FastAPI):
     await init_db()
     logger.info("Banco de dados inicializado")
     
+    # Carregar os alertas ativos antes de atender requisições e ingestões
+    db = SessionLocal()
+    try:
+        alert_index.restore(db)
+    except Exception as e:
+        logger.error(f"Erro ao carregar índice de alertas ativos: {e}")
+    finally:
+        db.close()
+    
     # Inicializar serviços
     data_collector = DataCollectorService()
     alert_service = AlertService()
+    report_scheduler = ReportScheduler(
+        analytics_router.precompute_dashboard_reports,
+        hour=settings.ANALYTICS_PRECOMPUTE_HOUR,
+        utc_offset=settings.SITE_UTC_OFFSET
+    )
+    change_feed_pruner = ReportScheduler(
+        prune_changes,
+        hour=settings.CHANGE_FEED_PRUNE_HOUR,
+        utc_offset=settings.SITE_UTC_OFFSET,
+        name="Limpeza do registro de alterações"
+    )
+    await change_feed_pruner.start()
+    
+    # Iniciar coleta de dados em background; o pré-cálculo começa depois
+    # que os equipamentos forem registrados (os resumos já foram retomados
+    # em init_db)
+    async def start_background_services():
+        await data_collector.start_collection()
+        await report_scheduler.start()
     
-    # Iniciar coleta de dados em background
-    asyncio.create_task(data_collector.start_collection())
+    asyncio.create_task(start_background_services())
     logger.info("Coleta de dados iniciada")
     
     yield
     
     # Limpeza
     logger.info("Parando sistema de monitoramento...")
+    if report_scheduler:
+        await report_scheduler.stop()
+    if change_feed_pruner:
+        await change_feed_pruner.stop()
     if data_collector:
         await data_collector.stop_collection()
+    compute_service.shutdown()
     logger.info("Sistema parado")
 
 # Criar aplicação FastAPI
@@ -79,14 +119,19 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "ETag", "Last-Modified"],
 )
 
+# Compressão Brotli/gzip das respostas acima do tamanho mínimo
+app.add_middleware(CompressionMiddleware, minimum_size=settings.COMPRESSION_MINIMUM_SIZE)
+
 # Incluir routers
 app.include_router(inverter_router.router, prefix="/api/v1/inverters", tags=["inverters"])
 app.include_router(data_router.router, prefix="/api/v1/data", tags=["data"])
 app.include_router(analytics_router.router, prefix="/api/v1/analytics", tags=["analytics"])
 app.include_router(system_router.router, prefix="/api/v1/system", tags=["system"])
 app.include_router(alerts_router.router, prefix="/api/v1/alerts", tags=["alerts"])
+app.include_router(live_router.router, prefix="/ws", tags=["live"])
 
 # Servir arquivos estáticos (frontend)
 app.mount("/static", StaticFiles(directory="frontend/dist"), name="static")
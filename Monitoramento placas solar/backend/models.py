@@ -2,7 +2,7 @@
 Modelos de dados para o sistema de monitoramento solar
 """
 
-from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, Text, ForeignKey
+from sqlalchemy import Column, Integer, String, Float, DateTime, Boolean, Text, ForeignKey, UniqueConstraint, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 from datetime import datetime
@@ -53,6 +53,13 @@ class Logger(Base):
 class InverterMeasurement(Base):
     """Medições do inversor"""
     __tablename__ = "inverter_measurements"
+    __table_args__ = (
+        # Paginação por (timestamp, id), geral e por inversor
+        Index("ix_inverter_measurements_timestamp_id", "timestamp", "id"),
+        Index("ix_inverter_measurements_inverter_timestamp_id", "inverter_id", "timestamp", "id"),
+        # Uma medição por inversor e instante (ingestão em lote idempotente)
+        Index("uq_inverter_measurements_inverter_timestamp", "inverter_id", "timestamp", unique=True),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     inverter_id = Column(Integer, ForeignKey("inverters.id"))
@@ -87,6 +94,9 @@ class InverterMeasurement(Base):
 class LoggerMeasurement(Base):
     """Medições do logger"""
     __tablename__ = "logger_measurements"
+    __table_args__ = (
+        Index("ix_logger_measurements_timestamp_id", "timestamp", "id"),
+    )
     
     id = Column(Integer, primary_key=True, index=True)
     logger_id = Column(Integer, ForeignKey("loggers.id"))
@@ -185,6 +195,127 @@ class DailySummary(Base):
     # Relacionamentos
     inverter = relationship("Inverter")
 
+class HourlyEnergySummary(Base):
+    """Energia e tempo de operação por hora, acumulados na ingestão"""
+    __tablename__ = "hourly_energy_summaries"
+    __table_args__ = (
+        UniqueConstraint("inverter_id", "hour", name="uq_hourly_energy_inverter_hour"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    inverter_id = Column(Integer, ForeignKey("inverters.id"), index=True)
+    hour = Column(DateTime, index=True)  # Início da hora (UTC)
+    
+    # Integração trapezoidal da potência
+    energy_wh = Column(Float, default=0.0)         # Wh
+    producing_seconds = Column(Float, default=0.0) # Tempo com potência > 0
+    covered_seconds = Column(Float, default=0.0)   # Tempo coberto por amostras
+    
+    # Lacunas entre amostras (não integradas)
+    gap_count = Column(Integer, default=0)
+    gap_seconds = Column(Float, default=0.0)
+    
+    # Estatísticas das amostras de potência
+    sample_count = Column(Integer, default=0)
+    power_sum = Column(Float, default=0.0)
+    power_min = Column(Float, nullable=True)
+    power_max = Column(Float, nullable=True)
+    
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Relacionamentos
+    inverter = relationship("Inverter")
+
+class DailyEfficiencyStats(Base):
+    """Estatísticas de eficiência e temperatura por dia, acumuladas na ingestão"""
+    __tablename__ = "daily_efficiency_stats"
+    __table_args__ = (
+        UniqueConstraint("inverter_id", "day", name="uq_daily_efficiency_inverter_day"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    inverter_id = Column(Integer, ForeignKey("inverters.id"), index=True)
+    day = Column(DateTime, index=True)  # Início do dia (UTC)
+    
+    # Momentos da eficiência (Welford)
+    efficiency_count = Column(Integer, default=0)
+    efficiency_mean = Column(Float, default=0.0)
+    efficiency_m2 = Column(Float, default=0.0)
+    efficiency_min = Column(Float, nullable=True)
+    efficiency_max = Column(Float, nullable=True)
+    
+    # Pares temperatura x eficiência (co-momento para a correlação)
+    pair_count = Column(Integer, default=0)
+    temperature_mean = Column(Float, default=0.0)
+    temperature_m2 = Column(Float, default=0.0)
+    pair_efficiency_mean = Column(Float, default=0.0)
+    pair_efficiency_m2 = Column(Float, default=0.0)
+    comoment = Column(Float, default=0.0)
+    
+    # Histograma de eficiência por faixa fixa de temperatura (JSON)
+    temperature_bins = Column(Text)
+    
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Relacionamentos
+    inverter = relationship("Inverter")
+
+class DailyMeasurementStats(Base):
+    """Estatísticas diárias das medições (contagem, soma, extremos e quantis)"""
+    __tablename__ = "daily_measurement_stats"
+    __table_args__ = (
+        UniqueConstraint("inverter_id", "day", name="uq_daily_measurement_inverter_day"),
+    )
+    
+    id = Column(Integer, primary_key=True, index=True)
+    inverter_id = Column(Integer, ForeignKey("inverters.id"), index=True)
+    day = Column(DateTime, index=True)  # Início do dia (UTC)
+    
+    measurement_count = Column(Integer, default=0)
+    
+    # Potência (W)
+    power_count = Column(Integer, default=0)
+    power_sum = Column(Float, default=0.0)
+    power_min = Column(Float, nullable=True)
+    power_max = Column(Float, nullable=True)
+    power_sketch = Column(Text)  # Sketch de quantis (JSON)
+    
+    # Energia diária (kWh)
+    energy_count = Column(Integer, default=0)
+    energy_sum = Column(Float, default=0.0)
+    energy_min = Column(Float, nullable=True)
+    energy_max = Column(Float, nullable=True)
+    energy_sketch = Column(Text)  # Sketch de quantis (JSON)
+    
+    # Temperatura (°C)
+    temperature_count = Column(Integer, default=0)
+    temperature_sum = Column(Float, default=0.0)
+    temperature_min = Column(Float, nullable=True)
+    temperature_max = Column(Float, nullable=True)
+    temperature_sketch = Column(Text)  # Sketch de quantis (JSON)
+    
+    # Eficiência (%)
+    efficiency_count = Column(Integer, default=0)
+    efficiency_sum = Column(Float, default=0.0)
+    efficiency_min = Column(Float, nullable=True)
+    efficiency_max = Column(Float, nullable=True)
+    efficiency_sketch = Column(Text)  # Sketch de quantis (JSON)
+    
+    updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Relacionamentos
+    inverter = relationship("Inverter")
+
+class ChangeLog(Base):
+    """Registro sequencial das alterações para sincronização incremental"""
+    __tablename__ = "change_log"
+    
+    id = Column(Integer, primary_key=True, index=True)  # Sequência monotônica
+    entity = Column(String(30))     # measurement, alert, hourly_energy, daily_summary
+    entity_id = Column(Integer)
+    operation = Column(String(10))  # insert, update, delete
+    created_at = Column(DateTime, default=datetime.utcnow, index=True)
+
 class Configuration(Base):
     """Configurações do sistema"""
     __tablename__ = "configurations"
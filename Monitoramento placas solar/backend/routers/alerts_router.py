@@ -2,7 +2,7 @@
 Router para operações de alertas
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime, timedelta
@@ -16,10 +16,15 @@ from ..schemas.alert_schemas import (
     AlertStatistics,
     AlertUpdate
 )
+from ..services.data_versions import ALERTS, data_versions, is_not_modified
+from ..services.fast_json import SchemaColumns, rows_response
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+# Colunas das listagens de alertas (serializadas direto das linhas)
+ALERT_COLUMNS = SchemaColumns(Alert, AlertResponse)
+
 @router.get("/", response_model=List[AlertResponse])
 async def get_alerts(
     active_only: bool = Query(False),
@@ -30,7 +35,7 @@ async def get_alerts(
 ):
     """Obter lista de alertas"""
     try:
-        query = db.query(Alert)
+        query = ALERT_COLUMNS.query(db)
         
         if active_only:
             query = query.filter(Alert.resolved == False)
@@ -41,27 +46,35 @@ async def get_alerts(
         if alert_type:
             query = query.filter(Alert.alert_type == alert_type)
         
-        alerts = query\
+        rows = query\
             .order_by(Alert.timestamp.desc())\
             .limit(limit)\
             .all()
         
-        return alerts
+        return rows_response(ALERT_COLUMNS, rows)
         
     except Exception as e:
         logger.error(f"Erro ao obter alertas: {e}")
         raise HTTPException(status_code=500, detail="Erro interno do servidor")
 
 @router.get("/active", response_model=List[AlertResponse])
-async def get_active_alerts(db: Session = Depends(get_db)):
-    """Obter alertas ativos"""
+async def get_active_alerts(
+    if_none_match: Optional[str] = Header(None),
+    if_modified_since: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
+    """Obter alertas ativos (304 se nenhum alerta mudou desde o ETag)"""
     try:
-        alerts = db.query(Alert)\
+        headers = data_versions.headers(ALERTS)
+        if is_not_modified(headers, if_none_match, if_modified_since):
+            return Response(status_code=304, headers=headers)
+        
+        rows = ALERT_COLUMNS.query(db)\
             .filter(Alert.resolved == False)\
             .order_by(Alert.timestamp.desc())\
             .all()
         
-        return alerts
+        return rows_response(ALERT_COLUMNS, rows, headers)
         
     except Exception as e:
         logger.error(f"Erro ao obter alertas ativos: {e}")
@@ -1,28 +1,107 @@
 """
 Router para análises e relatórios
+
+As consultas ao banco das análises rodam no pool de threads
+(run_in_threadpool) e os cálculos numéricos no pool de processos
+(compute_service), para não bloquear o loop de eventos.
 """
 
 from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy.orm import Session
-from typing import List, Optional, Dict, Any
+from sqlalchemy import func, case, and_
+from typing import List, Optional, Dict, Any, Tuple
 from datetime import datetime, timedelta
 import logging
 import pandas as pd
 import numpy as np
 
+from ..config import TARIFF_CONFIG
 from ..database import get_db
-from ..models import InverterMeasurement, DailySummary, Alert
+from ..models import Inverter, InverterMeasurement, DailySummary, Alert, HourlyEnergySummary
 from ..schemas.analytics_schemas import (
     ProductionAnalysis,
     EfficiencyReport,
     PerformanceComparison,
+    PerformanceTrend,
     ForecastData
 )
+from ..services.analytics_cache import analytics_cache, cached_analytics
+from ..services.forecast_engine import forecast_engine, predict_power
+from ..services.financial_engine import financial_engine
+from ..services.efficiency_stats import efficiency_accumulator, efficiency_report
+from ..services.compute_service import compute_service, ComputeBusyError, ComputeTimeoutError
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+def _daily_production_rows(
+    db: Session,
+    start: datetime,
+    end: datetime,
+    inverter_id: Optional[int]
+) -> List[Dict[str, Any]]:
+    """Agregados de produção por dia em [start, end)
+    
+    Potência vem de um GROUP BY por data nas medições; energia e tempo de
+    operação vêm dos resumos horários acumulados na ingestão.
+    """
+    day = func.date(InverterMeasurement.timestamp).label("day")
+    query = db.query(
+        day,
+        func.max(InverterMeasurement.power_output),
+        func.sum(InverterMeasurement.power_output),
+        func.count(InverterMeasurement.power_output)
+    )
+    if inverter_id:
+        query = query.filter(InverterMeasurement.inverter_id == inverter_id)
+    
+    daily_rows = query\
+        .filter(InverterMeasurement.timestamp >= start)\
+        .filter(InverterMeasurement.timestamp < end)\
+        .filter(InverterMeasurement.power_output.isnot(None))\
+        .filter(InverterMeasurement.energy_daily.isnot(None))\
+        .group_by(day)\
+        .order_by(day)\
+        .all()
+    
+    energy_day = func.date(HourlyEnergySummary.hour).label("day")
+    energy_query = db.query(
+        energy_day,
+        func.sum(HourlyEnergySummary.energy_wh),
+        func.sum(HourlyEnergySummary.producing_seconds)
+    )
+    if inverter_id:
+        energy_query = energy_query.filter(HourlyEnergySummary.inverter_id == inverter_id)
+    
+    energy_rows = energy_query\
+        .filter(HourlyEnergySummary.hour >= start.replace(minute=0, second=0, microsecond=0))\
+        .filter(HourlyEnergySummary.hour < end)\
+        .group_by(energy_day)\
+        .all()
+    
+    # SQLite devolve a data como texto, PostgreSQL como date
+    def day_key(d):
+        return d.isoformat() if hasattr(d, "isoformat") else str(d)
+    
+    energy_by_day = {
+        day_key(d): (energy_wh or 0, producing_seconds or 0)
+        for d, energy_wh, producing_seconds in energy_rows
+    }
+    return [
+        {
+            "date": day_key(d),
+            "peak_power": peak,
+            "power_sum": power_sum,
+            "measurements": count,
+            "energy_wh": energy_by_day.get(day_key(d), (0, 0))[0],
+            "producing_seconds": energy_by_day.get(day_key(d), (0, 0))[1]
+        }
+        for d, peak, power_sum, count in daily_rows
+    ]
+
 @router.get("/production-analysis", response_model=ProductionAnalysis)
+@cached_analytics("production-analysis")
 async def get_production_analysis(
     days: int = Query(30, le=365),
     inverter_id: Optional[int] = Query(None),
@@ -30,43 +109,20 @@ async def get_production_analysis(
 ):
     """Análise detalhada da produção de energia"""
     try:
-        start_date = datetime.utcnow() - timedelta(days=days)
-        
-        query = db.query(InverterMeasurement)
-        if inverter_id:
-            query = query.filter(InverterMeasurement.inverter_id == inverter_id)
-        
-        measurements = query\
-            .filter(InverterMeasurement.timestamp >= start_date)\
-            .order_by(InverterMeasurement.timestamp.asc())\
-            .all()
-        
-        if not measurements:
-            return ProductionAnalysis(
-                period_days=days,
-                total_energy=0,
-                average_daily_energy=0,
-                peak_power=0,
-                average_power=0,
-                production_efficiency=0,
-                operating_hours=0,
-                best_day=None,
-                worst_day=None
-            )
-        
-        # Converter para DataFrame para análise
-        data = []
-        for m in measurements:
-            if m.power_output is not None and m.energy_daily is not None:
-                data.append({
-                    'timestamp': m.timestamp,
-                    'power': m.power_output,
-                    'energy': m.energy_daily,
-                    'temperature': m.temperature or 0,
-                    'efficiency': m.efficiency or 0
-                })
+        now = datetime.utcnow()
+        start_date = now - timedelta(days=days)
+        
+        # Dias encerrados vêm do cache; só o primeiro e o dia atual são consultados
+        daily_production = await run_in_threadpool(
+            analytics_cache.get_daily_rows,
+            "production-analysis",
+            inverter_id,
+            start_date,
+            now,
+            lambda range_start, range_end: _daily_production_rows(db, range_start, range_end, inverter_id)
+        )
         
-        if not data:
+        if not daily_production:
             return ProductionAnalysis(
                 period_days=days,
                 total_energy=0,
@@ -79,26 +135,20 @@ async def get_production_analysis(
                 worst_day=None
             )
         
-        df = pd.DataFrame(data)
-        df['date'] = pd.to_datetime(df['timestamp']).dt.date
-        
-        # Calcular métricas
-        total_energy = df['energy'].max() - df['energy'].min()
-        peak_power = df['power'].max()
-        average_power = df['power'].mean()
+        # Calcular métricas (energia integrada na ingestão, em kWh)
+        total_energy = sum(d["energy_wh"] for d in daily_production) / 1000
+        peak_power = max(d["peak_power"] for d in daily_production)
+        average_power = sum(d["power_sum"] for d in daily_production) / \
+            sum(d["measurements"] for d in daily_production)
         
-        # Produção diária
-        daily_production = df.groupby('date')['power'].agg(['max', 'mean', 'count']).reset_index()
-        daily_production.columns = ['date', 'peak_power', 'avg_power', 'measurements']
+        average_daily_energy = total_energy / len(daily_production)
         
-        average_daily_energy = daily_production['peak_power'].mean()
-        
-        # Horas de funcionamento (assumindo que há produção quando power > 0)
-        operating_hours = len(df[df['power'] > 0]) * 1  # Assumindo medições a cada minuto
+        # Horas de funcionamento (tempo com potência > 0, qualquer amostragem)
+        operating_hours = sum(d["producing_seconds"] for d in daily_production) / 3600
         
         # Melhor e pior dia
-        best_day = daily_production.loc[daily_production['peak_power'].idxmax(), 'date'].isoformat()
-        worst_day = daily_production.loc[daily_production['peak_power'].idxmin(), 'date'].isoformat()
+        best_day = max(daily_production, key=lambda d: d["peak_power"])["date"]
+        worst_day = min(daily_production, key=lambda d: d["peak_power"])["date"]
         
         # Eficiência de produção
         production_efficiency = (average_power / peak_power * 100) if peak_power > 0 else 0
@@ -110,7 +160,7 @@ async def get_production_analysis(
             peak_power=round(peak_power, 2),
             average_power=round(average_power, 2),
             production_efficiency=round(production_efficiency, 2),
-            operating_hours=round(operating_hours / 60, 1),  # Converter para horas
+            operating_hours=round(operating_hours, 1),
             best_day=best_day,
             worst_day=worst_day
         )
@@ -120,6 +170,7 @@ async def get_production_analysis(
         raise HTTPException(status_code=500, detail="Erro interno do servidor")
 
 @router.get("/efficiency-report", response_model=EfficiencyReport)
+@cached_analytics("efficiency-report")
 async def get_efficiency_report(
     days: int = Query(30, le=365),
     inverter_id: Optional[int] = Query(None),
@@ -129,17 +180,10 @@ async def get_efficiency_report(
     try:
         start_date = datetime.utcnow() - timedelta(days=days)
         
-        query = db.query(InverterMeasurement)
-        if inverter_id:
-            query = query.filter(InverterMeasurement.inverter_id == inverter_id)
-        
-        measurements = query\
-            .filter(InverterMeasurement.timestamp >= start_date)\
-            .filter(InverterMeasurement.efficiency.isnot(None))\
-            .order_by(InverterMeasurement.timestamp.asc())\
-            .all()
+        # Estados diários acumulados na ingestão, combinados por dia
+        daily = await run_in_threadpool(efficiency_accumulator.load_days, db, start_date, inverter_id)
         
-        if not measurements:
+        if not daily["efficiency_count"].sum():
             return EfficiencyReport(
                 period_days=days,
                 average_efficiency=0,
@@ -150,80 +194,127 @@ async def get_efficiency_report(
                 optimal_conditions=None
             )
         
-        # Converter para DataFrame
-        data = []
-        for m in measurements:
-            if m.efficiency is not None:
-                data.append({
-                    'timestamp': m.timestamp,
-                    'efficiency': m.efficiency,
-                    'temperature': m.temperature or 0,
-                    'power': m.power_output or 0
-                })
-        
-        df = pd.DataFrame(data)
-        
-        # Calcular métricas de eficiência
-        average_efficiency = df['efficiency'].mean()
-        peak_efficiency = df['efficiency'].max()
-        min_efficiency = df['efficiency'].min()
-        
-        # Tendência de eficiência
-        df['date'] = pd.to_datetime(df['timestamp']).dt.date
-        daily_efficiency = df.groupby('date')['efficiency'].mean()
-        
-        if len(daily_efficiency) > 7:
-            # Calcular tendência dos últimos 7 dias
-            recent_trend = daily_efficiency.tail(7)
-            if len(recent_trend) > 1:
-                trend_slope = np.polyfit(range(len(recent_trend)), recent_trend.values, 1)[0]
-                if trend_slope > 0.5:
-                    efficiency_trend = "improving"
-                elif trend_slope < -0.5:
-                    efficiency_trend = "declining"
-                else:
-                    efficiency_trend = "stable"
-            else:
-                efficiency_trend = "stable"
-        else:
-            efficiency_trend = "stable"
-        
-        # Impacto da temperatura na eficiência
-        if len(df) > 10:
-            correlation = df['efficiency'].corr(df['temperature'])
-            temperature_impact = abs(correlation) * 100
-        else:
-            temperature_impact = 0
-        
-        # Condições ótimas
-        optimal_temp_range = None
-        if len(df) > 0:
-            # Encontrar faixa de temperatura com melhor eficiência
-            temp_bins = pd.cut(df['temperature'], bins=5)
-            efficiency_by_temp = df.groupby(temp_bins)['efficiency'].mean()
-            best_temp_bin = efficiency_by_temp.idxmax()
-            if pd.notna(best_temp_bin):
-                optimal_temp_range = {
-                    "min_temp": best_temp_bin.left,
-                    "max_temp": best_temp_bin.right,
-                    "avg_efficiency": efficiency_by_temp[best_temp_bin]
-                }
-        
-        return EfficiencyReport(
-            period_days=days,
-            average_efficiency=round(average_efficiency, 2),
-            peak_efficiency=round(peak_efficiency, 2),
-            min_efficiency=round(min_efficiency, 2),
-            efficiency_trend=efficiency_trend,
-            temperature_impact=round(temperature_impact, 2),
-            optimal_conditions=optimal_temp_range
+        # Métricas calculadas no pool de processos (fora do loop de eventos)
+        report = await compute_service.run(
+            efficiency_report,
+            daily,
+            key=("efficiency-report", days, inverter_id)
         )
+        return EfficiencyReport(period_days=days, **report)
         
+    except ComputeBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ComputeTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         logger.error(f"Erro no relatório de eficiência: {e}")
         raise HTTPException(status_code=500, detail="Erro interno do servidor")
 
+def _period_metrics(
+    db: Session,
+    periods: List[Tuple[datetime, datetime]],
+    inverter_id: Optional[int]
+) -> List[Dict[str, Any]]:
+    """Métricas de N períodos [início, fim) numa única consulta agregada
+    
+    Cada medição é classificada no seu período por um CASE e o GROUP BY
+    devolve uma linha por período.
+    """
+    period = case(
+        *[
+            (and_(InverterMeasurement.timestamp >= start, InverterMeasurement.timestamp < end), index)
+            for index, (start, end) in enumerate(periods)
+        ],
+        else_=None
+    ).label("period")
+    power = InverterMeasurement.power_output
+    efficiency = InverterMeasurement.efficiency
+    
+    query = db.query(
+        period,
+        func.sum(power),
+        func.count(power),
+        func.max(power),
+        func.sum(efficiency),
+        func.count(efficiency)
+    )
+    if inverter_id:
+        query = query.filter(InverterMeasurement.inverter_id == inverter_id)
+    
+    rows = query\
+        .filter(InverterMeasurement.timestamp >= min(start for start, _ in periods))\
+        .filter(InverterMeasurement.timestamp < max(end for _, end in periods))\
+        .filter(period.isnot(None))\
+        .group_by(period)\
+        .all()
+    
+    # Energia e tempo de operação a partir dos resumos horários
+    hour = HourlyEnergySummary.hour
+    energy_period = case(
+        *[
+            (and_(hour >= start.replace(minute=0, second=0, microsecond=0), hour < end), index)
+            for index, (start, end) in enumerate(periods)
+        ],
+        else_=None
+    ).label("period")
+    energy_query = db.query(
+        energy_period,
+        func.sum(HourlyEnergySummary.energy_wh),
+        func.sum(HourlyEnergySummary.producing_seconds)
+    )
+    if inverter_id:
+        energy_query = energy_query.filter(HourlyEnergySummary.inverter_id == inverter_id)
+    
+    energy_by_period = {
+        index: (energy_wh or 0, producing_seconds or 0)
+        for index, energy_wh, producing_seconds in energy_query
+            .filter(energy_period.isnot(None))
+            .group_by(energy_period)
+            .all()
+    }
+    
+    metrics = [
+        {
+            "total_energy": 0,
+            "average_power": 0,
+            "peak_power": 0,
+            "average_efficiency": 0,
+            "operating_hours": 0
+        }
+        for _ in periods
+    ]
+    for index, power_sum, power_count, peak_power, efficiency_sum, efficiency_count in rows:
+        average_power = power_sum / power_count if power_count else 0
+        average_efficiency = efficiency_sum / efficiency_count if efficiency_count else 0
+        energy_wh, producing_seconds = energy_by_period.get(index, (0, 0))
+        operating_hours = producing_seconds / 3600
+        metrics[index] = {
+            "total_energy": round(energy_wh / 1000, 2),
+            "average_power": round(average_power, 2),
+            "peak_power": round(peak_power or 0, 2),
+            "average_efficiency": round(average_efficiency, 2),
+            "operating_hours": round(operating_hours, 1)
+        }
+    return metrics
+
+def _calculate_change(current, previous):
+    """Diferença percentual entre dois valores"""
+    if previous == 0:
+        return 0 if current == 0 else 100
+    return round(((current - previous) / previous) * 100, 2)
+
+def _metrics_changes(current: Dict[str, Any], previous: Dict[str, Any]) -> Dict[str, float]:
+    """Variações percentuais entre as métricas de dois períodos"""
+    return {
+        "energy_change": _calculate_change(current["total_energy"], previous["total_energy"]),
+        "power_change": _calculate_change(current["average_power"], previous["average_power"]),
+        "peak_power_change": _calculate_change(current["peak_power"], previous["peak_power"]),
+        "efficiency_change": _calculate_change(current["average_efficiency"], previous["average_efficiency"]),
+        "operating_hours_change": _calculate_change(current["operating_hours"], previous["operating_hours"])
+    }
+
 @router.get("/performance-comparison", response_model=PerformanceComparison)
+@cached_analytics("performance-comparison")
 async def get_performance_comparison(
     period1_days: int = Query(30),
     period2_days: int = Query(30),
@@ -237,57 +328,13 @@ async def get_performance_comparison(
         period2_start = now - timedelta(days=period1_days + period2_days)
         period2_end = period1_start
         
-        query = db.query(InverterMeasurement)
-        if inverter_id:
-            query = query.filter(InverterMeasurement.inverter_id == inverter_id)
-        
-        # Período 1 (mais recente)
-        period1_data = query\
-            .filter(InverterMeasurement.timestamp >= period1_start)\
-            .filter(InverterMeasurement.timestamp < now)\
-            .all()
-        
-        # Período 2 (anterior)
-        period2_data = query\
-            .filter(InverterMeasurement.timestamp >= period2_start)\
-            .filter(InverterMeasurement.timestamp < period2_end)\
-            .all()
-        
-        def calculate_metrics(measurements):
-            if not measurements:
-                return {
-                    "total_energy": 0,
-                    "average_power": 0,
-                    "peak_power": 0,
-                    "average_efficiency": 0,
-                    "operating_hours": 0
-                }
-            
-            power_values = [m.power_output for m in measurements if m.power_output is not None]
-            efficiency_values = [m.efficiency for m in measurements if m.efficiency is not None]
-            
-            total_energy = max([m.energy_daily for m in measurements if m.energy_daily is not None], default=0)
-            average_power = sum(power_values) / len(power_values) if power_values else 0
-            peak_power = max(power_values) if power_values else 0
-            average_efficiency = sum(efficiency_values) / len(efficiency_values) if efficiency_values else 0
-            operating_hours = len([m for m in measurements if m.power_output and m.power_output > 0]) / 60  # Assumindo medições por minuto
-            
-            return {
-                "total_energy": round(total_energy, 2),
-                "average_power": round(average_power, 2),
-                "peak_power": round(peak_power, 2),
-                "average_efficiency": round(average_efficiency, 2),
-                "operating_hours": round(operating_hours, 1)
-            }
-        
-        period1_metrics = calculate_metrics(period1_data)
-        period2_metrics = calculate_metrics(period2_data)
-        
-        # Calcular diferenças percentuais
-        def calculate_change(current, previous):
-            if previous == 0:
-                return 0 if current == 0 else 100
-            return round(((current - previous) / previous) * 100, 2)
+        # Período 1 (mais recente) e período 2 (anterior) numa única consulta
+        period1_metrics, period2_metrics = await run_in_threadpool(
+            _period_metrics,
+            db,
+            [(period1_start, now), (period2_start, period2_end)],
+            inverter_id
+        )
         
         return PerformanceComparison(
             period1={
@@ -302,41 +349,76 @@ async def get_performance_comparison(
                 "end_date": period2_end.date().isoformat(),
                 **period2_metrics
             },
-            comparison={
-                "energy_change": calculate_change(period1_metrics["total_energy"], period2_metrics["total_energy"]),
-                "power_change": calculate_change(period1_metrics["average_power"], period2_metrics["average_power"]),
-                "peak_power_change": calculate_change(period1_metrics["peak_power"], period2_metrics["peak_power"]),
-                "efficiency_change": calculate_change(period1_metrics["average_efficiency"], period2_metrics["average_efficiency"]),
-                "operating_hours_change": calculate_change(period1_metrics["operating_hours"], period2_metrics["operating_hours"])
-            }
+            comparison=_metrics_changes(period1_metrics, period2_metrics)
         )
         
     except Exception as e:
         logger.error(f"Erro na comparação de performance: {e}")
         raise HTTPException(status_code=500, detail="Erro interno do servidor")
 
+@router.get("/performance-trend", response_model=PerformanceTrend)
+@cached_analytics("performance-trend")
+async def get_performance_trend(
+    period_days: int = Query(30, ge=1, le=365),
+    periods: int = Query(12, ge=2, le=120),
+    inverter_id: Optional[int] = Query(None),
+    db: Session = Depends(get_db)
+):
+    """Métricas de N períodos consecutivos (ex.: mês a mês no último ano)"""
+    try:
+        now = datetime.utcnow()
+        
+        # Períodos em ordem cronológica, o último terminando agora
+        boundaries = [
+            (
+                now - timedelta(days=period_days * (periods - index)),
+                now - timedelta(days=period_days * (periods - index - 1))
+            )
+            for index in range(periods)
+        ]
+        metrics = await run_in_threadpool(_period_metrics, db, boundaries, inverter_id)
+        
+        results = []
+        for index, ((start, end), period_metrics) in enumerate(zip(boundaries, metrics)):
+            results.append({
+                "start_date": start.date().isoformat(),
+                "end_date": end.date().isoformat(),
+                **period_metrics,
+                "changes": _metrics_changes(period_metrics, metrics[index - 1]) if index > 0 else None
+            })
+        
+        return PerformanceTrend(
+            period_days=period_days,
+            periods=results
+        )
+        
+    except Exception as e:
+        logger.error(f"Erro na tendência de performance: {e}")
+        raise HTTPException(status_code=500, detail="Erro interno do servidor")
+
+def _forecast_confidence(history_days: float) -> str:
+    """Confiança da previsão a partir do histórico disponível"""
+    if history_days >= 14:
+        return "high"
+    if history_days >= 3:
+        return "medium"
+    return "low"
+
 @router.get("/forecast", response_model=ForecastData)
+@cached_analytics("forecast")
 async def get_production_forecast(
-    days_ahead: int = Query(7, le=30),
+    days_ahead: int = Query(7, ge=1, le=30),
     inverter_id: Optional[int] = Query(None),
+    hourly: bool = Query(False),
     db: Session = Depends(get_db)
 ):
     """Previsão de produção de energia"""
     try:
-        # Obter dados históricos dos últimos 30 dias
-        start_date = datetime.utcnow() - timedelta(days=30)
+        # Atualizar o índice de céu claro com as medições novas
+        fits = await run_in_threadpool(forecast_engine.refit, db, [inverter_id] if inverter_id else None)
+        fits = {key: fit for key, fit in fits.items() if fit.samples >= 7}
         
-        query = db.query(InverterMeasurement)
-        if inverter_id:
-            query = query.filter(InverterMeasurement.inverter_id == inverter_id)
-        
-        measurements = query\
-            .filter(InverterMeasurement.timestamp >= start_date)\
-            .filter(InverterMeasurement.power_output.isnot(None))\
-            .order_by(InverterMeasurement.timestamp.asc())\
-            .all()
-        
-        if len(measurements) < 7:
+        if not fits:
             return ForecastData(
                 forecast_days=days_ahead,
                 confidence="low",
@@ -344,77 +426,81 @@ async def get_production_forecast(
                 methodology="insufficient_data"
             )
         
-        # Converter para DataFrame
-        data = []
-        for m in measurements:
-            data.append({
-                'timestamp': m.timestamp,
-                'power': m.power_output,
-                'date': m.timestamp.date()
-            })
-        
-        df = pd.DataFrame(data)
-        
-        # Calcular média diária histórica
-        daily_avg = df.groupby('date')['power'].mean()
+        # Previsão horária de todos os inversores em lote
+        base_date = datetime.utcnow().date() + timedelta(days=1)
+        index, rated = forecast_engine.fit_arrays(fits)
+        forecast = await compute_service.run(
+            predict_power,
+            index,
+            rated,
+            base_date,
+            days_ahead,
+            forecast_engine.latitude,
+            forecast_engine.longitude,
+            key=("forecast", base_date, days_ahead, inverter_id)
+        )
         
-        # Previsão simples baseada na média dos últimos dias
-        recent_avg = daily_avg.tail(7).mean()  # Últimos 7 dias
+        # Totais da usina (soma dos inversores)
+        power = forecast["power"].sum(axis=0).reshape(days_ahead, 24)
+        daily_energy = forecast["daily_energy"].sum(axis=0)
+        confidence = _forecast_confidence(min(fit.history_days() for fit in fits.values()))
         
-        # Gerar previsões
         predictions = []
-        base_date = datetime.utcnow().date()
-        
-        for i in range(1, days_ahead + 1):
-            forecast_date = base_date + timedelta(days=i)
-            
-            # Ajuste sazonal simples (assumindo variação de ±20%)
-            seasonal_factor = 1.0
-            if forecast_date.month in [12, 1, 2]:  # Verão no Brasil
-                seasonal_factor = 1.2
-            elif forecast_date.month in [6, 7, 8]:  # Inverno no Brasil
-                seasonal_factor = 0.8
-            
-            predicted_power = recent_avg * seasonal_factor
-            
-            predictions.append({
-                "date": forecast_date.isoformat(),
-                "predicted_power": round(predicted_power, 2),
-                "confidence": "medium" if len(measurements) > 14 else "low"
-            })
+        for i in range(days_ahead):
+            prediction = {
+                "date": (base_date + timedelta(days=i)).isoformat(),
+                "predicted_power": round(float(power[i].mean()), 2),
+                "predicted_peak_power": round(float(power[i].max()), 2),
+                "predicted_energy": round(float(daily_energy[i]), 2),
+                "confidence": confidence
+            }
+            if hourly:
+                prediction["hourly_power"] = [round(float(value), 1) for value in power[i]]
+            predictions.append(prediction)
         
         return ForecastData(
             forecast_days=days_ahead,
-            confidence="medium" if len(measurements) > 14 else "low",
+            confidence=confidence,
             predictions=predictions,
-            methodology="historical_average_with_seasonal_adjustment"
+            methodology="clear_sky_index_haurwitz"
         )
         
+    except ComputeBusyError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except ComputeTimeoutError as e:
+        raise HTTPException(status_code=504, detail=str(e))
     except Exception as e:
         logger.error(f"Erro na previsão: {e}")
         raise HTTPException(status_code=500, detail="Erro interno do servidor")
 
 @router.get("/roi-analysis")
+@cached_analytics("roi-analysis")
 async def get_roi_analysis(
     system_cost: float = Query(15000),  # Custo do sistema em reais
-    energy_price: float = Query(0.65),  # Preço da energia em R$/kWh
+    energy_price: Optional[float] = Query(None),  # Preço único em R$/kWh (substitui a tarifa)
+    tariff: Optional[str] = Query(None),  # Tarifa de TARIFF_CONFIG (padrão: default_tariff)
+    degradation_rate: Optional[float] = Query(None, ge=0, lt=1),  # Perda anual de produção
+    inverter_id: Optional[int] = Query(None),
     db: Session = Depends(get_db)
 ):
     """Análise de retorno sobre investimento (ROI)"""
     try:
-        # Obter dados dos últimos 365 dias
-        start_date = datetime.utcnow() - timedelta(days=365)
-        
-        measurements = db.query(InverterMeasurement)\
-            .filter(InverterMeasurement.timestamp >= start_date)\
-            .filter(InverterMeasurement.energy_daily.isnot(None))\
-            .order_by(InverterMeasurement.timestamp.asc())\
-            .all()
+        # Produção e economia dos últimos 365 dias (cache por inversor e tarifa)
+        summary = await run_in_threadpool(
+            financial_engine.annual_summary,
+            db,
+            tariff_name=tariff,
+            flat_price=energy_price,
+            inverter_id=inverter_id,
+            degradation_rate=degradation_rate
+        )
+        tariff_name = "flat" if energy_price is not None else (tariff or TARIFF_CONFIG["default_tariff"])
         
-        if not measurements:
+        if summary["annual_production"] <= 0:
             return {
                 "system_cost": system_cost,
-                "energy_price": energy_price,
+                "energy_price": energy_price or 0,
+                "tariff": tariff_name,
                 "annual_production": 0,
                 "annual_savings": 0,
                 "payback_period_years": 0,
@@ -422,33 +508,79 @@ async def get_roi_analysis(
                 "lifetime_savings": 0
             }
         
-        # Calcular produção anual
-        total_energy = max([m.energy_daily for m in measurements if m.energy_daily is not None], default=0)
-        annual_production = total_energy  # kWh
-        
-        # Calcular economia anual
-        annual_savings = annual_production * energy_price
-        
-        # Calcular período de payback
-        payback_period = system_cost / annual_savings if annual_savings > 0 else 0
-        
-        # Calcular ROI em 10 anos
-        savings_10_years = annual_savings * 10
-        roi_10_years = ((savings_10_years - system_cost) / system_cost) * 100 if system_cost > 0 else 0
-        
-        # Economia ao longo da vida útil (25 anos)
-        lifetime_savings = annual_savings * 25 - system_cost
+        # Payback, ROI e saldo na vida útil com degradação (sem reler dados)
+        returns = financial_engine.payback(summary, system_cost)
+        payback_period = returns["payback_period_years"]
         
         return {
             "system_cost": system_cost,
-            "energy_price": energy_price,
-            "annual_production": round(annual_production, 2),
-            "annual_savings": round(annual_savings, 2),
-            "payback_period_years": round(payback_period, 1),
-            "roi_10_years": round(roi_10_years, 1),
-            "lifetime_savings": round(lifetime_savings, 2)
+            "energy_price": round(summary["average_price"], 4),
+            "tariff": tariff_name,
+            "degradation_rate": summary["degradation_rate"],
+            "annual_production": round(summary["annual_production"], 2),
+            "annual_savings": round(summary["annual_savings"], 2),
+            "energy_by_period": {
+                name: {"energy": round(values["energy"], 2), "savings": round(values["savings"], 2)}
+                for name, values in summary["energy_by_period"].items()
+            },
+            "payback_period_years": round(payback_period, 1) if payback_period is not None else None,
+            "roi_10_years": round(returns["roi_10_years"], 1),
+            "lifetime_savings": round(returns["lifetime_savings"], 2),
+            "cumulative_savings": [round(float(v), 2) for v in summary["cumulative_savings"]]
         }
         
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Erro na análise de ROI: {e}")
         raise HTTPException(status_code=500, detail="Erro interno do servidor")
+
+# Janela padrão da análise de produção do painel
+DASHBOARD_PRODUCTION_DAYS = 30
+
+def precompute_dashboard_reports(db: Session) -> int:
+    """Pré-calcular as partes estáveis das análises do painel
+    
+    Para a usina e cada inversor, aquece:
+    - os agregados de dias encerrados da análise de produção (guardados
+      sem expiração);
+    - a série horária do último ano e o resumo anual da tarifa padrão,
+      usados pela análise de ROI;
+    - o ajuste de céu claro da previsão.
+    
+    O relatório de eficiência e a comparação de desempenho leem direto os
+    resumos diários e horários mantidos na ingestão; não há o que aquecer.
+    As respostas em si não são guardadas: a chave de cached_analytics muda a
+    cada medição nova e as janelas dependem do instante da requisição, que
+    agrega na hora sobre as partes já calculadas. Síncrona; o agendador a
+    executa numa thread, fora do loop de eventos.
+    """
+    inverter_ids = [row[0] for row in db.query(Inverter.id).all()]
+    now = datetime.utcnow()
+    start = now - timedelta(days=DASHBOARD_PRODUCTION_DAYS)
+    count = 0
+    for inverter_id in [None] + inverter_ids:
+        try:
+            analytics_cache.get_daily_rows(
+                "production-analysis",
+                inverter_id,
+                start,
+                now,
+                lambda range_start, range_end, inverter_id=inverter_id: _daily_production_rows(
+                    db, range_start, range_end, inverter_id
+                )
+            )
+            count += 1
+        except Exception as e:
+            logger.warning(f"Pré-cálculo da análise de produção (inversor {inverter_id}) falhou: {e}")
+        try:
+            financial_engine.annual_summary(db, inverter_id=inverter_id)
+            count += 1
+        except Exception as e:
+            logger.warning(f"Pré-cálculo da análise de ROI (inversor {inverter_id}) falhou: {e}")
+    
+    try:
+        count += len(forecast_engine.refit(db))
+    except Exception as e:
+        logger.warning(f"Pré-cálculo do ajuste da previsão falhou: {e}")
+    return count
@@ -2,64 +2,127 @@
 Router para operações de dados e medições
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Request, Response
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import Dict, List, Optional
 from datetime import datetime, timedelta
 import logging
+import secrets
+import zlib
+import numpy as np
 
+from ..config import settings
 from ..database import get_db
-from ..models import InverterMeasurement, LoggerMeasurement, DailySummary
+from ..models import InverterMeasurement, LoggerMeasurement, DailySummary, HourlyEnergySummary
 from ..schemas.data_schemas import (
     MeasurementResponse,
+    MeasurementSeries,
+    AggregateSeries,
+    ChangeFeed,
     DailySummaryResponse,
-    DataStatistics
+    DataStatistics,
+    IngestResult
+)
+from ..services.measurement_loader import MEASUREMENT_FIELDS, KEY_FIELDS, load_measurement_columns
+from ..services.downsampling import DOWNSAMPLING_METHODS, downsample
+from ..services.aggregation import aggregate_measurements, parse_aggregates, parse_bucket, parse_fields
+from ..services.change_feed import (
+    MAX_CHANGES, ChangeFeedExpiredError, decode_token, encode_token, parse_entities, read_changes
+)
+from ..services.data_export import ARROW_FORMATS, EXPORT_FORMATS, export_columns, export_measurements, parquet_available
+from ..services.pagination import paginate
+from ..services.measurement_stats import measurement_stats
+from ..services.live_broker import live_broker, parse_inverter_ids
+from ..services.fast_json import BINARY_RESPONSES, JSON_MEDIA_TYPE, SchemaColumns, dumps, rows_response
+from ..services.data_versions import (
+    INVERTER_MEASUREMENTS,
+    LOGGER_MEASUREMENTS,
+    data_versions,
+    is_not_modified
+)
+from ..services.bulk_ingest import (
+    INGEST_CONTENT_TYPES,
+    decompress,
+    ingest_batch,
+    msgpack_available,
+    parse_batch,
+    validate_batch
 )
 
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
-@router.get("/measurements", response_model=List[MeasurementResponse])
+# Intervalo dos comentários de keep-alive do stream SSE
+LIVE_HEARTBEAT_SECONDS = 15
+
+# Colunas das listagens de medições (serializadas direto das linhas)
+MEASUREMENT_COLUMNS = {
+    InverterMeasurement: SchemaColumns(InverterMeasurement, MeasurementResponse),
+    LoggerMeasurement: SchemaColumns(LoggerMeasurement, MeasurementResponse),
+}
+
+@router.get("/measurements", response_model=List[MeasurementResponse], responses=BINARY_RESPONSES)
 async def get_measurements(
     start_time: Optional[datetime] = Query(None),
     end_time: Optional[datetime] = Query(None),
     equipment_type: Optional[str] = Query(None),  # "inverter" ou "logger"
     limit: int = Query(100, le=1000),
+    cursor: Optional[str] = Query(None),  # valor de X-Next-Cursor da página anterior
+    order: str = Query("desc"),  # "desc" (mais recentes primeiro) ou "asc"
+    fields: Optional[str] = Query(None),  # ex.: "timestamp,power_output"
+    accept: Optional[str] = Header(None),
     db: Session = Depends(get_db)
 ):
-    """Obter medições dos equipamentos"""
+    """Obter medições dos equipamentos
+    
+    Paginação por cursor: o cabeçalho X-Next-Cursor traz o cursor da
+    próxima página (ausente na última). Accept com Arrow IPC ou
+    MessagePack devolve os mesmos dados em formato binário. `fields`
+    limita as colunas consultadas e devolvidas.
+    """
     try:
-        if equipment_type == "inverter":
-            query = db.query(InverterMeasurement)
-        elif equipment_type == "logger":
-            query = db.query(LoggerMeasurement)
+        if equipment_type == "logger":
+            model = LoggerMeasurement
         else:
-            # Retornar ambos os tipos (implementação simplificada)
-            query = db.query(InverterMeasurement)
+            # Inversor (padrão)
+            model = InverterMeasurement
+        columns = MEASUREMENT_COLUMNS[model].project(fields)
+        query = columns.query(db)
         
         if start_time:
-            query = query.filter(InverterMeasurement.timestamp >= start_time)
+            query = query.filter(model.timestamp >= start_time)
         if end_time:
-            query = query.filter(InverterMeasurement.timestamp <= end_time)
-        
-        measurements = query\
-            .order_by(InverterMeasurement.timestamp.desc())\
-            .limit(limit)\
-            .all()
+            query = query.filter(model.timestamp <= end_time)
         
-        return measurements
+        rows, next_cursor = paginate(query, model, limit, cursor, order)
+        return rows_response(columns, rows, {"X-Next-Cursor": next_cursor} if next_cursor else None, accept)
         
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Erro ao obter medições: {e}")
         raise HTTPException(status_code=500, detail="Erro interno do servidor")
 
 @router.get("/current", response_model=MeasurementResponse)
 async def get_current_measurement(
+    response: Response,
     equipment_type: str = Query("inverter"),
+    if_none_match: Optional[str] = Header(None),
+    if_modified_since: Optional[str] = Header(None),
     db: Session = Depends(get_db)
 ):
-    """Obter medição atual dos equipamentos"""
+    """Obter medição atual dos equipamentos (304 se não houve gravação desde o ETag)"""
     try:
+        if equipment_type in ("inverter", "logger"):
+            headers = data_versions.headers(
+                INVERTER_MEASUREMENTS if equipment_type == "inverter" else LOGGER_MEASUREMENTS
+            )
+            if is_not_modified(headers, if_none_match, if_modified_since):
+                return Response(status_code=304, headers=headers)
+            response.headers.update(headers)
+        
         if equipment_type == "inverter":
             measurement = db.query(InverterMeasurement)\
                 .order_by(InverterMeasurement.timestamp.desc())\
@@ -82,6 +145,174 @@ async def get_current_measurement(
         logger.error(f"Erro ao obter medição atual: {e}")
         raise HTTPException(status_code=500, detail="Erro interno do servidor")
 
+@router.get("/stream")
+async def stream_live_measurements(request: Request, inverters: Optional[str] = Query(None)):
+    """Medições ao vivo via Server-Sent Events (alternativa ao WebSocket /ws/live)"""
+    try:
+        inverter_ids = parse_inverter_ids(inverters)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    subscription = live_broker.subscribe(inverter_ids)
+    
+    async def events():
+        try:
+            while not await request.is_disconnected():
+                payloads = await subscription.next(timeout=LIVE_HEARTBEAT_SECONDS)
+                if not payloads:
+                    yield ": keep-alive\n\n"
+                for payload in payloads:
+                    yield f"event: measurement\ndata: {payload}\n\n"
+        finally:
+            live_broker.unsubscribe(subscription)
+    
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def _hourly_power_series(
+    db: Session,
+    start_time: datetime,
+    end_time: datetime,
+    inverter_id: Optional[int]
+) -> Dict[int, tuple]:
+    """Potência média por hora (resumos horários), por inversor"""
+    query = db.query(
+        HourlyEnergySummary.inverter_id,
+        HourlyEnergySummary.hour,
+        HourlyEnergySummary.power_sum,
+        HourlyEnergySummary.sample_count
+    ).filter(
+        HourlyEnergySummary.hour >= start_time,
+        HourlyEnergySummary.hour < end_time,
+        HourlyEnergySummary.sample_count > 0
+    )
+    if inverter_id:
+        query = query.filter(HourlyEnergySummary.inverter_id == inverter_id)
+    rows = query.order_by(HourlyEnergySummary.hour.asc()).all()
+    
+    series = {}
+    if not rows:
+        return series
+    inverters, hours, power_sum, sample_count = map(np.array, zip(*rows))
+    # Ponto no meio da hora
+    timestamps = hours.astype("datetime64[us]") + np.timedelta64(30, "m")
+    values = power_sum.astype(np.float64) / sample_count.astype(np.float64)
+    for inverter in np.unique(inverters):
+        mask = inverters == inverter
+        series[int(inverter)] = (timestamps[mask], values[mask])
+    return series
+
+@router.get("/series", response_model=List[MeasurementSeries])
+async def get_measurement_series(
+    start_time: Optional[datetime] = Query(None),
+    end_time: Optional[datetime] = Query(None),
+    fields: str = Query("power_output"),  # campos separados por vírgula
+    inverter_id: Optional[int] = Query(None),
+    points: int = Query(500, ge=10, le=5000),
+    method: str = Query("lttb"),  # "lttb" ou "minmax"
+    db: Session = Depends(get_db)
+):
+    """Séries de medições reduzidas a um número alvo de pontos para gráficos
+    
+    Retorna uma série por inversor e campo. A potência usa os resumos
+    horários quando a resolução horária já atende ao número de pontos
+    pedido (janelas longas); nos demais casos usa as medições brutas.
+    """
+    try:
+        end_time = end_time or datetime.utcnow()
+        start_time = start_time or end_time - timedelta(days=1)
+        
+        field_names = [f.strip() for f in fields.split(",") if f.strip()]
+        invalid = [f for f in field_names if f not in MEASUREMENT_FIELDS or f in KEY_FIELDS]
+        if not field_names or invalid:
+            raise HTTPException(status_code=400, detail=f"Campos inválidos: {', '.join(invalid) or fields}")
+        if method not in DOWNSAMPLING_METHODS:
+            raise HTTPException(status_code=400, detail="Método de redução inválido")
+        
+        span_hours = (end_time - start_time).total_seconds() / 3600
+        use_hourly = method == "lttb" and span_hours >= points
+        
+        result = []
+        for field in field_names:
+            if field == "power_output" and use_hourly:
+                source = "hourly"
+                series = _hourly_power_series(db, start_time, end_time, inverter_id)
+            else:
+                source = "raw"
+                data = load_measurement_columns(
+                    db,
+                    ["inverter_id", field],
+                    start_time=start_time,
+                    end_time=end_time,
+                    inverter_id=inverter_id,
+                    not_null=[field, "inverter_id"]
+                )
+                series = {}
+                for inverter in np.unique(data["inverter_id"]):
+                    mask = data["inverter_id"] == inverter
+                    series[int(inverter)] = (data["timestamp"][mask], data[field][mask])
+            
+            for inverter, (timestamps, values) in sorted(series.items()):
+                x = (timestamps - timestamps[0]) / np.timedelta64(1, "s") if timestamps.size else timestamps
+                keep = downsample(x, values, points, method)
+                result.append(MeasurementSeries(
+                    inverter_id=inverter,
+                    field=field,
+                    source=source,
+                    method=method,
+                    original_points=int(values.size),
+                    timestamps=timestamps[keep].astype(datetime).tolist(),
+                    values=values[keep].tolist()
+                ))
+        
+        return result
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Erro ao obter séries de medições: {e}")
+        raise HTTPException(status_code=500, detail="Erro interno do servidor")
+
+@router.get("/aggregate", response_model=List[AggregateSeries])
+async def get_aggregate(
+    bucket: str = Query("15m"),  # "15m", "1h", "1d"...
+    agg: str = Query("mean"),  # "mean", "min", "max", "sum", "count"
+    fields: str = Query("power_output"),  # campos separados por vírgula
+    inverter_id: Optional[str] = Query(None),  # "1,2"; vazio = todos
+    start_time: Optional[datetime] = Query(None),
+    end_time: Optional[datetime] = Query(None),
+    db: Session = Depends(get_db)
+):
+    """Medições agregadas em intervalos de tempo, uma série colunar por inversor
+    
+    Os intervalos são alinhados à época (UTC) e calculados no banco; o
+    período é [start_time, end_time), padrão últimas 24 horas. Intervalos
+    sem medições são omitidos.
+    """
+    try:
+        end_time = end_time or datetime.utcnow()
+        start_time = start_time or end_time - timedelta(days=1)
+        
+        series = aggregate_measurements(
+            db,
+            parse_bucket(bucket),
+            parse_fields(fields),
+            parse_aggregates(agg),
+            start_time,
+            end_time,
+            parse_inverter_ids(inverter_id)
+        )
+        return Response(content=dumps(series), media_type=JSON_MEDIA_TYPE)
+        
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Erro ao agregar medições: {e}")
+        raise HTTPException(status_code=500, detail="Erro interno do servidor")
+
 @router.get("/daily-summaries", response_model=List[DailySummaryResponse])
 async def get_daily_summaries(
     days: int = Query(30, le=365),
@@ -108,59 +339,46 @@ async def get_daily_summaries(
         logger.error(f"Erro ao obter resumos diários: {e}")
         raise HTTPException(status_code=500, detail="Erro interno do servidor")
 
+# Percentis opcionais de /statistics (nome -> quantil)
+STATISTICS_PERCENTILES = {"p5": 0.05, "p50": 0.5, "p95": 0.95}
+
 @router.get("/statistics", response_model=DataStatistics)
 async def get_data_statistics(
     days: int = Query(30, le=365),
+    inverter_id: Optional[int] = Query(None),
+    percentiles: bool = Query(False),  # incluir p5/p50/p95 (sketches diários)
     db: Session = Depends(get_db)
 ):
-    """Obter estatísticas dos dados"""
+    """Obter estatísticas dos dados
+    
+    Calculadas sobre as estatísticas diárias acumuladas na ingestão (dias
+    inteiros a partir do início do período), numa única consulta agregada.
+    """
     try:
         start_date = datetime.utcnow() - timedelta(days=days)
         
-        # Estatísticas do inversor
-        inverter_measurements = db.query(InverterMeasurement)\
-            .filter(InverterMeasurement.timestamp >= start_date)\
-            .all()
+        totals = measurement_stats.period_statistics(
+            db,
+            start_date,
+            inverter_id=inverter_id,
+            quantiles=list(STATISTICS_PERCENTILES.values()) if percentiles else ()
+        )
         
-        if inverter_measurements:
-            power_values = [m.power_output for m in inverter_measurements if m.power_output is not None]
-            energy_values = [m.energy_daily for m in inverter_measurements if m.energy_daily is not None]
-            temp_values = [m.temperature for m in inverter_measurements if m.temperature is not None]
-            efficiency_values = [m.efficiency for m in inverter_measurements if m.efficiency is not None]
-            
-            stats = {
-                "period_days": days,
-                "total_measurements": len(inverter_measurements),
-                "power": {
-                    "max": max(power_values) if power_values else 0,
-                    "min": min(power_values) if power_values else 0,
-                    "avg": sum(power_values) / len(power_values) if power_values else 0
-                },
-                "energy": {
-                    "max": max(energy_values) if energy_values else 0,
-                    "min": min(energy_values) if energy_values else 0,
-                    "avg": sum(energy_values) / len(energy_values) if energy_values else 0
-                },
-                "temperature": {
-                    "max": max(temp_values) if temp_values else 0,
-                    "min": min(temp_values) if temp_values else 0,
-                    "avg": sum(temp_values) / len(temp_values) if temp_values else 0
-                },
-                "efficiency": {
-                    "max": max(efficiency_values) if efficiency_values else 0,
-                    "min": min(efficiency_values) if efficiency_values else 0,
-                    "avg": sum(efficiency_values) / len(efficiency_values) if efficiency_values else 0
-                }
-            }
-        else:
-            stats = {
-                "period_days": days,
-                "total_measurements": 0,
-                "power": {"max": 0, "min": 0, "avg": 0},
-                "energy": {"max": 0, "min": 0, "avg": 0},
-                "temperature": {"max": 0, "min": 0, "avg": 0},
-                "efficiency": {"max": 0, "min": 0, "avg": 0}
+        stats = {
+            "period_days": days,
+            "total_measurements": totals["total_measurements"]
+        }
+        for name in ("power", "energy", "temperature", "efficiency"):
+            field = totals[name]
+            values = {
+                "max": field["max"] if field["count"] else 0,
+                "min": field["min"] if field["count"] else 0,
+                "avg": field["sum"] / field["count"] if field["count"] else 0
             }
+            if percentiles:
+                for label, q in STATISTICS_PERCENTILES.items():
+                    values[label] = field["quantiles"][q] or 0
+            stats[name] = values
         
         return stats
         
@@ -172,48 +390,129 @@ async def get_data_statistics(
 async def export_data(
     start_time: Optional[datetime] = Query(None),
     end_time: Optional[datetime] = Query(None),
-    format: str = Query("csv"),
+    format: str = Query("csv"),  # "csv", "ndjson", "parquet" ou "arrow"
+    inverter_id: Optional[int] = Query(None),
+    compress: bool = Query(False),  # gzip
+    fields: Optional[str] = Query(None)  # ex.: "timestamp,power_output"
+):
+    """Exportar medições em streaming (memória constante para qualquer intervalo)"""
+    if format not in EXPORT_FORMATS:
+        raise HTTPException(status_code=400, detail="Formato de exportação inválido")
+    if format in ARROW_FORMATS and not parquet_available():
+        raise HTTPException(status_code=400, detail="Exportação Parquet/Arrow requer o pacote pyarrow")
+    try:
+        export_columns(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        media_type, extension = EXPORT_FORMATS[format]
+        filename = f"medicoes_{datetime.utcnow():%Y%m%d_%H%M%S}.{extension}"
+        if compress:
+            media_type = "application/gzip"
+            filename += ".gz"
+        
+        content = export_measurements(
+            format,
+            start_time=start_time,
+            end_time=end_time,
+            inverter_id=inverter_id,
+            compress=compress,
+            fields=fields
+        )
+        return StreamingResponse(
+            content,
+            media_type=media_type,
+            headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+        )
+        
+    except Exception as e:
+        logger.error(f"Erro ao exportar dados: {e}")
+        raise HTTPException(status_code=500, detail="Erro interno do servidor")
+
+@router.get("/changes", response_model=ChangeFeed)
+async def get_changes(
+    since: Optional[str] = Query(None),  # next_token da leitura anterior; vazio = início
+    limit: int = Query(1000, ge=1, le=MAX_CHANGES),
+    entities: Optional[str] = Query(None),  # "measurement,alert,hourly_energy,daily_summary"
     db: Session = Depends(get_db)
 ):
-    """Exportar dados para arquivo"""
+    """Alterações de medições, alertas e resumos desde um token, em ordem
+    
+    Para sincronização incremental: repetir com `since=next_token` enquanto
+    has_more for verdadeiro. O mesmo filtro de entidades deve ser usado em
+    todas as leituras de um mesmo token. Um token anterior ao trecho ainda
+    guardado (CHANGE_FEED_RETENTION_DAYS) recebe 410 com o next_token atual:
+    o consumidor deve refazer a sincronização completa e continuar dele.
+    """
     try:
-        # Implementar exportação de dados
-        # Por enquanto, retornar dados em JSON
-        query = db.query(InverterMeasurement)
+        changes, position, has_more = read_changes(db, decode_token(since), limit, parse_entities(entities))
+        feed = {"changes": changes, "next_token": encode_token(position), "has_more": has_more}
+        return Response(content=dumps(feed), media_type=JSON_MEDIA_TYPE)
         
-        if start_time:
-            query = query.filter(InverterMeasurement.timestamp >= start_time)
-        if end_time:
-            query = query.filter(InverterMeasurement.timestamp <= end_time)
+    except ChangeFeedExpiredError as e:
+        raise HTTPException(status_code=410, detail={"message": str(e), "next_token": encode_token(e.position)})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Erro ao obter alterações: {e}")
+        raise HTTPException(status_code=500, detail="Erro interno do servidor")
+
+@router.post("/ingest", response_model=IngestResult)
+async def ingest_data(
+    request: Request,
+    content_type: str = Header("application/x-ndjson"),
+    content_encoding: Optional[str] = Header(None),
+    x_api_key: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
+    """Receber um lote de amostras de coletores remotos
+
+    Corpo em NDJSON, JSON ou MessagePack (opcionalmente gzip); cada amostra
+    tem device (número de série), timestamp e os campos da medição.
+    Amostras já gravadas para o mesmo dispositivo e instante são ignoradas.
+    A leitura do lote, a gravação e os recálculos rodam numa thread do pool,
+    sem bloquear o loop de eventos (WebSocket, SSE e demais requisições).
+    """
+    if settings.INGEST_API_KEY and not secrets.compare_digest(x_api_key or "", settings.INGEST_API_KEY):
+        raise HTTPException(status_code=401, detail="Chave de ingestão inválida")
+    
+    format = INGEST_CONTENT_TYPES.get(content_type.split(";")[0].strip().lower())
+    if format is None or (format == "msgpack" and not msgpack_available()):
+        raise HTTPException(status_code=415, detail="Formato de lote não suportado")
+    if content_encoding not in (None, "", "identity", "gzip"):
+        raise HTTPException(status_code=415, detail="Codificação de lote não suportada")
+    
+    def process(body: bytes) -> IngestResult:
+        try:
+            if content_encoding == "gzip":
+                body = decompress(body, settings.INGEST_MAX_BYTES)
+            frame = parse_batch(body, format)
+        except (ValueError, zlib.error) as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        if len(frame) > settings.INGEST_MAX_BATCH:
+            raise HTTPException(status_code=413, detail=f"Lote excede {settings.INGEST_MAX_BATCH} amostras")
         
-        measurements = query\
-            .order_by(InverterMeasurement.timestamp.desc())\
-            .all()
+        samples, rejected, errors = validate_batch(frame)
+        result = ingest_batch(db, samples)
         
-        # Converter para formato de exportação
-        export_data = []
-        for measurement in measurements:
-            export_data.append({
-                "timestamp": measurement.timestamp.isoformat(),
-                "power_output": measurement.power_output,
-                "energy_daily": measurement.energy_daily,
-                "voltage_dc": measurement.voltage_dc,
-                "current_dc": measurement.current_dc,
-                "voltage_ac": measurement.voltage_ac,
-                "current_ac": measurement.current_ac,
-                "frequency": measurement.frequency,
-                "temperature": measurement.temperature,
-                "efficiency": measurement.efficiency,
-                "status_code": measurement.status_code,
-                "fault_code": measurement.fault_code
-            })
-        
-        return {
-            "format": format,
-            "count": len(export_data),
-            "data": export_data
-        }
+        return IngestResult(
+            received=len(frame),
+            inserted=result["inserted"],
+            duplicates=len(frame) - rejected - result["inserted"],
+            rejected=rejected,
+            errors=errors
+        )
+    
+    try:
+        body = await request.body()
+        if len(body) > settings.INGEST_MAX_BYTES:
+            raise HTTPException(status_code=413, detail="Lote muito grande")
+        return await run_in_threadpool(process, body)
         
+    except HTTPException:
+        raise
     except Exception as e:
-        logger.error(f"Erro ao exportar dados: {e}")
+        db.rollback()
+        logger.error(f"Erro ao ingerir lote: {e}")
         raise HTTPException(status_code=500, detail="Erro interno do servidor")
@@ -2,14 +2,19 @@
 Router para operações relacionadas ao inversor
 """
 
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from sqlalchemy import and_, func
 from sqlalchemy.orm import Session
-from typing import List, Optional
+from typing import Dict, Iterable, List, Optional
 from datetime import datetime, timedelta
 import logging
 
 from ..database import get_db
 from ..models import Inverter, InverterMeasurement, DailySummary
+from ..services.pagination import paginate
+from ..services.fast_json import BINARY_RESPONSES, SchemaColumns, rows_response
+from ..services.data_versions import data_versions, inverter_key, is_not_modified, with_variant
+from ..services.live_broker import parse_inverter_ids
 from ..schemas.inverter_schemas import (
     InverterResponse,
     InverterMeasurementResponse,
@@ -20,6 +25,75 @@ from ..schemas.inverter_schemas import (
 logger = logging.getLogger(__name__)
 router = APIRouter()
 
+# Sem medições há mais que isso, o inversor é considerado offline
+ONLINE_TIMEOUT = 300  # segundos (5 minutos)
+
+MEASUREMENT_COLUMNS = SchemaColumns(InverterMeasurement, InverterMeasurementResponse)
+
+def _connection_state(last_update: Optional[datetime]) -> bool:
+    return last_update is not None and (datetime.utcnow() - last_update).total_seconds() < ONLINE_TIMEOUT
+
+def _energy_window_start() -> datetime:
+    """Início da janela de 24h da energia diária, na virada de hora
+    
+    A janela avança de hora em hora, como os resumos horários: o status
+    depende só da versão dos dados, do estado de conexão e desse início,
+    que entram no ETag (que assim muda no máximo uma vez por hora sem
+    medições novas).
+    """
+    return (datetime.utcnow() - timedelta(days=1)).replace(minute=0, second=0, microsecond=0)
+
+def _measurements_at_edge(
+    db: Session,
+    inverter_ids: Optional[Iterable[int]],
+    latest: bool,
+    since: Optional[datetime] = None
+) -> Dict[int, InverterMeasurement]:
+    """Medição mais recente (ou a primeira desde `since`) de cada inversor
+    
+    Uma única consulta: o timestamp extremo por inversor (GROUP BY sobre o
+    índice único (inverter_id, timestamp)) unido de volta às medições.
+    """
+    edge = func.max(InverterMeasurement.timestamp) if latest else func.min(InverterMeasurement.timestamp)
+    edges = db.query(InverterMeasurement.inverter_id, edge.label("timestamp"))
+    if inverter_ids is not None:
+        edges = edges.filter(InverterMeasurement.inverter_id.in_(inverter_ids))
+    if since is not None:
+        edges = edges.filter(InverterMeasurement.timestamp >= since)
+    edges = edges.group_by(InverterMeasurement.inverter_id).subquery()
+    
+    measurements = db.query(InverterMeasurement)\
+        .join(edges, and_(
+            InverterMeasurement.inverter_id == edges.c.inverter_id,
+            InverterMeasurement.timestamp == edges.c.timestamp
+        ))\
+        .all()
+    return {measurement.inverter_id: measurement for measurement in measurements}
+
+def _inverter_status(
+    inverter: Inverter,
+    latest_measurement: Optional[InverterMeasurement],
+    yesterday_measurement: Optional[InverterMeasurement]
+) -> InverterStatus:
+    """Status do inversor a partir da última medição e da primeira das últimas 24h"""
+    # Calcular energia do dia
+    daily_energy = 0.0
+    if latest_measurement and yesterday_measurement:
+        daily_energy = (latest_measurement.energy_daily or 0) - (yesterday_measurement.energy_daily or 0)
+    
+    return InverterStatus(
+        inverter_id=inverter.id,
+        serial_number=inverter.serial_number,
+        is_online=_connection_state(latest_measurement.timestamp) if latest_measurement else False,
+        last_update=latest_measurement.timestamp if latest_measurement else None,
+        current_power=latest_measurement.power_output if latest_measurement else 0.0,
+        daily_energy=daily_energy,
+        temperature=latest_measurement.temperature if latest_measurement else None,
+        efficiency=latest_measurement.efficiency if latest_measurement else None,
+        status_code=latest_measurement.status_code if latest_measurement else None,
+        fault_code=latest_measurement.fault_code if latest_measurement else None
+    )
+
 @router.get("/", response_model=List[InverterResponse])
 async def get_inverters(db: Session = Depends(get_db)):
     """Obter lista de todos os inversores"""
@@ -30,6 +104,43 @@ async def get_inverters(db: Session = Depends(get_db)):
         logger.error(f"Erro ao obter inversores: {e}")
         raise HTTPException(status_code=500, detail="Erro interno do servidor")
 
+@router.get("/status", response_model=List[InverterStatus])
+async def get_inverters_status(
+    ids: Optional[str] = Query(None),  # "1,2,3"; vazio = todos
+    db: Session = Depends(get_db)
+):
+    """Status de vários inversores numa requisição
+    
+    Usa um número fixo de consultas (inversores, últimas medições e
+    primeiras medições das últimas 24h), independente da quantidade de
+    inversores.
+    """
+    try:
+        inverter_ids = parse_inverter_ids(ids)
+        
+        query = db.query(Inverter)
+        if inverter_ids is not None:
+            query = query.filter(Inverter.id.in_(inverter_ids))
+        inverters = query.order_by(Inverter.id).all()
+        if not inverters:
+            return []
+        
+        selected = [inverter.id for inverter in inverters] if inverter_ids is not None else None
+        latest = _measurements_at_edge(db, selected, latest=True)
+        yesterday = _measurements_at_edge(db, selected, latest=False, since=_energy_window_start())
+        data_versions.observe({inverter_id: measurement.timestamp for inverter_id, measurement in latest.items()})
+        
+        return [
+            _inverter_status(inverter, latest.get(inverter.id), yesterday.get(inverter.id))
+            for inverter in inverters
+        ]
+        
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Erro ao obter status dos inversores: {e}")
+        raise HTTPException(status_code=500, detail="Erro interno do servidor")
+
 @router.get("/{inverter_id}", response_model=InverterResponse)
 async def get_inverter(inverter_id: int, db: Session = Depends(get_db)):
     """Obter dados de um inversor específico"""
@@ -45,9 +156,25 @@ async def get_inverter(inverter_id: int, db: Session = Depends(get_db)):
         raise HTTPException(status_code=500, detail="Erro interno do servidor")
 
 @router.get("/{inverter_id}/status", response_model=InverterStatus)
-async def get_inverter_status(inverter_id: int, db: Session = Depends(get_db)):
-    """Obter status atual do inversor"""
+async def get_inverter_status(
+    inverter_id: int,
+    response: Response,
+    if_none_match: Optional[str] = Header(None),
+    db: Session = Depends(get_db)
+):
+    """Obter status atual do inversor (304 se nada mudou desde o ETag)"""
     try:
+        # O ETag inclui o estado de conexão e o início da janela da energia
+        # diária, que mudam com o tempo sem novas medições
+        headers = data_versions.headers(inverter_key(inverter_id))
+        window_start = _energy_window_start()
+        window = window_start.strftime("%Y%m%d%H")
+        last_update = data_versions.last_measurement(inverter_id)
+        if last_update is not None:
+            variant = f"{'online' if _connection_state(last_update) else 'offline'}-{window}"
+            if is_not_modified(with_variant(headers, variant), if_none_match):
+                return Response(status_code=304, headers=with_variant(headers, variant))
+        
         inverter = db.query(Inverter).filter(Inverter.id == inverter_id).first()
         if not inverter:
             raise HTTPException(status_code=404, detail="Inversor não encontrado")
@@ -59,37 +186,19 @@ async def get_inverter_status(inverter_id: int, db: Session = Depends(get_db)):
             .first()
         
         # Obter medição de 24h atrás para comparação
-        yesterday = datetime.utcnow() - timedelta(days=1)
         yesterday_measurement = db.query(InverterMeasurement)\
             .filter(InverterMeasurement.inverter_id == inverter_id)\
-            .filter(InverterMeasurement.timestamp >= yesterday)\
+            .filter(InverterMeasurement.timestamp >= window_start)\
             .order_by(InverterMeasurement.timestamp.asc())\
             .first()
         
-        # Calcular energia do dia
-        today_start = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)
-        daily_energy = 0.0
-        if latest_measurement and yesterday_measurement:
-            daily_energy = latest_measurement.energy_daily - (yesterday_measurement.energy_daily or 0)
-        
-        # Determinar status de conexão
-        is_online = False
+        status = _inverter_status(inverter, latest_measurement, yesterday_measurement)
         if latest_measurement:
-            time_diff = datetime.utcnow() - latest_measurement.timestamp
-            is_online = time_diff.total_seconds() < 300  # 5 minutos
-        
-        return InverterStatus(
-            inverter_id=inverter.id,
-            serial_number=inverter.serial_number,
-            is_online=is_online,
-            last_update=latest_measurement.timestamp if latest_measurement else None,
-            current_power=latest_measurement.power_output if latest_measurement else 0.0,
-            daily_energy=daily_energy,
-            temperature=latest_measurement.temperature if latest_measurement else None,
-            efficiency=latest_measurement.efficiency if latest_measurement else None,
-            status_code=latest_measurement.status_code if latest_measurement else None,
-            fault_code=latest_measurement.fault_code if latest_measurement else None
-        )
+            data_versions.observe({inverter_id: latest_measurement.timestamp})
+            variant = f"{'online' if status.is_online else 'offline'}-{window}"
+            response.headers.update(with_variant(headers, variant))
+        
+        return status
         
     except HTTPException:
         raise
@@ -97,17 +206,25 @@ async def get_inverter_status(inverter_id: int, db: Session = Depends(get_db)):
         logger.error(f"Erro ao obter status do inversor {inverter_id}: {e}")
         raise HTTPException(status_code=500, detail="Erro interno do servidor")
 
-@router.get("/{inverter_id}/measurements", response_model=List[InverterMeasurementResponse])
+@router.get("/{inverter_id}/measurements", response_model=List[InverterMeasurementResponse], responses=BINARY_RESPONSES)
 async def get_inverter_measurements(
     inverter_id: int,
     start_time: Optional[datetime] = Query(None),
     end_time: Optional[datetime] = Query(None),
     limit: int = Query(100, le=1000),
+    cursor: Optional[str] = Query(None),  # valor de X-Next-Cursor da página anterior
+    order: str = Query("desc"),  # "desc" (mais recentes primeiro) ou "asc"
+    fields: Optional[str] = Query(None),  # ex.: "timestamp,power_output"
+    accept: Optional[str] = Header(None),  # JSON, Arrow IPC ou MessagePack
     db: Session = Depends(get_db)
 ):
-    """Obter medições do inversor"""
+    """Obter medições do inversor (paginação por cursor em X-Next-Cursor)
+    
+    `fields` limita as colunas consultadas e devolvidas.
+    """
     try:
-        query = db.query(InverterMeasurement)\
+        columns = MEASUREMENT_COLUMNS.project(fields)
+        query = columns.query(db)\
             .filter(InverterMeasurement.inverter_id == inverter_id)
         
         if start_time:
@@ -115,13 +232,11 @@ async def get_inverter_measurements(
         if end_time:
             query = query.filter(InverterMeasurement.timestamp <= end_time)
         
-        measurements = query\
-            .order_by(InverterMeasurement.timestamp.desc())\
-            .limit(limit)\
-            .all()
-        
-        return measurements
+        rows, next_cursor = paginate(query, InverterMeasurement, limit, cursor, order)
+        return rows_response(columns, rows, {"X-Next-Cursor": next_cursor} if next_cursor else None, accept)
         
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Erro ao obter medições do inversor {inverter_id}: {e}")
         raise HTTPException(status_code=500, detail="Erro interno do servidor")
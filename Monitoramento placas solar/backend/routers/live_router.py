@@ -0,0 +1,66 @@
+"""
+Router para medições ao vivo via WebSocket
+"""
+
+from fastapi import APIRouter, Query, WebSocket, WebSocketDisconnect
+from typing import Optional
+import asyncio
+import logging
+
+from ..services.live_broker import live_broker, parse_inverter_ids
+
+logger = logging.getLogger(__name__)
+router = APIRouter()
+
+@router.websocket("/live")
+async def live_websocket(websocket: WebSocket, inverters: Optional[str] = Query(None)):
+    """Enviar cada medição gravada aos clientes inscritos
+
+    `inverters` ("1,2") limita os inversores; sem ele, todos. O cliente pode
+    enviar {"subscribe": [ids]} ou {"unsubscribe": [ids]} a qualquer momento.
+    """
+    try:
+        inverter_ids = parse_inverter_ids(inverters)
+    except ValueError as e:
+        await websocket.close(code=1008, reason=str(e))
+        return
+
+    await websocket.accept()
+    subscription = live_broker.subscribe(inverter_ids)
+
+    async def send_updates():
+        while True:
+            for payload in await subscription.next():
+                await websocket.send_text(payload)
+
+    async def receive_commands():
+        while True:
+            try:
+                message = await websocket.receive_json()
+            except (TypeError, ValueError, KeyError):
+                # Quadro binário ou texto que não é JSON
+                await websocket.send_json({"type": "error", "detail": "Mensagem inválida (esperado JSON)"})
+                continue
+            if not isinstance(message, dict):
+                await websocket.send_json({"type": "error", "detail": "Mensagem inválida (esperado objeto JSON)"})
+                continue
+            try:
+                if "subscribe" in message:
+                    subscription.subscribe({int(i) for i in message["subscribe"]})
+                if "unsubscribe" in message:
+                    subscription.unsubscribe({int(i) for i in message["unsubscribe"]})
+            except (TypeError, ValueError):
+                await websocket.send_json({"type": "error", "detail": "Lista de inversores inválida"})
+
+    tasks = [asyncio.create_task(send_updates()), asyncio.create_task(receive_commands())]
+    try:
+        # Termina quando o cliente desconecta (ou o envio falha)
+        done, pending = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            error = task.exception()
+            if error and not isinstance(error, WebSocketDisconnect):
+                logger.warning(f"Conexão ao vivo encerrada: {error}")
+    finally:
+        for task in tasks:
+            task.cancel()
+        live_broker.unsubscribe(subscription)
@@ -30,6 +30,10 @@ class PerformanceComparison(BaseModel):
     period2: Dict[str, Any]
     comparison: Dict[str, float]
 
+class PerformanceTrend(BaseModel):
+    period_days: int
+    periods: List[Dict[str, Any]]
+
 class ForecastData(BaseModel):
     forecast_days: int
     confidence: str  # "low", "medium", "high"
@@ -3,7 +3,7 @@ Schemas Pydantic para dados e medições
 """
 
 from pydantic import BaseModel
-from typing import Optional
+from typing import Any, Dict, List, Optional
 from datetime import datetime
 
 class MeasurementResponse(BaseModel):
@@ -67,6 +67,35 @@ class DailySummaryResponse(BaseModel):
     class Config:
         from_attributes = True
 
+class MeasurementSeries(BaseModel):
+    inverter_id: int
+    field: str
+    source: str  # "raw" (medições) ou "hourly" (resumos horários)
+    method: str  # "lttb" ou "minmax"
+    original_points: int
+    timestamps: List[datetime]
+    values: List[float]
+
+class AggregateSeries(BaseModel):
+    inverter_id: int
+    bucket_seconds: int
+    source: str  # "raw" (medições), "hourly" ou "daily" (resumos)
+    timestamps: List[datetime]  # início de cada intervalo com dados
+    values: Dict[str, Dict[str, List[Optional[float]]]]  # campo -> agregação -> valores
+
+class ChangeEntry(BaseModel):
+    seq: int
+    entity: str  # "measurement", "alert", "hourly_energy" ou "daily_summary"
+    id: int
+    operation: str  # "insert", "update" ou "delete"
+    changed_at: datetime
+    data: Optional[Dict[str, Any]] = None  # estado atual da linha (None se removida)
+
+class ChangeFeed(BaseModel):
+    changes: List[ChangeEntry]
+    next_token: str  # usar como `since` na próxima leitura
+    has_more: bool
+
 class DataStatistics(BaseModel):
     period_days: int
     total_measurements: int
@@ -78,3 +107,10 @@ class DataStatistics(BaseModel):
     
     class Config:
         from_attributes = True
+
+class IngestResult(BaseModel):
+    received: int
+    inserted: int
+    duplicates: int  # já gravadas ou repetidas no lote
+    rejected: int
+    errors: List[Dict[str, Any]]  # primeiras rejeições (linha e motivo)
@@ -0,0 +1,204 @@
+"""
+Agregação de medições em intervalos de tempo fixos
+
+Os intervalos ("15m", "1h", "1d") são alinhados à época Unix (UTC) e
+calculados no banco, com um GROUP BY sobre o início do intervalo
+(strftime no SQLite, extract(epoch) no PostgreSQL). Quando o intervalo e o
+período coincidem com um nível de resumo já mantido na ingestão (horário
+para potência, diário para potência, energia, temperatura e eficiência), a
+agregação é feita sobre os resumos em vez das medições brutas.
+
+Cada campo agregado é lido como contagem, soma, mínimo e máximo; a média é
+soma / contagem, o que permite combinar linhas de resumo sem perder
+exatidão.
+"""
+
+import logging
+import re
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Set
+
+from sqlalchemy import BigInteger, Integer, cast, func
+from sqlalchemy.orm import Session
+
+from ..models import DailyMeasurementStats, HourlyEnergySummary, InverterMeasurement
+from .measurement_loader import MEASUREMENT_FIELDS
+from .measurement_stats import STAT_FIELDS
+
+logger = logging.getLogger(__name__)
+
+AGGREGATES = ("mean", "min", "max", "sum", "count")
+
+# Campos numéricos que podem ser agregados (identificadores e códigos não)
+AGGREGATE_FIELDS = [
+    name for name in MEASUREMENT_FIELDS
+    if name not in ("id", "inverter_id", "status_code", "fault_code")
+]
+
+BUCKET_UNITS = {"m": 60, "h": 3600, "d": 86400}
+
+# Limite de intervalos por inversor numa consulta
+MAX_BUCKETS = 10000
+
+EPOCH = datetime(1970, 1, 1)
+
+
+class _RollupTier:
+    """Nível de resumo: tabela, coluna de tempo, duração e colunas por campo"""
+
+    def __init__(
+        self,
+        name: str,
+        model: Any,
+        time_column: Any,
+        seconds: int,
+        fields: Dict[str, Sequence[str]],
+        populated: Any = None
+    ):
+        self.name = name
+        self.model = model
+        self.time_column = time_column
+        self.seconds = seconds
+        # Condição das linhas com amostras (None = todas têm)
+        self.populated = populated
+        # campo -> colunas (contagem, soma, mínimo, máximo)
+        self.fields = {
+            field: [getattr(model, column) for column in columns]
+            for field, columns in fields.items()
+        }
+
+    def covers(self, bucket_seconds: int, fields: Sequence[str], start: datetime, end: datetime) -> bool:
+        return (
+            bucket_seconds % self.seconds == 0
+            and all(field in self.fields for field in fields)
+            and _epoch_seconds(start) % self.seconds == 0
+            and _epoch_seconds(end) % self.seconds == 0
+        )
+
+
+ROLLUP_TIERS = [
+    _RollupTier("daily", DailyMeasurementStats, DailyMeasurementStats.day, 86400, {
+        field: [f"{prefix}_count", f"{prefix}_sum", f"{prefix}_min", f"{prefix}_max"]
+        for prefix, field in STAT_FIELDS.items()
+    }),
+    # Horas só com energia integrada (sem amostras) não são intervalos com dados
+    _RollupTier("hourly", HourlyEnergySummary, HourlyEnergySummary.hour, 3600, {
+        "power_output": ["sample_count", "power_sum", "power_min", "power_max"]
+    }, populated=HourlyEnergySummary.sample_count > 0),
+]
+
+
+def _epoch_seconds(value: datetime) -> float:
+    return (value - EPOCH).total_seconds()
+
+
+def parse_bucket(bucket: str) -> int:
+    """Duração do intervalo em segundos ("15m" -> 900); ValueError se inválido"""
+    match = re.fullmatch(r"(\d+)([mhd])", bucket.strip().lower())
+    if not match or int(match.group(1)) == 0:
+        raise ValueError("Intervalo inválido (use, por exemplo, 15m, 1h ou 1d)")
+    return int(match.group(1)) * BUCKET_UNITS[match.group(2)]
+
+
+def parse_aggregates(agg: str) -> List[str]:
+    """Lista "mean,max" validada"""
+    names = [name.strip() for name in agg.split(",") if name.strip()]
+    invalid = [name for name in names if name not in AGGREGATES]
+    if not names or invalid:
+        raise ValueError(f"Agregações inválidas: {', '.join(invalid) or agg}")
+    return names
+
+
+def parse_fields(fields: str) -> List[str]:
+    """Lista de campos numéricos da medição validada"""
+    names = [name.strip() for name in fields.split(",") if name.strip()]
+    invalid = [name for name in names if name not in AGGREGATE_FIELDS]
+    if not names or invalid:
+        raise ValueError(f"Campos inválidos: {', '.join(invalid) or fields}")
+    return names
+
+
+def _bucket_expression(db: Session, column: Any, seconds: int) -> Any:
+    """Início do intervalo, em segundos desde a época, calculado no banco"""
+    if db.bind.dialect.name == "postgresql":
+        epoch = cast(func.floor(func.extract("epoch", column)), BigInteger)
+    else:
+        epoch = cast(func.strftime("%s", column), Integer)
+    return (epoch // seconds) * seconds
+
+
+def aggregate_measurements(
+    db: Session,
+    bucket_seconds: int,
+    fields: Sequence[str],
+    aggregates: Sequence[str],
+    start_time: datetime,
+    end_time: datetime,
+    inverter_ids: Optional[Set[int]] = None
+) -> List[Dict[str, Any]]:
+    """Séries agregadas por inversor no período [start_time, end_time)
+
+    Cada série traz os inícios dos intervalos com dados e, por campo e
+    agregação, uma lista de valores alinhada a eles.
+    """
+    if end_time <= start_time:
+        raise ValueError("Período inválido")
+    if (end_time - start_time).total_seconds() / bucket_seconds > MAX_BUCKETS:
+        raise ValueError(f"Intervalos demais para o período (máximo {MAX_BUCKETS})")
+
+    tier = next((t for t in ROLLUP_TIERS if t.covers(bucket_seconds, fields, start_time, end_time)), None)
+    if tier is not None:
+        source = tier.name
+        model, time_column = tier.model, tier.time_column
+        columns = []
+        for field in fields:
+            count, total, minimum, maximum = tier.fields[field]
+            columns += [func.sum(count), func.sum(total), func.min(minimum), func.max(maximum)]
+    else:
+        source = "raw"
+        model, time_column = InverterMeasurement, InverterMeasurement.timestamp
+        columns = []
+        for field in fields:
+            column = MEASUREMENT_FIELDS[field]
+            columns += [func.count(column), func.sum(column), func.min(column), func.max(column)]
+
+    bucket = _bucket_expression(db, time_column, bucket_seconds).label("bucket")
+    query = db.query(model.inverter_id, bucket, *columns)\
+        .filter(time_column >= start_time)\
+        .filter(time_column < end_time)
+    if inverter_ids:
+        query = query.filter(model.inverter_id.in_(inverter_ids))
+    if tier is not None and tier.populated is not None:
+        query = query.filter(tier.populated)
+    rows = query\
+        .group_by(model.inverter_id, bucket)\
+        .order_by(model.inverter_id, bucket)\
+        .all()
+
+    series: Dict[int, Dict[str, Any]] = {}
+    for row in rows:
+        inverter_id, start = row[0], int(row[1])
+        entry = series.get(inverter_id)
+        if entry is None:
+            entry = series[inverter_id] = {
+                "inverter_id": inverter_id,
+                "bucket_seconds": bucket_seconds,
+                "source": source,
+                "timestamps": [],
+                "values": {field: {name: [] for name in aggregates} for field in fields}
+            }
+        entry["timestamps"].append(EPOCH + timedelta(seconds=start))
+        for i, field in enumerate(fields):
+            count, total, minimum, maximum = row[2 + 4 * i: 6 + 4 * i]
+            count = int(count or 0)
+            computed = {
+                "count": count,
+                "sum": total if count else None,
+                "mean": total / count if count else None,
+                "min": minimum,
+                "max": maximum
+            }
+            for name in aggregates:
+                entry["values"][field][name].append(computed[name])
+
+    return list(series.values())
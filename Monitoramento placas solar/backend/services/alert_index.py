@@ -0,0 +1,132 @@
+"""
+Índice em memória dos alertas ativos (não resolvidos)
+
+Chave: (inversor, logger, tipo, valor). O valor só faz parte da chave nos
+tipos "per_value" de ALARM_CONFIG (ex.: código de falha); nos demais, um
+alerta ativo do tipo no equipamento basta para não criar outro. O índice
+é carregado ao iniciar o serviço e acompanha toda criação, resolução ou
+remoção de alertas feita pela sessão (serviços e endpoints REST): as
+alterações são anotadas no flush e aplicadas só após o commit. Verificar
+duplicidade é uma consulta a um dicionário, sem acesso ao banco.
+
+Alertas criados numa transação ainda aberta (ex.: vários alertas avaliados
+num mesmo lote de ingestão) são reservados na própria sessão: contam como
+ativos para ela até o commit e são descartados no rollback.
+"""
+
+import logging
+import threading
+from typing import Dict, Optional, Set, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from ..config import ALARM_CONFIG
+from ..models import Alert
+
+logger = logging.getLogger(__name__)
+
+AlertKey = Tuple[Optional[int], Optional[int], str, Optional[float]]
+
+
+def alert_key(
+    alert_type: str,
+    inverter_id: Optional[int] = None,
+    logger_id: Optional[int] = None,
+    value: Optional[float] = None
+) -> AlertKey:
+    """Chave de deduplicação de um alerta"""
+    per_value = ALARM_CONFIG.get(alert_type, {}).get("per_value", False)
+    return (inverter_id, logger_id, alert_type, float(value) if per_value and value is not None else None)
+
+
+def _key_of(alert: Alert) -> AlertKey:
+    return alert_key(alert.alert_type, alert.inverter_id, alert.logger_id, alert.value)
+
+
+class ActiveAlertIndex:
+    """Alertas ativos por chave de deduplicação"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._by_key: Dict[AlertKey, Set[int]] = {}
+        self._keys: Dict[int, AlertKey] = {}
+
+    def restore(self, db: Session) -> int:
+        """Carregar os alertas não resolvidos do banco; retorna quantos"""
+        rows = db.query(Alert.id, Alert.alert_type, Alert.inverter_id, Alert.logger_id, Alert.value)\
+            .filter(Alert.resolved == False)\
+            .all()
+        with self._lock:
+            self._by_key = {}
+            self._keys = {}
+            for row in rows:
+                self._add(row.id, alert_key(row.alert_type, row.inverter_id, row.logger_id, row.value))
+        logger.info(f"Índice de alertas ativos carregado: {len(rows)} alertas")
+        return len(rows)
+
+    def is_active(self, key: AlertKey, db: Optional[Session] = None) -> bool:
+        """Há alerta ativo gravado ou reservado na transação de `db`"""
+        if db is not None and key in db.info.get("alert_index_reserved", ()):
+            return True
+        return bool(self._by_key.get(key))
+
+    def reserve(self, db: Session, key: AlertKey):
+        """Marcar a chave como ativa para a sessão até o commit ou rollback"""
+        db.info.setdefault("alert_index_reserved", set()).add(key)
+
+    def update(self, alert_id: int, key: AlertKey, active: bool):
+        """Registrar o estado de um alerta gravado"""
+        with self._lock:
+            self._discard(alert_id)
+            if active:
+                self._add(alert_id, key)
+
+    def _add(self, alert_id: int, key: AlertKey):
+        self._keys[alert_id] = key
+        self._by_key.setdefault(key, set()).add(alert_id)
+
+    def _discard(self, alert_id: int):
+        key = self._keys.pop(alert_id, None)
+        if key is None:
+            return
+        ids = self._by_key.get(key)
+        if ids is not None:
+            ids.discard(alert_id)
+            if not ids:
+                del self._by_key[key]
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+
+# Instância global do índice
+alert_index = ActiveAlertIndex()
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_alert_changes(session: Session, flush_context):
+    """Anotar alertas criados, alterados ou removidos; aplicados após o commit"""
+    pending = session.info.setdefault("alert_index", {})
+    for instance in list(session.new) + list(session.dirty):
+        if isinstance(instance, Alert) and instance.id is not None:
+            pending[instance.id] = (_key_of(instance), not instance.resolved)
+    for instance in session.deleted:
+        if isinstance(instance, Alert) and instance.id is not None:
+            pending[instance.id] = (_key_of(instance), False)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_alert_changes(session: Session):
+    session.info.pop("alert_index_reserved", None)
+    pending = session.info.pop("alert_index", None)
+    if not pending:
+        return
+    for alert_id, (key, active) in pending.items():
+        alert_index.update(alert_id, key, active)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_alert_changes(session: Session):
+    session.info.pop("alert_index_reserved", None)
+    session.info.pop("alert_index", None)
@@ -0,0 +1,177 @@
+"""
+Motor de regras de alerta avaliado na ingestão
+
+As entradas de ALARM_CONFIG com "field" são compiladas uma vez em regras
+(campo, comparação, limite). Cada medição recebida, de qualquer inversor, é
+avaliada em memória contra todas as regras, com custo proporcional ao
+número de regras e sem consultas ao banco. O motor guarda, por inversor e
+regra, se a condição está ativa: só a transição de normal para alerta (ou
+a troca de código, nas regras por valor) gera um alerta, desde que não
+haja um igual ainda não resolvido no índice de alertas ativos.
+
+Leituras ausentes ou zeradas que satisfariam a condição (ex.: potência 0
+à noite, inversor desligado) não são evidência: não disparam nem encerram
+a condição ativa. Só um valor que não satisfaz a condição a encerra. O
+estado alterado por uma transação vale para ela mesma e só é aplicado ao
+motor após o commit; no rollback é descartado.
+"""
+
+import logging
+import operator
+from datetime import datetime
+from typing import Any, Dict, List, Mapping, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from ..config import ALARM_CONFIG
+from ..models import Alert
+from .alert_index import alert_index, alert_key
+
+logger = logging.getLogger(__name__)
+
+CONDITIONS = {
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+
+
+class AlertRule:
+    """Regra compilada de uma entrada de ALARM_CONFIG"""
+
+    def __init__(self, alert_type: str, config: Dict[str, Any]):
+        self.alert_type = alert_type
+        self.field = config["field"]
+        self.compare = CONDITIONS[config["condition"]]
+        self.threshold = config["threshold"]
+        self.per_value = config.get("per_value", False)
+        self.severity = config.get("severity", "medium")
+        self.message = config.get("message", alert_type)
+
+    def check(self, value: Any) -> Optional[bool]:
+        """Condição satisfeita, não satisfeita ou None (sem evidência)"""
+        if value is None or value != value:
+            return None
+        matched = self.compare(value, self.threshold)
+        if matched and not value:
+            # Leitura zerada (equipamento parado) não dispara alerta
+            return None
+        return matched
+
+    def build_alert(self, inverter_id: int, value: float) -> Alert:
+        if self.per_value:
+            message = f"{self.message} - Código: {value:g}"
+            threshold = None
+        else:
+            message = self.message
+            threshold = self.threshold
+        return Alert(
+            inverter_id=inverter_id,
+            alert_type=self.alert_type,
+            severity=self.severity,
+            message=message,
+            value=value,
+            threshold=threshold,
+            timestamp=datetime.utcnow()
+        )
+
+
+def compile_rules(config: Dict[str, Dict[str, Any]]) -> List[AlertRule]:
+    """Regras das entradas habilitadas que avaliam um campo da medição"""
+    return [
+        AlertRule(alert_type, entry)
+        for alert_type, entry in config.items()
+        if entry.get("enabled", True) and "field" in entry
+    ]
+
+
+def _sample_value(sample: Any, field: str) -> Any:
+    if isinstance(sample, Mapping):
+        return sample.get(field)
+    return getattr(sample, field, None)
+
+
+class AlertEngine:
+    """Avalia as regras contra o fluxo de medições de todos os inversores"""
+
+    def __init__(self, rules: List[AlertRule]):
+        self.rules = rules
+        # (inversor, tipo) -> valor que disparou a condição ativa
+        self._firing: Dict[Tuple[int, str], float] = {}
+        self._last_timestamp: Dict[int, datetime] = {}
+
+    def _staged(self, db: Session) -> Dict[str, Dict]:
+        """Estado alterado na transação de `db` (None = condição encerrada)"""
+        engines = db.info.setdefault("alert_engine", {})
+        if self not in engines:
+            engines[self] = {"firing": {}, "last": {}}
+        return engines[self]
+
+    def _apply(self, staged: Dict[str, Dict]):
+        for key, value in staged["firing"].items():
+            if value is None:
+                self._firing.pop(key, None)
+            else:
+                self._firing[key] = value
+        for inverter_id, timestamp in staged["last"].items():
+            last = self._last_timestamp.get(inverter_id)
+            if last is None or timestamp > last:
+                self._last_timestamp[inverter_id] = timestamp
+
+    def evaluate(self, db: Session, inverter_id: int, timestamp: datetime, sample: Any) -> List[Alert]:
+        """Alertas novos para uma medição (objeto ou dicionário)
+
+        Os alertas são adicionados à sessão; o commit fica a cargo do
+        chamador, na mesma transação da medição. Medições mais antigas que
+        a última avaliada (reenvio de histórico) são ignoradas.
+        """
+        staged = self._staged(db)
+        last = staged["last"].get(inverter_id, self._last_timestamp.get(inverter_id))
+        if last is not None and timestamp < last:
+            return []
+        staged["last"][inverter_id] = timestamp
+
+        firing = staged["firing"]
+        alerts = []
+        for rule in self.rules:
+            key = (inverter_id, rule.alert_type)
+            value = _sample_value(sample, rule.field)
+            matched = rule.check(value)
+            if matched is None:
+                continue
+            current = firing[key] if key in firing else self._firing.get(key)
+            if not matched:
+                if current is not None:
+                    firing[key] = None
+                continue
+            value = float(value)
+            if current is not None and (not rule.per_value or current == value):
+                continue
+            firing[key] = value
+            index_key = alert_key(rule.alert_type, inverter_id, value=value)
+            if alert_index.is_active(index_key, db):
+                continue
+            alert = rule.build_alert(inverter_id, value)
+            db.add(alert)
+            alert_index.reserve(db, index_key)
+            alerts.append(alert)
+        return alerts
+
+
+# Instância global do motor de regras
+alert_engine = AlertEngine(compile_rules(ALARM_CONFIG))
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_engine_state(session: Session):
+    for engine, staged in session.info.pop("alert_engine", {}).items():
+        engine._apply(staged)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_engine_state(session: Session):
+    session.info.pop("alert_engine", None)
@@ -5,11 +5,14 @@ Serviço de alertas do sistema de monitoramento solar
 import logging
 from datetime import datetime, timedelta
 from typing import Dict, Any, Optional, List
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 
 from ..config import settings, ALARM_CONFIG
 from ..database import SessionLocal
 from ..models import Alert, Inverter, InverterMeasurement, Logger, LoggerMeasurement
+from .alert_index import alert_index, alert_key
+from .data_versions import data_versions
 
 logger = logging.getLogger(__name__)
 
@@ -20,22 +23,17 @@ class AlertService:
         self.last_alert_check = None
         
     async def check_alerts(self):
-        """Verificar e criar alertas baseados nas condições atuais"""
+        """Verificar alertas que dependem da ausência de dados
+        
+        Os alertas das medições (produção, temperatura, falhas e status) são
+        avaliados na ingestão pelo motor de regras (alert_rules).
+        """
         try:
             db = SessionLocal()
             
-            # Verificar alertas de baixa produção
-            await self._check_low_production_alerts(db)
-            
-            # Verificar alertas de temperatura alta
-            await self._check_high_temperature_alerts(db)
-            
             # Verificar alertas de comunicação
             await self._check_communication_alerts(db)
             
-            # Verificar alertas de falha
-            await self._check_fault_alerts(db)
-            
             self.last_alert_check = datetime.utcnow()
             db.commit()
             
@@ -45,212 +43,60 @@ class AlertService:
         finally:
             db.close()
             
-    async def _check_low_production_alerts(self, db: Session):
-        """Verificar alertas de baixa produção"""
-        if not ALARM_CONFIG["low_production"]["enabled"]:
-            return
-            
-        try:
-            threshold = ALARM_CONFIG["low_production"]["threshold"]
-            message = ALARM_CONFIG["low_production"]["message"]
-            
-            # Obter inversor
-            inverter = db.query(Inverter).first()
-            if not inverter:
-                return
-                
-            # Obter última medição
-            latest_measurement = db.query(InverterMeasurement)\
-                .filter(InverterMeasurement.inverter_id == inverter.id)\
-                .order_by(InverterMeasurement.timestamp.desc())\
-                .first()
-                
-            if not latest_measurement or not latest_measurement.power_output:
-                return
-                
-            # Verificar se a produção está abaixo do threshold
-            if latest_measurement.power_output < threshold:
-                # Verificar se já existe alerta ativo
-                existing_alert = db.query(Alert)\
-                    .filter(Alert.inverter_id == inverter.id)\
-                    .filter(Alert.alert_type == "low_production")\
-                    .filter(Alert.resolved == False)\
-                    .first()
-                    
-                if not existing_alert:
-                    await self.create_alert(
-                        alert_type="low_production",
-                        severity="medium",
-                        message=message,
-                        value=latest_measurement.power_output,
-                        threshold=threshold,
-                        inverter_id=inverter.id
-                    )
-                    
-        except Exception as e:
-            logger.error(f"Erro ao verificar alertas de baixa produção: {e}")
-            
-    async def _check_high_temperature_alerts(self, db: Session):
-        """Verificar alertas de temperatura alta"""
-        if not ALARM_CONFIG["high_temperature"]["enabled"]:
-            return
-            
-        try:
-            threshold = ALARM_CONFIG["high_temperature"]["threshold"]
-            message = ALARM_CONFIG["high_temperature"]["message"]
-            
-            # Obter inversor
-            inverter = db.query(Inverter).first()
-            if not inverter:
-                return
-                
-            # Obter última medição
-            latest_measurement = db.query(InverterMeasurement)\
-                .filter(InverterMeasurement.inverter_id == inverter.id)\
-                .order_by(InverterMeasurement.timestamp.desc())\
-                .first()
-                
-            if not latest_measurement or not latest_measurement.temperature:
-                return
-                
-            # Verificar se a temperatura está acima do threshold
-            if latest_measurement.temperature > threshold:
-                # Verificar se já existe alerta ativo
-                existing_alert = db.query(Alert)\
-                    .filter(Alert.inverter_id == inverter.id)\
-                    .filter(Alert.alert_type == "high_temperature")\
-                    .filter(Alert.resolved == False)\
-                    .first()
-                    
-                if not existing_alert:
-                    await self.create_alert(
-                        alert_type="high_temperature",
-                        severity="high",
-                        message=message,
-                        value=latest_measurement.temperature,
-                        threshold=threshold,
-                        inverter_id=inverter.id
-                    )
-                    
-        except Exception as e:
-            logger.error(f"Erro ao verificar alertas de temperatura alta: {e}")
-            
     async def _check_communication_alerts(self, db: Session):
-        """Verificar alertas de comunicação"""
+        """Verificar alertas de comunicação (por inversor e por logger)"""
         if not ALARM_CONFIG["communication_error"]["enabled"]:
             return
             
         try:
             timeout_threshold = ALARM_CONFIG["communication_error"]["timeout"]
             message = ALARM_CONFIG["communication_error"]["message"]
+            now = datetime.utcnow()
             
-            # Verificar última atualização do inversor
-            latest_inverter_measurement = db.query(InverterMeasurement)\
-                .order_by(InverterMeasurement.timestamp.desc())\
-                .first()
-                
-            if latest_inverter_measurement:
-                time_diff = datetime.utcnow() - latest_inverter_measurement.timestamp
-                if time_diff.total_seconds() > timeout_threshold:
-                    # Verificar se já existe alerta ativo
-                    existing_alert = db.query(Alert)\
-                        .filter(Alert.alert_type == "communication_error")\
-                        .filter(Alert.resolved == False)\
-                        .first()
-                        
-                    if not existing_alert:
-                        await self.create_alert(
-                            alert_type="communication_error",
-                            severity="high",
-                            message=f"{message} - Última atualização: {time_diff.total_seconds():.0f}s atrás"
-                        )
-                        
-            # Verificar última atualização do logger
-            latest_logger_measurement = db.query(LoggerMeasurement)\
-                .order_by(LoggerMeasurement.timestamp.desc())\
-                .first()
-                
-            if latest_logger_measurement:
-                time_diff = datetime.utcnow() - latest_logger_measurement.timestamp
-                if time_diff.total_seconds() > timeout_threshold:
-                    # Verificar se já existe alerta ativo
-                    existing_alert = db.query(Alert)\
-                        .filter(Alert.alert_type == "logger_communication_error")\
-                        .filter(Alert.resolved == False)\
-                        .first()
-                        
-                    if not existing_alert:
-                        await self.create_alert(
-                            alert_type="logger_communication_error",
-                            severity="medium",
-                            message=f"Erro de comunicação com logger - Última atualização: {time_diff.total_seconds():.0f}s atrás"
-                        )
-                        
-        except Exception as e:
-            logger.error(f"Erro ao verificar alertas de comunicação: {e}")
-            
-    async def _check_fault_alerts(self, db: Session):
-        """Verificar alertas de falha"""
-        if not ALARM_CONFIG["fault_detected"]["enabled"]:
-            return
-            
-        try:
-            message = ALARM_CONFIG["fault_detected"]["message"]
-            
-            # Obter inversor
-            inverter = db.query(Inverter).first()
-            if not inverter:
-                return
-                
-            # Obter última medição
-            latest_measurement = db.query(InverterMeasurement)\
-                .filter(InverterMeasurement.inverter_id == inverter.id)\
-                .order_by(InverterMeasurement.timestamp.desc())\
-                .first()
-                
-            if not latest_measurement:
-                return
-                
-            # Verificar códigos de falha
-            if latest_measurement.fault_code and latest_measurement.fault_code > 0:
-                # Verificar se já existe alerta ativo para esta falha
-                existing_alert = db.query(Alert)\
-                    .filter(Alert.inverter_id == inverter.id)\
-                    .filter(Alert.alert_type == "fault_detected")\
-                    .filter(Alert.value == latest_measurement.fault_code)\
-                    .filter(Alert.resolved == False)\
-                    .first()
-                    
-                if not existing_alert:
+            # Última medição de cada inversor: em memória; o banco só é
+            # consultado para inversores ainda não vistos desde o início
+            inverter_ids = [row.id for row in db.query(Inverter.id)]
+            latest = {inverter_id: data_versions.last_measurement(inverter_id) for inverter_id in inverter_ids}
+            missing = [inverter_id for inverter_id, timestamp in latest.items() if timestamp is None]
+            if missing:
+                found = dict(
+                    db.query(InverterMeasurement.inverter_id, func.max(InverterMeasurement.timestamp))
+                    .filter(InverterMeasurement.inverter_id.in_(missing))
+                    .group_by(InverterMeasurement.inverter_id)
+                    .all()
+                )
+                data_versions.observe(found)
+                latest.update(found)
+            
+            for inverter_id, timestamp in latest.items():
+                if timestamp is None:
+                    continue
+                time_diff = (now - timestamp).total_seconds()
+                if time_diff > timeout_threshold:
                     await self.create_alert(
-                        alert_type="fault_detected",
-                        severity="critical",
-                        message=f"{message} - Código: {latest_measurement.fault_code}",
-                        value=latest_measurement.fault_code,
-                        inverter_id=inverter.id
+                        alert_type="communication_error",
+                        severity="high",
+                        message=f"{message} - Última atualização: {time_diff:.0f}s atrás",
+                        inverter_id=inverter_id
                     )
                     
-            # Verificar status do inversor
-            if latest_measurement.status_code and latest_measurement.status_code != 1:
-                # Status diferente de 1 pode indicar problema
-                existing_alert = db.query(Alert)\
-                    .filter(Alert.inverter_id == inverter.id)\
-                    .filter(Alert.alert_type == "status_warning")\
-                    .filter(Alert.value == latest_measurement.status_code)\
-                    .filter(Alert.resolved == False)\
-                    .first()
-                    
-                if not existing_alert:
+            # Verificar última atualização de cada logger
+            logger_rows = db.query(LoggerMeasurement.logger_id, func.max(LoggerMeasurement.timestamp))\
+                .group_by(LoggerMeasurement.logger_id)\
+                .all()
+                
+            for logger_id, timestamp in logger_rows:
+                time_diff = (now - timestamp).total_seconds()
+                if time_diff > timeout_threshold:
                     await self.create_alert(
-                        alert_type="status_warning",
+                        alert_type="logger_communication_error",
                         severity="medium",
-                        message=f"Status anômalo do inversor - Código: {latest_measurement.status_code}",
-                        value=latest_measurement.status_code,
-                        inverter_id=inverter.id
+                        message=f"Erro de comunicação com logger - Última atualização: {time_diff:.0f}s atrás",
+                        logger_id=logger_id
                     )
-                    
+                        
         except Exception as e:
-            logger.error(f"Erro ao verificar alertas de falha: {e}")
+            logger.error(f"Erro ao verificar alertas de comunicação: {e}")
             
     async def create_alert(
         self,
@@ -261,8 +107,11 @@ class AlertService:
         threshold: Optional[float] = None,
         inverter_id: Optional[int] = None,
         logger_id: Optional[int] = None
-    ) -> Alert:
-        """Criar novo alerta"""
+    ) -> Optional[Alert]:
+        """Criar novo alerta (None se já houver um igual não resolvido)"""
+        if alert_index.is_active(alert_key(alert_type, inverter_id, logger_id, value)):
+            return None
+        
         db = SessionLocal()
         try:
             alert = Alert(
@@ -280,11 +129,7 @@ class AlertService:
             db.commit()
             db.refresh(alert)
             
-            logger.info(f"Alerta criado: {alert_type} - {message}")
-            
-            # Aqui você pode adicionar lógica para enviar notificações
-            # (email, SMS, webhook, etc.)
-            await self._send_notification(alert)
+            await self.notify_created(alert)
             
             return alert
             
@@ -295,6 +140,14 @@ class AlertService:
         finally:
             db.close()
             
+    async def notify_created(self, alert: Alert):
+        """Registrar e notificar um alerta já gravado"""
+        logger.info(f"Alerta criado: {alert.alert_type} - {alert.message}")
+        
+        # Aqui você pode adicionar lógica para enviar notificações
+        # (email, SMS, webhook, etc.)
+        await self._send_notification(alert)
+            
     async def _send_notification(self, alert: Alert):
         """Enviar notificação do alerta"""
         try:
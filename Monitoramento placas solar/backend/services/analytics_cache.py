@@ -0,0 +1,200 @@
+"""
+Cache de resultados das análises
+
+Os resultados são indexados por (endpoint, parâmetros, marca d'água dos
+dados), onde a marca d'água é o último id de medição do inversor consultado.
+Enquanto nenhuma medição nova chegar, a mesma resposta é reutilizada.
+
+Além disso, agregados de dias já encerrados são guardados separadamente:
+quando chegam poucas amostras novas, só o dia corrente precisa ser
+recalculado.
+"""
+
+import functools
+import logging
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, Hashable, List, Optional
+
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from ..config import settings
+from ..models import InverterMeasurement
+
+logger = logging.getLogger(__name__)
+
+# Marcador para dias encerrados sem nenhuma medição
+_EMPTY_DAY: Dict[str, Any] = {}
+
+
+class AnalyticsCache:
+    """Cache LRU com limite de entradas e de memória"""
+
+    def __init__(self, max_entries: int, max_bytes: int, ttl: int):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def data_watermark(self, db: Session, inverter_id: Optional[int] = None) -> Optional[int]:
+        """Último id de medição (do inversor, ou de todos se não informado)"""
+        query = db.query(InverterMeasurement.id)
+        if inverter_id:
+            query = query.filter(InverterMeasurement.inverter_id == inverter_id)
+        row = query.order_by(InverterMeasurement.id.desc()).limit(1).first()
+        return row[0] if row else None
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Obter valor do cache (None se ausente ou expirado)"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, size, expires_at = entry
+            if expires_at is not None and expires_at < time.monotonic():
+                self._remove(key)
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[int] = None):
+        """Guardar valor no cache, removendo os menos usados se necessário"""
+        try:
+            size = len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        except Exception as e:
+            logger.warning(f"Resultado não armazenável no cache: {e}")
+            return
+        if size > self.max_bytes:
+            return
+
+        expires_at = time.monotonic() + ttl if ttl else None
+        with self._lock:
+            if key in self._entries:
+                self._remove(key)
+            self._entries[key] = (value, size, expires_at)
+            self._size += size
+            while len(self._entries) > self.max_entries or self._size > self.max_bytes:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+
+    def invalidate(self, inverter_id: Optional[int] = None):
+        """Descartar entradas (de um inversor e agregados gerais, ou todas)"""
+        with self._lock:
+            if inverter_id is None:
+                self._entries.clear()
+                self._size = 0
+                return
+            for key in list(self._entries):
+                if key[0] == "day" and key[2] not in (None, inverter_id):
+                    continue
+                self._remove(key)
+
+    def stats(self) -> Dict[str, Any]:
+        """Estatísticas de uso do cache"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses
+            }
+
+    def _remove(self, key: Hashable):
+        _, size, _ = self._entries.pop(key)
+        self._size -= size
+
+    def get_daily_rows(
+        self,
+        namespace: str,
+        inverter_id: Optional[int],
+        start: datetime,
+        end: datetime,
+        compute: Callable[[datetime, datetime], List[Dict[str, Any]]]
+    ) -> List[Dict[str, Any]]:
+        """Obter agregados diários de [start, end), recalculando só o necessário
+
+        `compute(inicio, fim)` deve devolver uma linha por dia com a chave
+        "date" (AAAA-MM-DD). O primeiro dia (parcial, depende de `start`) e o
+        dia corrente são sempre recalculados; dias encerrados vêm do cache.
+        Um dia só é considerado encerrado ENERGY_MAX_GAP_SECONDS após a
+        meia-noite seguinte: até lá, uma amostra nova ainda integra energia
+        no intervalo que atravessa a virada do dia.
+        """
+        first_closed = datetime(start.year, start.month, start.day) + timedelta(days=1)
+        settled = datetime.utcnow() - timedelta(seconds=settings.ENERGY_MAX_GAP_SECONDS)
+        today = min(datetime(end.year, end.month, end.day), datetime(settled.year, settled.month, settled.day))
+        if first_closed >= end:
+            return compute(start, end)
+
+        rows = {row["date"]: row for row in compute(start, first_closed)}
+
+        # Dias encerrados: usar cache até o primeiro dia ausente
+        day = first_closed
+        while day < today:
+            cached = self.get(("day", namespace, inverter_id, day.date().isoformat()))
+            if cached is None:
+                break
+            if cached:
+                rows[cached["date"]] = cached
+            day += timedelta(days=1)
+
+        computed = {row["date"]: row for row in compute(day, end)}
+        rows.update(computed)
+
+        # Guardar os dias encerrados recém calculados
+        while day < today:
+            date_key = day.date().isoformat()
+            self.set(("day", namespace, inverter_id, date_key), computed.get(date_key, _EMPTY_DAY))
+            day += timedelta(days=1)
+
+        return [rows[date_key] for date_key in sorted(rows)]
+
+
+# Instância global do cache
+analytics_cache = AnalyticsCache(
+    max_entries=settings.ANALYTICS_CACHE_MAX_ENTRIES,
+    max_bytes=settings.ANALYTICS_CACHE_MAX_BYTES,
+    ttl=settings.CACHE_TTL
+)
+
+
+def cached_analytics(endpoint: str):
+    """Decorator para memorizar respostas de endpoints de análise
+
+    A chave combina o endpoint, os parâmetros da requisição (exceto a sessão)
+    e a marca d'água dos dados; entradas expiram após CACHE_TTL segundos.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        async def wrapper(*args, **kwargs):
+            db = kwargs.get("db")
+            params = tuple(sorted((k, v) for k, v in kwargs.items() if k != "db"))
+            try:
+                watermark = await run_in_threadpool(analytics_cache.data_watermark, db, kwargs.get("inverter_id"))
+            except Exception as e:
+                logger.warning(f"Erro ao obter marca d'água das análises: {e}")
+                return await func(*args, **kwargs)
+
+            key = (endpoint, params, watermark)
+            result = analytics_cache.get(key)
+            if result is not None:
+                return result
+
+            result = await func(*args, **kwargs)
+            analytics_cache.set(key, result, ttl=analytics_cache.ttl)
+            return result
+        return wrapper
+    return decorator
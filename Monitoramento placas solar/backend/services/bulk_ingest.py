@@ -0,0 +1,337 @@
+"""
+Ingestão em lote de medições enviadas por coletores remotos
+
+Um lote chega como NDJSON (uma amostra por linha), JSON ou MessagePack
+(lista de amostras ou colunas), opcionalmente com gzip. A validação é feita
+por coluna com pandas e as linhas válidas são gravadas com uma única
+instrução INSERT por lote. A ingestão é idempotente em (dispositivo,
+timestamp): amostras já gravadas são ignoradas, então reenvios e
+reprocessamento de backlog são seguros.
+
+A idempotência vem do índice único (inversor, timestamp) com ON CONFLICT
+DO NOTHING, e o RETURNING indica as linhas realmente inseridas. Só quando o
+índice não existe (não pôde ser criado sobre dados antigos) ou o banco não
+tem ON CONFLICT as chaves já gravadas são lidas antes do INSERT.
+"""
+
+import json
+import logging
+import zlib
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import func, insert, tuple_
+from sqlalchemy.orm import Session
+
+from ..database import missing_indexes
+from ..models import Inverter, InverterMeasurement
+from .alert_rules import alert_engine
+from .analytics_cache import analytics_cache
+from .change_feed import record_changes
+from .data_versions import data_versions
+from .efficiency_stats import efficiency_accumulator
+from .energy_accumulator import energy_accumulator
+from .financial_engine import financial_engine
+from .live_broker import live_broker
+from .measurement_stats import measurement_stats
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - dependência opcional
+    msgpack = None
+
+logger = logging.getLogger(__name__)
+
+# Campos aceitos por amostra (além de device e timestamp). Outros campos, como
+# o site enviado pelo coletor remoto, são descartados: o número de série
+# identifica o inversor em qualquer usina
+FLOAT_FIELDS = [
+    "power_output", "energy_daily", "energy_total",
+    "voltage_dc", "current_dc", "voltage_ac", "current_ac", "frequency",
+    "temperature", "efficiency"
+]
+INTEGER_FIELDS = ["status_code", "fault_code", "uptime"]
+
+# Nomes dos registros Modbus que diferem das colunas
+FIELD_ALIASES = {"status": "status_code", "serial_number": "device"}
+
+# Índice único que torna o INSERT idempotente
+UNIQUE_INDEX = "uq_inverter_measurements_inverter_timestamp"
+
+MAX_FUTURE_SKEW = timedelta(minutes=5)
+MAX_REPORTED_ERRORS = 20
+
+INGEST_CONTENT_TYPES = {
+    "application/x-ndjson": "ndjson",
+    "application/ndjson": "ndjson",
+    "application/jsonl": "ndjson",
+    "application/json": "json",
+    "application/msgpack": "msgpack",
+    "application/x-msgpack": "msgpack",
+}
+
+
+def msgpack_available() -> bool:
+    return msgpack is not None
+
+
+def decompress(body: bytes, max_bytes: int) -> bytes:
+    """Descompactar gzip limitando o tamanho descompactado"""
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+    data = decompressor.decompress(body, max_bytes)
+    if decompressor.unconsumed_tail:
+        raise ValueError(f"Lote excede {max_bytes} bytes descompactado")
+    return data
+
+
+def parse_batch(body: bytes, format: str) -> pd.DataFrame:
+    """Converter o corpo do lote numa tabela (uma linha por amostra)"""
+    try:
+        if format == "ndjson":
+            records = [json.loads(line) for line in body.splitlines() if line.strip()]
+            return pd.DataFrame.from_records(records)
+        if format == "json":
+            payload = json.loads(body)
+        elif format == "msgpack":
+            if not msgpack_available():
+                raise ValueError("Formato MessagePack requer o pacote msgpack")
+            payload = msgpack.unpackb(body, raw=False)
+        else:
+            raise ValueError(f"Formato de lote inválido: {format}")
+    except json.JSONDecodeError as e:
+        raise ValueError(f"Lote mal formado: {e}")
+    except ValueError:
+        raise
+    except Exception as e:
+        raise ValueError(f"Lote mal formado: {e}")
+
+    # Lista de amostras ou dicionário de colunas
+    if isinstance(payload, list):
+        return pd.DataFrame.from_records(payload)
+    if isinstance(payload, dict):
+        try:
+            return pd.DataFrame(payload)
+        except ValueError as e:
+            raise ValueError(f"Colunas do lote com tamanhos diferentes: {e}")
+    raise ValueError("Lote deve ser uma lista de amostras ou um objeto de colunas")
+
+
+def _parse_timestamps(values: pd.Series) -> pd.Series:
+    """Timestamps ISO 8601 ou época em segundos -> UTC sem fuso"""
+    numeric = pd.to_numeric(values, errors="coerce")
+    parsed = pd.Series(pd.NaT, index=values.index, dtype="datetime64[ns, UTC]")
+    is_epoch = numeric.notna()
+    if is_epoch.any():
+        parsed[is_epoch] = pd.to_datetime(numeric[is_epoch], unit="s", utc=True, errors="coerce")
+    if (~is_epoch).any():
+        parsed[~is_epoch] = pd.to_datetime(
+            values[~is_epoch].astype("string"), utc=True, errors="coerce", format="ISO8601"
+        )
+    return parsed.dt.tz_localize(None)
+
+
+def validate_batch(frame: pd.DataFrame) -> Tuple[pd.DataFrame, int, List[Dict[str, Any]]]:
+    """Validar as amostras por coluna
+
+    Retorna as amostras válidas (sem duplicatas no próprio lote), o número
+    de amostras rejeitadas e os primeiros erros (linha começando em 1 e motivo).
+    """
+    frame = frame.rename(columns=FIELD_ALIASES)
+    errors = pd.Series("", index=frame.index, dtype=object)
+
+    def reject(mask: pd.Series, reason: str):
+        errors[mask & (errors == "")] = reason
+
+    if "device" not in frame:
+        frame["device"] = None
+    if "timestamp" not in frame:
+        frame["timestamp"] = None
+
+    device = frame["device"].astype("string").str.strip()
+    reject(device.isna() | (device == ""), "dispositivo ausente")
+    reject(device.str.len() > 50, "dispositivo com mais de 50 caracteres")
+
+    timestamp = _parse_timestamps(frame["timestamp"])
+    reject(timestamp.isna(), "timestamp inválido")
+    reject(timestamp > datetime.utcnow() + MAX_FUTURE_SKEW, "timestamp no futuro")
+
+    clean = pd.DataFrame({"device": device, "timestamp": timestamp})
+    for field in FLOAT_FIELDS + INTEGER_FIELDS:
+        if field not in frame:
+            clean[field] = np.nan
+            continue
+        values = pd.to_numeric(frame[field], errors="coerce")
+        reject(values.isna() & frame[field].notna(), f"{field} não numérico")
+        if field in INTEGER_FIELDS:
+            reject(values.notna() & (values % 1 != 0), f"{field} deve ser inteiro")
+        clean[field] = values.astype(np.float64)
+
+    valid = errors == ""
+    error_list = [
+        {"line": int(position) + 1, "error": errors.iloc[position]}
+        for position in np.flatnonzero(~valid.to_numpy())[:MAX_REPORTED_ERRORS]
+    ]
+    clean = clean[valid].drop_duplicates(["device", "timestamp"], keep="last")
+    return clean, int((~valid).sum()), error_list
+
+
+def _inverter_ids(db: Session, devices: List[str]) -> Dict[str, int]:
+    """Ids dos inversores por número de série, registrando os novos"""
+    known = dict(
+        db.query(Inverter.serial_number, Inverter.id)
+        .filter(Inverter.serial_number.in_(devices))
+        .all()
+    )
+    missing = [device for device in devices if device not in known]
+    for device in missing:
+        inverter = Inverter(serial_number=device, model="Remoto")
+        db.add(inverter)
+        db.flush()
+        known[device] = inverter.id
+        logger.info(f"Inversor remoto registrado: {device}")
+    return known
+
+
+def _needs_precheck(db: Session) -> bool:
+    """Duplicatas precisam ser filtradas antes do INSERT (sem índice único ou ON CONFLICT)"""
+    return db.bind.dialect.name not in ("sqlite", "postgresql") or UNIQUE_INDEX in missing_indexes
+
+
+def _drop_stored(db: Session, samples: pd.DataFrame) -> pd.DataFrame:
+    """Descartar amostras já gravadas, lendo as chaves do período do lote"""
+    existing = db.query(InverterMeasurement.inverter_id, InverterMeasurement.timestamp)\
+        .filter(InverterMeasurement.inverter_id.in_([int(i) for i in samples["inverter_id"].unique()]))\
+        .filter(InverterMeasurement.timestamp >= samples["timestamp"].min().to_pydatetime())\
+        .filter(InverterMeasurement.timestamp <= samples["timestamp"].max().to_pydatetime())\
+        .all()
+    if not existing:
+        return samples
+    existing_keys = pd.MultiIndex.from_tuples(existing, names=["inverter_id", "timestamp"])
+    batch_keys = pd.MultiIndex.from_frame(samples[["inverter_id", "timestamp"]])
+    return samples[~batch_keys.isin(existing_keys)]
+
+
+def _runs(timestamps: List[datetime], floor: Callable[[datetime], datetime], step: timedelta) -> List[Tuple[datetime, datetime]]:
+    """Trechos (início, fim) de amostras em horas ou dias consecutivos
+
+    Amostras separadas por uma hora (ou dia) sem dados novos ficam em
+    trechos diferentes: um reenvio esparso não recalcula o intervalo todo.
+    """
+    runs: List[List[datetime]] = []
+    for timestamp in sorted(timestamps):
+        if runs and floor(timestamp) - floor(runs[-1][1]) <= step:
+            runs[-1][1] = timestamp
+        else:
+            runs.append([timestamp, timestamp])
+    return [(start, end) for start, end in runs]
+
+
+def _hour(timestamp: datetime) -> datetime:
+    return timestamp.replace(minute=0, second=0, microsecond=0)
+
+
+def _day(timestamp: datetime) -> datetime:
+    return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def ingest_batch(db: Session, samples: pd.DataFrame) -> Dict[str, int]:
+    """Gravar amostras válidas com um INSERT por lote e atualizar os acumuladores"""
+    if samples.empty:
+        return {"inserted": 0, "duplicates": 0}
+
+    ids = _inverter_ids(db, samples["device"].unique().tolist())
+    samples = samples.assign(inverter_id=samples["device"].map(ids).astype(np.int64))
+
+    received = len(samples)
+
+    if _needs_precheck(db):
+        samples = _drop_stored(db, samples)
+        if samples.empty:
+            db.commit()
+            return {"inserted": 0, "duplicates": received}
+
+    columns = ["inverter_id", "timestamp"] + FLOAT_FIELDS + INTEGER_FIELDS
+    records = samples[columns].astype(object).where(samples[columns].notna(), None).to_dict("records")
+    for record, timestamp in zip(records, list(samples["timestamp"].dt.to_pydatetime())):
+        record["timestamp"] = timestamp
+        record["inverter_id"] = int(record["inverter_id"])
+        for field in INTEGER_FIELDS:
+            if record[field] is not None:
+                record[field] = int(record[field])
+
+    # Amostras já gravadas (reenvios, backlog) são ignoradas pelo índice único
+    stmt = insert(InverterMeasurement)
+    dialect = db.bind.dialect.name
+    if dialect == "sqlite":
+        from sqlalchemy.dialects.sqlite import insert as dialect_insert
+        stmt = dialect_insert(InverterMeasurement).on_conflict_do_nothing()
+    elif dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        stmt = dialect_insert(InverterMeasurement).on_conflict_do_nothing()
+    key_columns = (InverterMeasurement.id, InverterMeasurement.inverter_id, InverterMeasurement.timestamp)
+    if db.bind.dialect.insert_executemany_returning:
+        # Só as linhas realmente inseridas voltam no RETURNING
+        rows = db.execute(stmt.returning(*key_columns), records).all()
+    else:
+        # Sem RETURNING: as linhas do lote com id acima do maior anterior são as novas
+        before = db.query(func.max(InverterMeasurement.id)).scalar() or 0
+        db.execute(stmt, records)
+        rows = db.query(*key_columns)\
+            .filter(InverterMeasurement.id > before)\
+            .filter(tuple_(InverterMeasurement.inverter_id, InverterMeasurement.timestamp).in_(
+                [(record["inverter_id"], record["timestamp"]) for record in records]
+            ))\
+            .all()
+    ids = [row.id for row in rows]
+    inserted = len(ids)
+    if not inserted:
+        db.commit()
+        return {"inserted": 0, "duplicates": received}
+    record_changes(db, "measurement", ids)
+
+    # Regras de alerta só nas medições inseridas agora, em ordem, na mesma transação
+    inserted_keys = {(row.inverter_id, row.timestamp) for row in rows}
+    new_records = [record for record in records if (record["inverter_id"], record["timestamp"]) in inserted_keys]
+    alerts = []
+    for record in sorted(new_records, key=lambda record: record["timestamp"]):
+        alerts += alert_engine.evaluate(db, record["inverter_id"], record["timestamp"], record)
+    created = [(alert.alert_type, alert.message) for alert in alerts]
+
+    # Instantes das medições inseridas de cada inversor
+    inserted_times: Dict[int, List[datetime]] = {}
+    for row in rows:
+        inserted_times.setdefault(row.inverter_id, []).append(row.timestamp)
+
+    # Recalcular só as horas e dias que receberam medições
+    today = _day(datetime.utcnow())
+    max_gap = timedelta(seconds=energy_accumulator.max_gap_seconds)
+    for inverter_id, timestamps in inserted_times.items():
+        for start, end in _runs(timestamps, _hour, timedelta(hours=1)):
+            energy_accumulator.rebuild(db, inverter_id, start, end)
+        for start, end in _runs(timestamps, _day, timedelta(days=1)):
+            efficiency_accumulator.rebuild(db, inverter_id, start, end)
+            measurement_stats.rebuild(db, inverter_id, start, end)
+        if min(timestamps) - max_gap < today:
+            # Dias encerrados mudaram: descartar agregados em cache
+            analytics_cache.invalidate(inverter_id)
+            financial_engine.invalidate(inverter_id)
+    db.commit()
+    for alert_type, message in created:
+        logger.info(f"Alerta criado: {alert_type} - {message}")
+
+    # INSERT direto não passa pelos eventos da sessão: avançar as versões aqui
+    latest = {inverter_id: max(timestamps) for inverter_id, timestamps in inserted_times.items()}
+    data_versions.measurements_saved(latest)
+
+    # Publicar ao vivo só quando o lote traz a medição mais recente (não em backlog)
+    for inverter_id, timestamp in latest.items():
+        newest = db.query(InverterMeasurement)\
+            .filter(InverterMeasurement.inverter_id == inverter_id)\
+            .order_by(InverterMeasurement.timestamp.desc(), InverterMeasurement.id.desc())\
+            .first()
+        if newest and newest.timestamp == timestamp:
+            live_broker.publish_measurement(inverter_id, newest)
+
+    return {"inserted": inserted, "duplicates": received - inserted}
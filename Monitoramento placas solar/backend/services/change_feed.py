@@ -0,0 +1,221 @@
+"""
+Registro de alterações para sincronização incremental
+
+Cada inserção, alteração ou remoção de medições, alertas e resumos feita
+pela sessão é anotada no flush (a ingestão em lote, que usa INSERT direto,
+anota as medições inseridas explicitamente) e gravada em change_log na
+mesma transação, imediatamente antes do commit. O id de change_log é uma
+sequência monotônica: o token entregue ao consumidor é a última posição
+lida e a leitura seguinte começa logo depois dela, com custo proporcional
+apenas às alterações novas.
+
+Ids são atribuídos na inserção, não no commit: com escritores simultâneos,
+uma transação com id menor pode terminar depois de uma com id maior. Por
+isso as linhas só são entregues CHANGE_FEED_SETTLE_SECONDS após gravadas;
+como são gravadas já no fim da transação, o atraso só precisa cobrir o
+próprio commit.
+
+Linhas mais antigas que CHANGE_FEED_RETENTION_DAYS são removidas
+diariamente. Um token anterior ao trecho removido não pode ser retomado:
+a leitura falha com ChangeFeedExpiredError, que informa a posição atual
+para o consumidor recomeçar após uma sincronização completa.
+
+Os dados devolvidos são o estado atual de cada linha (null se removida).
+Resumos horários recalculados aparecem como remoção das linhas antigas e
+inserção das novas.
+"""
+
+import base64
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..models import Alert, ChangeLog, Configuration, DailySummary, HourlyEnergySummary, InverterMeasurement
+
+logger = logging.getLogger(__name__)
+
+# Nome da entidade no feed -> modelo
+CHANGE_ENTITIES = {
+    "measurement": InverterMeasurement,
+    "alert": Alert,
+    "hourly_energy": HourlyEnergySummary,
+    "daily_summary": DailySummary,
+}
+
+_ENTITY_NAMES = {model: name for name, model in CHANGE_ENTITIES.items()}
+
+# Máximo de alterações por leitura
+MAX_CHANGES = 10000
+
+# Chave em configurations com a última posição removida pela limpeza
+PRUNED_POSITION_KEY = "change_feed_pruned_through"
+
+
+class ChangeFeedExpiredError(Exception):
+    """Token anterior ao trecho ainda guardado do registro"""
+
+    def __init__(self, position: int):
+        super().__init__("Token de alterações expirado: sincronização completa necessária")
+        self.position = position
+
+
+def encode_token(position: int) -> str:
+    """Token opaco para a posição no registro de alterações"""
+    payload = json.dumps([position], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_token(token: Optional[str]) -> int:
+    """Posição de um token (0 = início); ValueError se inválido"""
+    if not token:
+        return 0
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        (position,) = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return int(position)
+    except Exception:
+        raise ValueError("Token de alterações inválido")
+
+
+def parse_entities(value: Optional[str]) -> Optional[List[str]]:
+    """Lista "measurement,alert" validada; vazio = todas"""
+    if not value:
+        return None
+    names = [name.strip() for name in value.split(",") if name.strip()]
+    invalid = [name for name in names if name not in CHANGE_ENTITIES]
+    if invalid:
+        raise ValueError(f"Entidades inválidas: {', '.join(invalid)}")
+    return names
+
+
+def _stage(session: Session, entity: str, entity_id: int, operation: str):
+    # Dicionário ordenado: a mesma alteração anotada em vários flushes vira uma linha
+    session.info.setdefault("change_log", {})[(entity, int(entity_id), operation)] = None
+
+
+def record_changes(db: Session, entity: str, ids: Iterable[int], operation: str = "insert"):
+    """Registrar alterações feitas fora da sessão ORM (gravadas no commit do chamador)"""
+    for entity_id in ids:
+        _stage(db, entity, entity_id, operation)
+
+
+def pruned_position(db: Session) -> int:
+    """Última posição removida pela limpeza (0 = nenhuma)"""
+    row = db.query(Configuration.value).filter(Configuration.key == PRUNED_POSITION_KEY).first()
+    return int(row[0]) if row else 0
+
+
+def prune_changes(db: Session, retention_days: Optional[int] = None) -> int:
+    """Remover alterações mais antigas que a retenção; retorna quantas"""
+    days = settings.CHANGE_FEED_RETENTION_DAYS if retention_days is None else retention_days
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    through = db.query(func.max(ChangeLog.id)).filter(ChangeLog.created_at < cutoff).scalar()
+    if through is None:
+        return 0
+
+    deleted = db.query(ChangeLog).filter(ChangeLog.id <= through).delete(synchronize_session=False)
+    config = db.query(Configuration).filter(Configuration.key == PRUNED_POSITION_KEY).first()
+    if config is None:
+        config = Configuration(
+            key=PRUNED_POSITION_KEY,
+            description="Última posição removida do registro de alterações",
+            category="change_feed"
+        )
+        db.add(config)
+    config.value = str(max(through, int(config.value or 0)))
+    db.commit()
+    logger.info(f"Registro de alterações: {deleted} linhas anteriores a {cutoff:%Y-%m-%d %H:%M} removidas")
+    return deleted
+
+
+def _current_rows(db: Session, entity: str, ids: Sequence[int]) -> Dict[int, Dict[str, Any]]:
+    model = CHANGE_ENTITIES[entity]
+    rows = db.query(*model.__table__.columns).filter(model.id.in_(ids)).all()
+    return {row.id: dict(row._mapping) for row in rows}
+
+
+def read_changes(
+    db: Session,
+    since: int,
+    limit: int,
+    entities: Optional[List[str]] = None
+) -> Tuple[List[Dict[str, Any]], int, bool]:
+    """Alterações após a posição `since`, em ordem
+
+    Retorna (alterações, posição da última lida, se há mais). Só entrega
+    linhas gravadas há pelo menos CHANGE_FEED_SETTLE_SECONDS.
+    ChangeFeedExpiredError se `since` for anterior ao trecho guardado.
+    """
+    horizon = datetime.utcnow() - timedelta(seconds=settings.CHANGE_FEED_SETTLE_SECONDS)
+    if since < pruned_position(db):
+        head = db.query(func.max(ChangeLog.id)).filter(ChangeLog.created_at <= horizon).scalar()
+        raise ChangeFeedExpiredError(head or pruned_position(db))
+
+    query = db.query(ChangeLog).filter(ChangeLog.id > since).filter(ChangeLog.created_at <= horizon)
+    if entities:
+        query = query.filter(ChangeLog.entity.in_(entities))
+    entries = query.order_by(ChangeLog.id).limit(limit + 1).all()
+    has_more = len(entries) > limit
+    entries = entries[:limit]
+    if not entries:
+        return [], since, False
+
+    ids_by_entity: Dict[str, set] = {}
+    for entry in entries:
+        ids_by_entity.setdefault(entry.entity, set()).add(entry.entity_id)
+    current = {
+        entity: _current_rows(db, entity, sorted(ids))
+        for entity, ids in ids_by_entity.items()
+    }
+
+    changes = [
+        {
+            "seq": entry.id,
+            "entity": entry.entity,
+            "id": entry.entity_id,
+            "operation": entry.operation,
+            "changed_at": entry.created_at,
+            "data": current[entry.entity].get(entry.entity_id)
+        }
+        for entry in entries
+    ]
+    return changes, entries[-1].id, has_more
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changes(session: Session, flush_context):
+    """Anotar as alterações das entidades acompanhadas; gravadas antes do commit"""
+    for instances, operation in ((session.new, "insert"), (session.dirty, "update"), (session.deleted, "delete")):
+        for instance in instances:
+            entity = _ENTITY_NAMES.get(type(instance))
+            if entity is None or instance.id is None:
+                continue
+            if operation == "update" and not session.is_modified(instance, include_collections=False):
+                continue
+            _stage(session, entity, instance.id, operation)
+
+
+@event.listens_for(Session, "before_commit")
+def _log_changes(session: Session):
+    """Gravar as alterações anotadas o mais perto possível do commit"""
+    # O commit só faz o último flush depois deste evento
+    session.flush()
+    staged = session.info.pop("change_log", None)
+    if not staged:
+        return
+    now = datetime.utcnow()
+    rows = [
+        {"entity": entity, "entity_id": entity_id, "operation": operation, "created_at": now}
+        for entity, entity_id, operation in staged
+    ]
+    session.connection().execute(ChangeLog.__table__.insert(), rows)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changes(session: Session):
+    session.info.pop("change_log", None)
@@ -0,0 +1,215 @@
+"""
+Compressão das respostas HTTP (Brotli ou gzip)
+
+Middleware ASGI que comprime respostas a partir de um tamanho mínimo,
+escolhendo a codificação pelo Accept-Encoding do cliente (Brotli quando o
+pacote brotli estiver instalado, senão gzip). Respostas em streaming são
+comprimidas parte a parte com flush, para que cada parte chegue ao cliente
+sem esperar o fim do stream. Streams SSE e conteúdos já comprimidos passam
+sem alteração.
+
+Um ETag forte identifica os bytes exatos da resposta: ao comprimir, ele
+passa a fraco (W/"..."), para que as versões br, gzip e sem compressão não
+compartilhem o mesmo validador forte. A comparação de If-None-Match é
+fraca, então 304 continua funcionando para qualquer codificação. Um 304
+não tem corpo para decidir se haveria compressão: ele repete o ETag na
+forma que o cliente enviou (fraca só se o cliente guardou a versão
+comprimida).
+"""
+
+import zlib
+from typing import Optional, Sequence
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - dependência opcional
+    brotli = None
+
+# Tipos que não devem ser comprimidos (streams ao vivo ou já comprimidos)
+EXCLUDED_MEDIA_TYPES = (
+    "text/event-stream",
+    "application/gzip",
+    "application/zip",
+    "application/vnd.apache.parquet",
+    "image/",
+)
+
+
+def brotli_available() -> bool:
+    return brotli is not None
+
+
+def negotiate_encoding(accept_encoding: str) -> Optional[str]:
+    """Codificação preferida pelo cliente entre "br" e "gzip" (None = nenhuma)"""
+    weights = {}
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        weights[name.strip().lower()] = quality
+
+    candidates = (["br"] if brotli_available() else []) + ["gzip"]
+    best = None
+    for encoding in candidates:
+        quality = weights.get(encoding, weights.get("*", 0.0))
+        if quality > 0 and (best is None or quality > best[1]):
+            best = (encoding, quality)
+    return best[0] if best else None
+
+
+def weaken_etag(headers: MutableHeaders):
+    """Tornar fraco o ETag forte de uma resposta cujos bytes mudam"""
+    etag = headers.get("etag")
+    if etag and not etag.startswith("W/"):
+        headers["ETag"] = f"W/{etag}"
+
+
+def holds_weak_etag(if_none_match: str, etag: Optional[str]) -> bool:
+    """O cliente enviou a forma fraca (comprimida) deste ETag forte"""
+    if not etag or etag.startswith("W/"):
+        return False
+    return f"W/{etag}" in (tag.strip() for tag in if_none_match.split(","))
+
+
+class _Compressor:
+    """Interface comum para gzip e Brotli"""
+
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=brotli_quality)
+        else:
+            self._zlib = zlib.compressobj(gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._brotli.process(data)
+        return self._zlib.compress(data)
+
+    def flush(self) -> bytes:
+        """Dados pendentes, sem encerrar o stream"""
+        if self.encoding == "br":
+            return self._brotli.flush()
+        return self._zlib.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == "br":
+            return self._brotli.finish()
+        return self._zlib.flush()
+
+
+class CompressionMiddleware:
+    """Comprime respostas HTTP com Brotli ou gzip"""
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        minimum_size: int = 1024,
+        gzip_level: int = 6,
+        brotli_quality: int = 4,
+        excluded_media_types: Sequence[str] = EXCLUDED_MEDIA_TYPES
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.excluded_media_types = tuple(excluded_media_types)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_headers = Headers(scope=scope)
+        encoding = negotiate_encoding(request_headers.get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressionResponder(self, encoding, send, request_headers.get("if-none-match", ""))
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressionResponder:
+    """Estado da compressão de uma resposta"""
+
+    def __init__(self, middleware: CompressionMiddleware, encoding: str, send: Send, if_none_match: str = ""):
+        self.middleware = middleware
+        self.encoding = encoding
+        self.downstream = send
+        self.if_none_match = if_none_match
+        self.start_message: Optional[Message] = None
+        self.compressor: Optional[_Compressor] = None
+        self.passthrough = False
+
+    def _should_skip(self, headers: Headers) -> bool:
+        media_type = headers.get("content-type", "")
+        return (
+            "content-encoding" in headers
+            or media_type.startswith(self.middleware.excluded_media_types)
+        )
+
+    def _start_compressed(self, start: Message) -> MutableHeaders:
+        headers = MutableHeaders(raw=start["headers"])
+        headers["Content-Encoding"] = self.encoding
+        headers.add_vary_header("Accept-Encoding")
+        weaken_etag(headers)
+        self.compressor = _Compressor(self.encoding, self.middleware.gzip_level, self.middleware.brotli_quality)
+        return headers
+
+    async def send(self, message: Message):
+        if message["type"] == "http.response.start":
+            # Aguardar o primeiro corpo para decidir
+            self.start_message = message
+            return
+
+        if message["type"] != "http.response.body":
+            await self.downstream(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.start_message is not None:
+            start, self.start_message = self.start_message, None
+            headers = Headers(raw=start["headers"])
+            if self._should_skip(headers) or (not more_body and len(body) < self.middleware.minimum_size):
+                self.passthrough = True
+                if start["status"] == 304 and holds_weak_etag(self.if_none_match, headers.get("etag")):
+                    # O cliente guardou a versão comprimida: mesmo validador dela
+                    weaken_etag(MutableHeaders(raw=start["headers"]))
+                await self.downstream(start)
+                await self.downstream(message)
+                return
+
+            mutable = self._start_compressed(start)
+            if more_body:
+                # Streaming: tamanho final desconhecido
+                del mutable["Content-Length"]
+                await self.downstream(start)
+                body = self.compressor.compress(body) + self.compressor.flush()
+                await self.downstream({"type": "http.response.body", "body": body, "more_body": True})
+            else:
+                body = self.compressor.compress(body) + self.compressor.finish()
+                mutable["Content-Length"] = str(len(body))
+                await self.downstream(start)
+                await self.downstream({"type": "http.response.body", "body": body})
+            return
+
+        if self.passthrough:
+            await self.downstream(message)
+            return
+
+        if more_body:
+            body = self.compressor.compress(body) + self.compressor.flush()
+        else:
+            body = self.compressor.compress(body) + self.compressor.finish()
+        await self.downstream({"type": "http.response.body", "body": body, "more_body": more_body})
@@ -0,0 +1,155 @@
+"""
+Serviço de cálculo em processos separados
+
+Cálculos pesados das análises (NumPy/pandas) rodam num ProcessPoolExecutor
+limitado, fora do loop de eventos. As funções recebem e devolvem arrays
+NumPy (serializados como buffers), cada tarefa tem tempo limite e
+requisições idênticas em andamento compartilham o mesmo cálculo.
+
+O tempo limite libera a requisição, não o processo: uma tarefa que já
+começou não pode ser interrompida e continua ocupando seu lugar na fila
+(COMPUTE_MAX_PENDING) até terminar. Tarefas que ainda não começaram são
+descartadas no tempo limite, se nenhum outro chamador aguarda por elas.
+"""
+
+import asyncio
+import logging
+from concurrent.futures import Future, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Callable, Dict, Hashable, Optional
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class ComputeBusyError(Exception):
+    """Fila de cálculos cheia"""
+
+
+class ComputeTimeoutError(Exception):
+    """Cálculo excedeu o tempo limite"""
+
+
+class ComputeService:
+    """Pool de processos com fila limitada, tempo limite e deduplicação"""
+
+    def __init__(self, max_workers: int, max_pending: int, timeout: float):
+        self.max_workers = max_workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        # Tarefa do pool de processos e número de chamadores aguardando, por cálculo
+        self._tasks: Dict[asyncio.Future, Future] = {}
+        self._waiters: Dict[asyncio.Future, int] = {}
+        self._pending = 0
+        self.completed = 0
+        self.failed = 0
+        self.shared = 0
+        self.timeouts = 0
+
+    def _get_executor(self) -> Optional[ProcessPoolExecutor]:
+        # Sem processos configurados: usa o pool de threads padrão do loop
+        if self._executor is None and self.max_workers > 0:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+
+    async def run(
+        self,
+        func: Callable[..., Any],
+        *args: Any,
+        key: Optional[Hashable] = None,
+        timeout: Optional[float] = None
+    ) -> Any:
+        """Executar `func(*args)` no pool
+
+        `func` deve ser uma função de módulo (serializável). Chamadas com a
+        mesma `key` enquanto a primeira não terminou recebem o mesmo resultado.
+        """
+        timeout = timeout or self.timeout
+        if key is not None:
+            key = (func.__module__, func.__qualname__, key)
+            shared = self._inflight.get(key)
+            if shared is not None:
+                self.shared += 1
+                return await self._wait(shared, timeout)
+
+        if self._pending >= self.max_pending:
+            raise ComputeBusyError(f"Fila de cálculos cheia ({self._pending} em andamento)")
+
+        executor = self._get_executor()
+        if executor is not None:
+            task = executor.submit(func, *args)
+            future = asyncio.wrap_future(task)
+            self._tasks[future] = task
+        else:
+            future = asyncio.get_running_loop().run_in_executor(None, func, *args)
+        self._pending += 1
+        if key is not None:
+            self._inflight[key] = future
+        future.add_done_callback(lambda done: self._finished(key, done))
+        return await self._wait(future, timeout)
+
+    async def _wait(self, future: asyncio.Future, timeout: float) -> Any:
+        self._waiters[future] = self._waiters.get(future, 0) + 1
+        try:
+            # shield: o tempo limite de um chamador não cancela o cálculo compartilhado
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            task = self._tasks.get(future)
+            if task is not None and self._waiters[future] == 1:
+                # Último chamador: descartar se ainda não começou (em execução, segue até o fim)
+                task.cancel()
+            raise ComputeTimeoutError(f"Cálculo excedeu {timeout}s")
+        finally:
+            self._waiters[future] -= 1
+            if not self._waiters[future]:
+                del self._waiters[future]
+
+    def _finished(self, key: Optional[Hashable], future: asyncio.Future):
+        self._pending -= 1
+        self._tasks.pop(future, None)
+        if key is not None and self._inflight.get(key) is future:
+            del self._inflight[key]
+
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is None:
+            self.completed += 1
+            return
+        self.failed += 1
+        if isinstance(error, BrokenProcessPool):
+            # Um processo morreu: recriar o pool na próxima tarefa
+            logger.error("Pool de processos de cálculo interrompido, será recriado")
+            executor, self._executor = self._executor, None
+            if executor:
+                executor.shutdown(wait=False)
+
+    def stats(self) -> Dict[str, Any]:
+        """Estatísticas de uso do pool"""
+        return {
+            "workers": self.max_workers,
+            "pending": self._pending,
+            "max_pending": self.max_pending,
+            "completed": self.completed,
+            "failed": self.failed,
+            "shared": self.shared,
+            "timeouts": self.timeouts
+        }
+
+    def shutdown(self):
+        """Encerrar os processos do pool"""
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+
+# Instância global do serviço de cálculo
+compute_service = ComputeService(
+    max_workers=settings.COMPUTE_WORKERS,
+    max_pending=settings.COMPUTE_MAX_PENDING,
+    timeout=settings.COMPUTE_TIMEOUT
+)
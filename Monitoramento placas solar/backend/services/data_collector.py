@@ -13,6 +13,11 @@ from ..database import SessionLocal
 from ..models import Inverter, InverterMeasurement, Logger, LoggerMeasurement, SystemStatus
 from .modbus_client import ModbusClient
 from .alert_service import AlertService
+from .alert_rules import alert_engine
+from .energy_accumulator import energy_accumulator
+from .efficiency_stats import efficiency_accumulator
+from .measurement_stats import measurement_stats
+from .live_broker import live_broker
 
 logger = logging.getLogger(__name__)
 
@@ -272,8 +277,21 @@ class DataCollectorService:
             )
             
             db.add(measurement)
+            
+            # Atualizar resumos horários na mesma transação
+            energy_accumulator.add_measurement(db, measurement)
+            efficiency_accumulator.add_measurement(db, measurement)
+            measurement_stats.add_measurement(db, measurement)
+            
+            # Avaliar as regras de alerta em memória (sem consultas por ciclo)
+            alerts = alert_engine.evaluate(db, inverter.id, measurement.timestamp, measurement)
             db.commit()
             
+            # Enviar aos painéis conectados (uma serialização para todos)
+            live_broker.publish_measurement(measurement.inverter_id, measurement)
+            for alert in alerts:
+                await self.alert_service.notify_created(alert)
+            
         except Exception as e:
             logger.error(f"Erro ao salvar medição do inversor: {e}")
             db.rollback()
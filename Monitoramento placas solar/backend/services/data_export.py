@@ -0,0 +1,234 @@
+"""
+Exportação de medições em streaming
+
+As medições são lidas do banco em blocos (yield_per, cursor no servidor)
+e cada bloco é convertido e enviado antes do próximo ser lido, de modo que
+a memória usada não depende do tamanho do intervalo exportado.
+Formatos: CSV, NDJSON, Parquet (um row group por bloco) e Arrow IPC (um
+record batch por bloco), os dois últimos com pyarrow; compressão gzip
+opcional.
+"""
+
+import csv
+import io
+import json
+import logging
+import zlib
+from datetime import datetime
+from typing import Any, Iterator, List, Optional, Sequence
+
+from sqlalchemy import select
+
+from ..database import SessionLocal
+from ..models import InverterMeasurement
+from ..schemas.inverter_schemas import InverterMeasurementResponse
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - dependência opcional
+    pa = None
+    pq = None
+
+logger = logging.getLogger(__name__)
+
+EXPORT_CHUNK_SIZE = 5000
+
+# Mesmos campos aceitos por /measurements?fields= (schema da medição)
+EXPORT_COLUMNS = list(InverterMeasurementResponse.model_fields)
+
+EXPORT_FORMATS = {
+    "csv": ("text/csv", "csv"),
+    "ndjson": ("application/x-ndjson", "ndjson"),
+    "parquet": ("application/vnd.apache.parquet", "parquet"),
+    "arrow": ("application/vnd.apache.arrow.stream", "arrows"),
+}
+
+# Formatos que dependem do pyarrow
+ARROW_FORMATS = ("parquet", "arrow")
+
+
+def parquet_available() -> bool:
+    return pq is not None
+
+
+def export_columns(fields: Optional[str]) -> List[str]:
+    """Colunas exportadas: as pedidas em "a,b,c" (na ordem de EXPORT_COLUMNS) ou todas"""
+    if not fields:
+        return list(EXPORT_COLUMNS)
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = sorted(requested - set(EXPORT_COLUMNS))
+    if unknown:
+        raise ValueError(f"Campos inválidos: {', '.join(unknown)}")
+    return [name for name in EXPORT_COLUMNS if name in requested]
+
+
+def _iter_chunks(
+    columns: List[str],
+    start_time: Optional[datetime],
+    end_time: Optional[datetime],
+    inverter_id: Optional[int],
+    chunk_size: int
+) -> Iterator[Sequence[Any]]:
+    """Blocos de linhas (tuplas na ordem de `columns`) em ordem de tempo"""
+    stmt = select(*[getattr(InverterMeasurement, name) for name in columns])
+    if start_time:
+        stmt = stmt.where(InverterMeasurement.timestamp >= start_time)
+    if end_time:
+        stmt = stmt.where(InverterMeasurement.timestamp <= end_time)
+    if inverter_id:
+        stmt = stmt.where(InverterMeasurement.inverter_id == inverter_id)
+    stmt = stmt.order_by(InverterMeasurement.timestamp.asc(), InverterMeasurement.id.asc())
+
+    # Sessão própria: o streaming continua depois que o endpoint retorna
+    db = SessionLocal()
+    try:
+        result = db.execute(stmt.execution_options(yield_per=chunk_size))
+        for partition in result.partitions():
+            yield partition
+    finally:
+        db.close()
+
+
+def _csv_chunks(chunks: Iterator[Sequence[Any]], columns: List[str]) -> Iterator[bytes]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    yield buffer.getvalue().encode("utf-8")
+    buffer.seek(0)
+    buffer.truncate()
+
+    timestamp_index = columns.index("timestamp") if "timestamp" in columns else None
+    for rows in chunks:
+        for row in rows:
+            if timestamp_index is not None:
+                row = list(row)
+                row[timestamp_index] = row[timestamp_index].isoformat()
+            writer.writerow(row)
+        yield buffer.getvalue().encode("utf-8")
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def _ndjson_chunks(chunks: Iterator[Sequence[Any]], columns: List[str]) -> Iterator[bytes]:
+    has_timestamp = "timestamp" in columns
+    for rows in chunks:
+        lines = []
+        for row in rows:
+            record = dict(zip(columns, row))
+            if has_timestamp:
+                record["timestamp"] = record["timestamp"].isoformat()
+            lines.append(json.dumps(record))
+        lines.append("")
+        yield "\n".join(lines).encode("utf-8")
+
+
+class _StreamSink(io.RawIOBase):
+    """Destino do ParquetWriter que entrega os bytes escritos em partes
+
+    Mantém a posição total (tell) para que os offsets gravados no rodapé do
+    arquivo continuem corretos depois que as partes são enviadas.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._parts: List[bytes] = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        data = bytes(data)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._parts)
+        self._parts = []
+        return data
+
+
+# Colunas inteiras; timestamp é timestamp[us] e as demais float64
+INTEGER_EXPORT_COLUMNS = ("id", "inverter_id", "status_code", "fault_code", "uptime")
+
+
+def _arrow_schema(columns: List[str]):
+    def arrow_type(name: str):
+        if name == "timestamp":
+            return pa.timestamp("us")
+        return pa.int64() if name in INTEGER_EXPORT_COLUMNS else pa.float64()
+    return pa.schema([(name, arrow_type(name)) for name in columns])
+
+
+def _arrow_table(rows: Sequence[Any], schema):
+    columns = list(zip(*rows))
+    return pa.Table.from_arrays(
+        [pa.array(values, type=field.type) for values, field in zip(columns, schema)],
+        schema=schema
+    )
+
+
+def _parquet_chunks(chunks: Iterator[Sequence[Any]], columns: List[str]) -> Iterator[bytes]:
+    schema = _arrow_schema(columns)
+    sink = _StreamSink()
+    writer = pq.ParquetWriter(sink, schema, compression="snappy")
+    try:
+        for rows in chunks:
+            writer.write_table(_arrow_table(rows, schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def _arrow_chunks(chunks: Iterator[Sequence[Any]], columns: List[str]) -> Iterator[bytes]:
+    schema = _arrow_schema(columns)
+    sink = _StreamSink()
+    writer = pa.ipc.new_stream(sink, schema)
+    try:
+        for rows in chunks:
+            writer.write_table(_arrow_table(rows, schema))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
+
+
+def _gzip(parts: Iterator[bytes]) -> Iterator[bytes]:
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for part in parts:
+        data = compressor.compress(part)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_measurements(
+    format: str,
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    inverter_id: Optional[int] = None,
+    compress: bool = False,
+    chunk_size: int = EXPORT_CHUNK_SIZE,
+    fields: Optional[str] = None
+) -> Iterator[bytes]:
+    """Gerador de bytes do arquivo exportado (`fields` limita as colunas)"""
+    columns = export_columns(fields)
+    chunks = _iter_chunks(columns, start_time, end_time, inverter_id, chunk_size)
+    if format == "csv":
+        parts = _csv_chunks(chunks, columns)
+    elif format == "ndjson":
+        parts = _ndjson_chunks(chunks, columns)
+    elif format in ARROW_FORMATS:
+        if not parquet_available():
+            raise ValueError("Exportação Parquet/Arrow requer o pacote pyarrow")
+        parts = _parquet_chunks(chunks, columns) if format == "parquet" else _arrow_chunks(chunks, columns)
+    else:
+        raise ValueError(f"Formato de exportação inválido: {format}")
+
+    return _gzip(parts) if compress else parts
@@ -0,0 +1,140 @@
+"""
+Versões em memória dos dados ao vivo para requisições condicionais
+
+Cada gravação confirmada de medições ou alertas incrementa um contador
+(geral e por inversor). Os endpoints consultados pelo painel derivam o
+ETag desses contadores e respondem 304 a um If-None-Match igual sem
+consultar o banco. O prefixo de inicialização invalida os ETags emitidos
+antes de um reinício do serviço.
+"""
+
+import threading
+import time
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Dict, Iterable, Optional
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from ..models import Alert, InverterMeasurement, LoggerMeasurement
+
+INVERTER_MEASUREMENTS = "inverter_measurements"
+LOGGER_MEASUREMENTS = "logger_measurements"
+ALERTS = "alerts"
+
+
+def inverter_key(inverter_id: int) -> str:
+    return f"inverter:{inverter_id}"
+
+
+class DataVersions:
+    """Contadores de versão e instante da última alteração por chave"""
+
+    def __init__(self):
+        self._boot = format(time.time_ns(), "x")
+        self._lock = threading.Lock()
+        self._versions: Dict[str, int] = {}
+        self._modified: Dict[str, datetime] = {}
+        self._last_measurement: Dict[int, datetime] = {}
+
+    def bump(self, keys: Iterable[str]):
+        now = datetime.utcnow().replace(microsecond=0)
+        with self._lock:
+            for key in keys:
+                self._versions[key] = self._versions.get(key, 0) + 1
+                self._modified[key] = now
+
+    def measurements_saved(self, latest: Dict[int, datetime]):
+        """Registrar medições gravadas (inversor -> timestamp mais recente)"""
+        self.observe(latest)
+        self.bump([INVERTER_MEASUREMENTS] + [inverter_key(inverter_id) for inverter_id in latest])
+
+    def observe(self, latest: Dict[int, datetime]):
+        """Atualizar o timestamp da última medição conhecida de cada inversor"""
+        with self._lock:
+            for inverter_id, timestamp in latest.items():
+                current = self._last_measurement.get(inverter_id)
+                if current is None or timestamp > current:
+                    self._last_measurement[inverter_id] = timestamp
+
+    def last_measurement(self, inverter_id: int) -> Optional[datetime]:
+        return self._last_measurement.get(inverter_id)
+
+    def headers(self, *keys: str) -> Dict[str, str]:
+        """ETag, Last-Modified e Cache-Control para as chaves dadas
+
+        Devem ser obtidos antes da consulta: uma gravação concorrente deixa
+        o ETag mais antigo que o corpo, nunca o contrário.
+        """
+        with self._lock:
+            versions = [str(self._versions.get(key, 0)) for key in keys]
+            modified = [self._modified[key] for key in keys if key in self._modified]
+        tag = "-".join([self._boot] + versions)
+        headers = {"ETag": f'"{tag}"', "Cache-Control": "no-cache"}
+        if modified:
+            headers["Last-Modified"] = format_datetime(max(modified).replace(tzinfo=timezone.utc), usegmt=True)
+        return headers
+
+
+def with_variant(headers: Dict[str, str], variant: str) -> Dict[str, str]:
+    """Cabeçalhos com o ETag distinguido por um estado derivado (ex.: online)"""
+    return {**headers, "ETag": headers["ETag"][:-1] + f'-{variant}"'}
+
+
+def is_not_modified(
+    headers: Dict[str, str],
+    if_none_match: Optional[str],
+    if_modified_since: Optional[str] = None
+) -> bool:
+    """Se a cópia do cliente ainda é válida (If-None-Match tem precedência)"""
+    if if_none_match:
+        if if_none_match.strip() == "*":
+            return True
+        etag = headers["ETag"]
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return etag in tags or f"W/{etag}" in tags
+    if if_modified_since and "Last-Modified" in headers:
+        try:
+            return parsedate_to_datetime(headers["Last-Modified"]) <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+# Instância global das versões
+data_versions = DataVersions()
+
+
+@event.listens_for(Session, "after_flush")
+def _collect_changes(session: Session, flush_context):
+    """Anotar na sessão o que mudou; a versão só avança após o commit"""
+    pending = session.info.setdefault("data_versions", {"measurements": {}, "keys": set()})
+    for instance in session.new:
+        if isinstance(instance, InverterMeasurement) and instance.timestamp is not None:
+            latest = pending["measurements"].get(instance.inverter_id)
+            if latest is None or instance.timestamp > latest:
+                pending["measurements"][instance.inverter_id] = instance.timestamp
+    for instance in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(instance, InverterMeasurement):
+            pending["keys"].update([INVERTER_MEASUREMENTS, inverter_key(instance.inverter_id)])
+        elif isinstance(instance, LoggerMeasurement):
+            pending["keys"].add(LOGGER_MEASUREMENTS)
+        elif isinstance(instance, Alert):
+            pending["keys"].add(ALERTS)
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_changes(session: Session):
+    pending = session.info.pop("data_versions", None)
+    if not pending:
+        return
+    if pending["measurements"]:
+        data_versions.observe(pending["measurements"])
+    if pending["keys"]:
+        data_versions.bump(pending["keys"])
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changes(session: Session):
+    session.info.pop("data_versions", None)
@@ -0,0 +1,82 @@
+"""
+Redução de séries temporais para gráficos
+
+Seleciona um subconjunto dos pontos originais (sem interpolar valores)
+que preserva a forma visual da curva:
+
+- "lttb": Largest-Triangle-Three-Buckets. Na versão vetorizada o vértice A
+  de cada balde é a média do balde anterior (em vez do ponto escolhido
+  anteriormente), o que permite calcular todos os baldes de uma vez.
+- "minmax": mínimo e máximo de cada balde (preserva picos e vales).
+"""
+
+import numpy as np
+
+DOWNSAMPLING_METHODS = ("lttb", "minmax")
+
+
+def _bucket_ids(count: int, buckets: int) -> np.ndarray:
+    """Balde de cada um de `count` pontos, divididos em `buckets` faixas contíguas"""
+    edges = np.floor(np.linspace(0, count, buckets + 1)).astype(np.int64)
+    return np.searchsorted(edges, np.arange(count), side="right") - 1
+
+
+def _first_per_bucket(order: np.ndarray, bucket: np.ndarray) -> np.ndarray:
+    """Primeiro índice de `order` em cada balde (order já agrupado por balde)"""
+    sorted_buckets = bucket[order]
+    first = np.ones(order.size, dtype=bool)
+    first[1:] = sorted_buckets[1:] != sorted_buckets[:-1]
+    return order[first]
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, threshold: int) -> np.ndarray:
+    """Índices dos pontos escolhidos por LTTB (primeiro e último sempre incluídos)"""
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n = x.size
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    # Pontos internos divididos em threshold - 2 baldes
+    buckets = threshold - 2
+    inner_x, inner_y = x[1:-1], y[1:-1]
+    bucket = _bucket_ids(inner_x.size, buckets)
+    counts = np.bincount(bucket, minlength=buckets)
+    mean_x = np.bincount(bucket, weights=inner_x, minlength=buckets) / counts
+    mean_y = np.bincount(bucket, weights=inner_y, minlength=buckets) / counts
+
+    # Vértices A (balde anterior) e C (balde seguinte) de cada balde
+    a_x = np.concatenate([[x[0]], mean_x[:-1]])
+    a_y = np.concatenate([[y[0]], mean_y[:-1]])
+    c_x = np.concatenate([mean_x[1:], [x[-1]]])
+    c_y = np.concatenate([mean_y[1:], [y[-1]]])
+
+    ax, ay, cx, cy = a_x[bucket], a_y[bucket], c_x[bucket], c_y[bucket]
+    area = np.abs((ax - cx) * (inner_y - ay) - (ax - inner_x) * (cy - ay))
+
+    # Ponto de maior área em cada balde
+    order = np.lexsort((-area, bucket))
+    chosen = _first_per_bucket(order, bucket) + 1
+    return np.concatenate([[0], chosen, [n - 1]])
+
+
+def minmax_indices(y: np.ndarray, threshold: int) -> np.ndarray:
+    """Índices do mínimo e do máximo de cada balde, em ordem temporal"""
+    y = np.asarray(y, dtype=np.float64)
+    n = y.size
+    if threshold >= n or threshold < 2:
+        return np.arange(n)
+
+    bucket = _bucket_ids(n, threshold // 2)
+    minimum = _first_per_bucket(np.lexsort((y, bucket)), bucket)
+    maximum = _first_per_bucket(np.lexsort((-y, bucket)), bucket)
+    return np.unique(np.concatenate([minimum, maximum]))
+
+
+def downsample(x: np.ndarray, y: np.ndarray, threshold: int, method: str = "lttb") -> np.ndarray:
+    """Índices dos pontos a manter para no máximo `threshold` pontos"""
+    if method == "lttb":
+        return lttb_indices(x, y, threshold)
+    if method == "minmax":
+        return minmax_indices(y, threshold)
+    raise ValueError(f"Método de redução desconhecido: {method}")
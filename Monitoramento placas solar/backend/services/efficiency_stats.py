@@ -0,0 +1,372 @@
+"""
+Estatísticas de eficiência acumuladas por inversor e por dia
+
+Cada dia guarda um estado combinável: momentos de Welford da eficiência,
+co-momento temperatura x eficiência (correlação de Pearson) e um histograma
+de eficiência em faixas fixas de temperatura. O estado é atualizado a cada
+medição na ingestão e os estados de vários dias (ou inversores) são
+combinados na consulta com as fórmulas de Chan, sem reler as medições.
+"""
+
+import json
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from ..models import DailyEfficiencyStats, Inverter, InverterMeasurement
+from .measurement_loader import load_measurement_columns
+
+logger = logging.getLogger(__name__)
+
+# Faixas fixas de temperatura (°C); valores fora caem nas faixas extremas
+TEMP_BIN_MIN = -10.0
+TEMP_BIN_WIDTH = 5.0
+TEMP_BIN_COUNT = 20
+
+# Campos escalares do estado (mesmos nomes das colunas de DailyEfficiencyStats)
+STATE_FIELDS = [
+    "efficiency_count", "efficiency_mean", "efficiency_m2", "efficiency_min", "efficiency_max",
+    "pair_count", "temperature_mean", "temperature_m2",
+    "pair_efficiency_mean", "pair_efficiency_m2", "comoment"
+]
+COUNT_FIELDS = {"efficiency_count", "pair_count"}
+
+
+def temperature_bin(temperatures: np.ndarray) -> np.ndarray:
+    """Índice da faixa de temperatura de cada valor"""
+    index = np.floor((np.asarray(temperatures, dtype=np.float64) - TEMP_BIN_MIN) / TEMP_BIN_WIDTH)
+    return np.clip(index, 0, TEMP_BIN_COUNT - 1).astype(np.int64)
+
+
+def temperature_bin_range(index: int) -> Dict[str, float]:
+    """Limites (°C) de uma faixa de temperatura"""
+    return {
+        "min_temp": TEMP_BIN_MIN + index * TEMP_BIN_WIDTH,
+        "max_temp": TEMP_BIN_MIN + (index + 1) * TEMP_BIN_WIDTH
+    }
+
+
+def _moments(groups: np.ndarray, values: np.ndarray, size: int):
+    """Contagem, média e soma dos quadrados dos desvios por grupo"""
+    count = np.bincount(groups, minlength=size).astype(np.float64)
+    total = np.bincount(groups, weights=values, minlength=size)
+    mean = np.divide(total, count, out=np.zeros(size), where=count > 0)
+    m2 = np.bincount(groups, weights=(values - mean[groups]) ** 2, minlength=size)
+    return count, mean, m2
+
+
+def _extreme(groups: np.ndarray, values: np.ndarray, size: int, reducer) -> np.ndarray:
+    initial = np.inf if reducer is np.minimum else -np.inf
+    result = np.full(size, initial)
+    reducer.at(result, groups, values)
+    result[np.isinf(result)] = np.nan
+    return result
+
+
+def day_statistics(times: np.ndarray, efficiency: np.ndarray, temperature: np.ndarray) -> Dict[str, np.ndarray]:
+    """Estados diários a partir de medições (NaN = valor ausente)
+
+    Retorna "days" (datetime64[D]) e um array por campo de STATE_FIELDS,
+    além de "bin_count" e "bin_efficiency_sum" (dias x faixas).
+    """
+    times = np.asarray(times, dtype="datetime64[us]")
+    efficiency = np.asarray(efficiency, dtype=np.float64)
+    temperature = np.asarray(temperature, dtype=np.float64)
+
+    valid = ~np.isnan(efficiency)
+    times, efficiency, temperature = times[valid], efficiency[valid], temperature[valid]
+    days, groups = np.unique(times.astype("datetime64[D]"), return_inverse=True)
+    size = days.size
+
+    count, mean, m2 = _moments(groups, efficiency, size)
+    state = {
+        "days": days,
+        "efficiency_count": count,
+        "efficiency_mean": mean,
+        "efficiency_m2": m2,
+        "efficiency_min": _extreme(groups, efficiency, size, np.minimum),
+        "efficiency_max": _extreme(groups, efficiency, size, np.maximum)
+    }
+
+    # Apenas medições com temperatura entram na correlação e no histograma
+    paired = ~np.isnan(temperature)
+    pair_groups, temp, eff = groups[paired], temperature[paired], efficiency[paired]
+    pair_count, temp_mean, temp_m2 = _moments(pair_groups, temp, size)
+    _, eff_mean, eff_m2 = _moments(pair_groups, eff, size)
+    state.update({
+        "pair_count": pair_count,
+        "temperature_mean": temp_mean,
+        "temperature_m2": temp_m2,
+        "pair_efficiency_mean": eff_mean,
+        "pair_efficiency_m2": eff_m2,
+        "comoment": np.bincount(
+            pair_groups,
+            weights=(temp - temp_mean[pair_groups]) * (eff - eff_mean[pair_groups]),
+            minlength=size
+        )
+    })
+
+    cells = pair_groups * TEMP_BIN_COUNT + temperature_bin(temp)
+    state["bin_count"] = np.bincount(cells, minlength=size * TEMP_BIN_COUNT)\
+        .reshape(size, TEMP_BIN_COUNT).astype(np.float64)
+    state["bin_efficiency_sum"] = np.bincount(cells, weights=eff, minlength=size * TEMP_BIN_COUNT)\
+        .reshape(size, TEMP_BIN_COUNT)
+    return state
+
+
+def merge_states(state: Dict[str, np.ndarray], groups: np.ndarray, size: int) -> Dict[str, np.ndarray]:
+    """Combinar estados (uma linha por estado) em `size` grupos"""
+    groups = np.asarray(groups, dtype=np.int64)
+
+    def merge_moments(count, mean, m2):
+        total = np.bincount(groups, weights=count, minlength=size)
+        merged_mean = np.divide(
+            np.bincount(groups, weights=count * mean, minlength=size),
+            total, out=np.zeros(size), where=total > 0
+        )
+        delta = mean - merged_mean[groups]
+        merged_m2 = np.bincount(groups, weights=m2 + count * delta ** 2, minlength=size)
+        return total, merged_mean, merged_m2, delta
+
+    count, mean, m2, _ = merge_moments(
+        state["efficiency_count"], state["efficiency_mean"], state["efficiency_m2"]
+    )
+    filled = state["efficiency_count"] > 0
+    merged = {
+        "efficiency_count": count,
+        "efficiency_mean": mean,
+        "efficiency_m2": m2,
+        "efficiency_min": _extreme(groups[filled], state["efficiency_min"][filled], size, np.minimum),
+        "efficiency_max": _extreme(groups[filled], state["efficiency_max"][filled], size, np.maximum)
+    }
+
+    pair_count, temp_mean, temp_m2, temp_delta = merge_moments(
+        state["pair_count"], state["temperature_mean"], state["temperature_m2"]
+    )
+    _, eff_mean, eff_m2, eff_delta = merge_moments(
+        state["pair_count"], state["pair_efficiency_mean"], state["pair_efficiency_m2"]
+    )
+    merged.update({
+        "pair_count": pair_count,
+        "temperature_mean": temp_mean,
+        "temperature_m2": temp_m2,
+        "pair_efficiency_mean": eff_mean,
+        "pair_efficiency_m2": eff_m2,
+        "comoment": np.bincount(
+            groups,
+            weights=state["comoment"] + state["pair_count"] * temp_delta * eff_delta,
+            minlength=size
+        )
+    })
+
+    for name in ("bin_count", "bin_efficiency_sum"):
+        merged[name] = np.zeros((size, TEMP_BIN_COUNT))
+        np.add.at(merged[name], groups, state[name])
+    return merged
+
+
+def efficiency_report(daily: Dict[str, np.ndarray]) -> Dict:
+    """Métricas do relatório de eficiência a partir dos estados diários
+
+    Função pura (arrays de entrada, dicionário de saída) para poder rodar
+    no pool de processos do serviço de cálculo.
+    """
+    # Combinação de todos os dias
+    total = merge_states(daily, np.zeros(daily["days"].size, dtype=np.int64), 1)
+
+    # Tendência dos últimos 7 dias com medições
+    daily_efficiency = daily["efficiency_mean"][daily["efficiency_count"] > 0]
+    efficiency_trend = "stable"
+    if len(daily_efficiency) > 7:
+        recent_trend = daily_efficiency[-7:]
+        trend_slope = np.polyfit(range(len(recent_trend)), recent_trend, 1)[0]
+        if trend_slope > 0.5:
+            efficiency_trend = "improving"
+        elif trend_slope < -0.5:
+            efficiency_trend = "declining"
+
+    # Impacto da temperatura na eficiência (correlação pelo co-momento)
+    temperature_impact = 0.0
+    variance_product = total["temperature_m2"][0] * total["pair_efficiency_m2"][0]
+    if total["pair_count"][0] > 10 and variance_product > 0:
+        correlation = total["comoment"][0] / np.sqrt(variance_product)
+        temperature_impact = abs(correlation) * 100
+
+    # Condições ótimas: faixa de temperatura com melhor eficiência média
+    optimal_conditions = None
+    bin_count = total["bin_count"][0]
+    if bin_count.sum() > 0:
+        efficiency_by_temp = np.divide(
+            total["bin_efficiency_sum"][0], bin_count,
+            out=np.full(bin_count.size, -np.inf), where=bin_count > 0
+        )
+        best_temp_bin = int(np.argmax(efficiency_by_temp))
+        optimal_conditions = {
+            **temperature_bin_range(best_temp_bin),
+            "avg_efficiency": round(float(efficiency_by_temp[best_temp_bin]), 2)
+        }
+
+    return {
+        "average_efficiency": round(float(total["efficiency_mean"][0]), 2),
+        "peak_efficiency": round(float(total["efficiency_max"][0]), 2),
+        "min_efficiency": round(float(total["efficiency_min"][0]), 2),
+        "efficiency_trend": efficiency_trend,
+        "temperature_impact": round(float(temperature_impact), 2),
+        "optimal_conditions": optimal_conditions
+    }
+
+
+def _empty_state(size: int = 0) -> Dict[str, np.ndarray]:
+    state = {name: np.zeros(size) for name in STATE_FIELDS}
+    state["bin_count"] = np.zeros((size, TEMP_BIN_COUNT))
+    state["bin_efficiency_sum"] = np.zeros((size, TEMP_BIN_COUNT))
+    return state
+
+
+def _row_values(state: Dict[str, np.ndarray], i: int) -> Dict:
+    values = {}
+    for name in STATE_FIELDS:
+        value = float(state[name][i])
+        if name in COUNT_FIELDS:
+            value = int(value)
+        elif np.isnan(value):
+            value = None
+        values[name] = value
+    values["temperature_bins"] = json.dumps({
+        "count": [int(c) for c in state["bin_count"][i]],
+        "efficiency_sum": [float(s) for s in state["bin_efficiency_sum"][i]]
+    })
+    return values
+
+
+def _states_from_rows(rows: List[DailyEfficiencyStats]) -> Dict[str, np.ndarray]:
+    state = _empty_state(len(rows))
+    for i, row in enumerate(rows):
+        for name in STATE_FIELDS:
+            value = getattr(row, name)
+            state[name][i] = np.nan if value is None else value
+        if row.temperature_bins:
+            bins = json.loads(row.temperature_bins)
+            state["bin_count"][i] = bins["count"]
+            state["bin_efficiency_sum"][i] = bins["efficiency_sum"]
+    return state
+
+
+def _to_datetime(day: np.datetime64) -> datetime:
+    return day.astype("datetime64[us]").astype(datetime)
+
+
+class EfficiencyAccumulator:
+    """Atualiza os estados diários de eficiência na ingestão"""
+
+    def add_measurement(self, db: Session, measurement: InverterMeasurement):
+        """Somar uma nova medição ao estado do dia (a transação fica a cargo do chamador)"""
+        if measurement.efficiency is None or measurement.timestamp is None:
+            return
+
+        sample = day_statistics(
+            [measurement.timestamp],
+            [measurement.efficiency],
+            [np.nan if measurement.temperature is None else measurement.temperature]
+        )
+        day = _to_datetime(sample.pop("days")[0])
+
+        row = db.query(DailyEfficiencyStats)\
+            .filter(DailyEfficiencyStats.inverter_id == measurement.inverter_id)\
+            .filter(DailyEfficiencyStats.day == day)\
+            .first()
+        if not row:
+            row = DailyEfficiencyStats(inverter_id=measurement.inverter_id, day=day)
+            db.add(row)
+            current = _empty_state(1)
+        else:
+            current = _states_from_rows([row])
+
+        combined = {name: np.concatenate([current[name], sample[name]]) for name in current}
+        merged = merge_states(combined, np.array([0, 0]), 1)
+        for name, value in _row_values(merged, 0).items():
+            setattr(row, name, value)
+
+    def rebuild(
+        self,
+        db: Session,
+        inverter_id: int,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None
+    ) -> int:
+        """Recalcular os estados diários a partir das medições brutas
+
+        Apaga e recalcula os dias a partir de `start` (ou todo o histórico),
+        até o dia de `end` se informado. Retorna o número de dias gravados.
+        A transação fica a cargo do chamador.
+        """
+        start_day = datetime(start.year, start.month, start.day) if start else None
+        end_day = datetime(end.year, end.month, end.day) + timedelta(days=1) if end else None
+
+        data = load_measurement_columns(
+            db,
+            ["efficiency", "temperature"],
+            start_time=start_day,
+            end_time=end_day,
+            inverter_id=inverter_id,
+            not_null=["efficiency"]
+        )
+
+        delete_query = db.query(DailyEfficiencyStats)\
+            .filter(DailyEfficiencyStats.inverter_id == inverter_id)
+        if start_day is not None:
+            delete_query = delete_query.filter(DailyEfficiencyStats.day >= start_day)
+        if end_day is not None:
+            delete_query = delete_query.filter(DailyEfficiencyStats.day < end_day)
+        delete_query.delete(synchronize_session=False)
+
+        state = day_statistics(data["timestamp"], data["efficiency"], data["temperature"])
+        now = datetime.utcnow()
+        db.bulk_insert_mappings(DailyEfficiencyStats, [
+            {
+                "inverter_id": inverter_id,
+                "day": _to_datetime(day),
+                "updated_at": now,
+                **_row_values(state, i)
+            }
+            for i, day in enumerate(state["days"])
+        ])
+        return int(state["days"].size)
+
+    def restore(self, db: Session):
+        """Recalcular a partir do último dia acumulado de cada inversor ao iniciar o serviço"""
+        for (inverter_id,) in db.query(Inverter.id).all():
+            latest = db.query(DailyEfficiencyStats.day)\
+                .filter(DailyEfficiencyStats.inverter_id == inverter_id)\
+                .order_by(DailyEfficiencyStats.day.desc())\
+                .first()
+            days = self.rebuild(db, inverter_id, latest[0] if latest else None)
+            logger.info(f"Estatísticas de eficiência do inversor {inverter_id} retomadas ({days} dias recalculados)")
+        db.commit()
+
+    def load_days(
+        self,
+        db: Session,
+        start: datetime,
+        inverter_id: Optional[int] = None
+    ) -> Dict[str, np.ndarray]:
+        """Estados a partir do dia de `start`, combinados por dia (todos os inversores)"""
+        start_day = datetime(start.year, start.month, start.day)
+        query = db.query(DailyEfficiencyStats)\
+            .filter(DailyEfficiencyStats.day >= start_day)
+        if inverter_id:
+            query = query.filter(DailyEfficiencyStats.inverter_id == inverter_id)
+        rows = query.order_by(DailyEfficiencyStats.day.asc()).all()
+
+        days = np.array([row.day for row in rows], dtype="datetime64[D]")
+        unique_days, groups = np.unique(days, return_inverse=True)
+        merged = merge_states(_states_from_rows(rows), groups, unique_days.size)
+        merged["days"] = unique_days
+        return merged
+
+
+# Instância global dos acumuladores
+efficiency_accumulator = EfficiencyAccumulator()
@@ -0,0 +1,363 @@
+"""
+Acumuladores de energia e tempo de operação por inversor
+
+Cada amostra de potência é integrada (regra do trapézio) com a anterior do
+mesmo inversor e o resultado é somado na linha horária de
+HourlyEnergySummary. Intervalos maiores que ENERGY_MAX_GAP_SECONDS não são
+integrados e são contados como lacunas. Assim energia, horas de operação
+e cobertura ficam corretas para qualquer taxa de amostragem e os
+endpoints leem O(horas) linhas em vez de O(amostras).
+"""
+
+import logging
+from datetime import datetime, timedelta
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from ..config import settings
+from ..models import HourlyEnergySummary, Inverter, InverterMeasurement
+from .change_feed import record_changes
+from .measurement_loader import load_measurement_columns
+
+logger = logging.getLogger(__name__)
+
+ONE_SECOND = np.timedelta64(1, "s")
+ONE_HOUR = np.timedelta64(1, "h")
+
+
+def _group_by_hour(hours: np.ndarray, **values: np.ndarray) -> Dict[str, np.ndarray]:
+    """Somar valores por hora (horas de saída ordenadas)"""
+    unique_hours, inverse = np.unique(hours, return_inverse=True)
+    grouped = {"hours": unique_hours}
+    for name, array in values.items():
+        grouped[name] = np.bincount(inverse, weights=array, minlength=unique_hours.size)
+    return grouped
+
+
+def integrate_power(times: np.ndarray, powers: np.ndarray, max_gap_seconds: float) -> Dict[str, np.ndarray]:
+    """Integrar uma série de potência (W) por hora
+
+    `times` deve estar em ordem crescente. Os segmentos que cruzam a virada
+    de hora são divididos com interpolação linear da potência. Retorna
+    arrays alinhados por hora: energy_wh, producing_seconds,
+    covered_seconds, gap_count e gap_seconds. Só aparecem horas com trecho
+    integrado ou com o fim de uma lacuna: as horas inteiras dentro de uma
+    lacuna não geram linhas.
+    """
+    times = np.asarray(times, dtype="datetime64[us]")
+    powers = np.asarray(powers, dtype=np.float64)
+    empty = np.array([], dtype=np.float64)
+    if times.size < 2:
+        return {
+            "hours": np.array([], dtype="datetime64[h]"),
+            "energy_wh": empty,
+            "producing_seconds": empty,
+            "covered_seconds": empty,
+            "gap_count": empty,
+            "gap_seconds": empty
+        }
+
+    segment_seconds = np.diff(times) / ONE_SECOND
+    valid = (segment_seconds > 0) & (segment_seconds <= max_gap_seconds)
+    gaps = segment_seconds > max_gap_seconds
+
+    # Inserir as viradas de hora como pontos interpolados
+    boundaries = np.arange(
+        times[0].astype("datetime64[h]") + ONE_HOUR,
+        times[-1],
+        ONE_HOUR
+    ).astype("datetime64[us]")
+    merged = np.union1d(times, boundaries)
+    offsets = (times - times[0]) / ONE_SECOND
+    merged_offsets = (merged - times[0]) / ONE_SECOND
+    merged_powers = np.interp(merged_offsets, offsets, powers)
+
+    # Cada sub-segmento herda a validade do segmento original que o contém;
+    # os que caem numa lacuna são descartados
+    origin = np.clip(np.searchsorted(times, merged[:-1], side="right") - 1, 0, valid.size - 1)
+    sub_valid = valid[origin]
+    sub_seconds = np.diff(merged_offsets)[sub_valid]
+    average_power = ((merged_powers[:-1] + merged_powers[1:]) / 2)[sub_valid]
+
+    integrated = _group_by_hour(
+        merged[:-1][sub_valid].astype("datetime64[h]"),
+        energy_wh=average_power * sub_seconds / 3600,
+        producing_seconds=np.where(average_power > 0, sub_seconds, 0.0),
+        covered_seconds=sub_seconds
+    )
+
+    # Lacunas atribuídas à hora da amostra que encerra o intervalo
+    gap_hours = times[1:][gaps].astype("datetime64[h]")
+    gap_totals = _group_by_hour(
+        gap_hours,
+        gap_count=np.ones(gap_hours.size),
+        gap_seconds=segment_seconds[gaps]
+    )
+
+    hours = np.union1d(integrated["hours"], gap_totals["hours"])
+    result = {"hours": hours}
+    for source in (integrated, gap_totals):
+        positions = np.searchsorted(hours, source["hours"])
+        for name, array in source.items():
+            if name == "hours":
+                continue
+            result[name] = np.zeros(hours.size)
+            result[name][positions] = array
+    return result
+
+
+def sample_statistics(times: np.ndarray, powers: np.ndarray) -> Dict[str, np.ndarray]:
+    """Contagem, soma, mínimo e máximo das amostras de potência por hora"""
+    hours = np.asarray(times, dtype="datetime64[us]").astype("datetime64[h]")
+    powers = np.asarray(powers, dtype=np.float64)
+    order = np.argsort(hours, kind="stable")
+    hours, powers = hours[order], powers[order]
+    unique_hours, starts, counts = np.unique(hours, return_index=True, return_counts=True)
+    if unique_hours.size == 0:
+        empty = np.array([], dtype=np.float64)
+        return {"hours": unique_hours, "sample_count": empty, "power_sum": empty,
+                "power_min": empty, "power_max": empty}
+    return {
+        "hours": unique_hours,
+        "sample_count": counts.astype(np.float64),
+        "power_sum": np.add.reduceat(powers, starts),
+        "power_min": np.minimum.reduceat(powers, starts),
+        "power_max": np.maximum.reduceat(powers, starts)
+    }
+
+
+def _to_datetime(hour: np.datetime64) -> datetime:
+    return hour.astype("datetime64[us]").astype(datetime)
+
+
+class EnergyAccumulator:
+    """Mantém o último ponto de cada inversor e atualiza os resumos horários"""
+
+    def __init__(self, max_gap_seconds: float):
+        self.max_gap_seconds = max_gap_seconds
+        self._last_sample: Dict[int, Tuple[datetime, float]] = {}
+
+    def add_measurement(self, db: Session, measurement: InverterMeasurement):
+        """Integrar uma nova medição (a transação fica a cargo do chamador)"""
+        if measurement.power_output is None or measurement.timestamp is None:
+            return
+
+        inverter_id = measurement.inverter_id
+        timestamp = measurement.timestamp
+        power = float(measurement.power_output)
+
+        integrated = None
+        last = self._last_sample.get(inverter_id)
+        if last is not None and timestamp > last[0]:
+            integrated = integrate_power([last[0], timestamp], [last[1], power], self.max_gap_seconds)
+        elif last is not None:
+            logger.debug(f"Medição fora de ordem do inversor {inverter_id} não integrada: {timestamp}")
+
+        self._apply(db, inverter_id, integrated, sample_statistics([timestamp], [power]))
+        if last is None or timestamp > last[0]:
+            self._last_sample[inverter_id] = (timestamp, power)
+
+    def _apply(
+        self,
+        db: Session,
+        inverter_id: int,
+        integrated: Optional[Dict[str, np.ndarray]],
+        samples: Dict[str, np.ndarray]
+    ):
+        """Somar os incrementos nas linhas horárias existentes (ou criá-las)"""
+        rows: Dict[datetime, HourlyEnergySummary] = {}
+
+        def row_for(hour: np.datetime64) -> HourlyEnergySummary:
+            key = _to_datetime(hour)
+            if key not in rows:
+                row = db.query(HourlyEnergySummary)\
+                    .filter(HourlyEnergySummary.inverter_id == inverter_id)\
+                    .filter(HourlyEnergySummary.hour == key)\
+                    .first()
+                if not row:
+                    row = HourlyEnergySummary(
+                        inverter_id=inverter_id,
+                        hour=key,
+                        energy_wh=0.0,
+                        producing_seconds=0.0,
+                        covered_seconds=0.0,
+                        gap_count=0,
+                        gap_seconds=0.0,
+                        sample_count=0,
+                        power_sum=0.0
+                    )
+                    db.add(row)
+                rows[key] = row
+            return rows[key]
+
+        if integrated is not None:
+            for i, hour in enumerate(integrated["hours"]):
+                row = row_for(hour)
+                row.energy_wh += float(integrated["energy_wh"][i])
+                row.producing_seconds += float(integrated["producing_seconds"][i])
+                row.covered_seconds += float(integrated["covered_seconds"][i])
+                row.gap_count += int(integrated["gap_count"][i])
+                row.gap_seconds += float(integrated["gap_seconds"][i])
+
+        for i, hour in enumerate(samples["hours"]):
+            row = row_for(hour)
+            row.sample_count += int(samples["sample_count"][i])
+            row.power_sum += float(samples["power_sum"][i])
+            power_min = float(samples["power_min"][i])
+            power_max = float(samples["power_max"][i])
+            row.power_min = power_min if row.power_min is None else min(row.power_min, power_min)
+            row.power_max = power_max if row.power_max is None else max(row.power_max, power_max)
+
+    def _neighbor(self, db: Session, inverter_id: int, timestamp: datetime, before: bool):
+        """Amostra de potência imediatamente antes (ou a partir) de `timestamp`"""
+        query = db.query(InverterMeasurement.timestamp, InverterMeasurement.power_output)\
+            .filter(InverterMeasurement.inverter_id == inverter_id)\
+            .filter(InverterMeasurement.power_output.isnot(None))
+        if before:
+            query = query.filter(InverterMeasurement.timestamp < timestamp)\
+                .order_by(InverterMeasurement.timestamp.desc())
+        else:
+            query = query.filter(InverterMeasurement.timestamp >= timestamp)\
+                .order_by(InverterMeasurement.timestamp.asc())
+        return query.first()
+
+    def rebuild(
+        self,
+        db: Session,
+        inverter_id: int,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None
+    ) -> int:
+        """Recalcular os resumos horários a partir das medições brutas
+
+        Apaga e recalcula as horas a partir de `start` (ou todo o histórico).
+        Com `end`, [start, end] são os instantes das medições alteradas e só
+        as horas afetadas são recalculadas: da hora da amostra anterior a
+        `start` até a hora da amostra seguinte a `end` (os segmentos que as
+        ligam mudam). Retorna o número de horas gravadas. A transação fica a
+        cargo do chamador.
+        """
+        start_hour = end_hour = None
+        following = None
+        if end is not None:
+            before = self._neighbor(db, inverter_id, start, before=True)
+            after = self._neighbor(db, inverter_id, end + timedelta(microseconds=1), before=False)
+            start = before[0] if before else start
+            last = after[0] if after else end
+            end_hour = last.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+            # Ponto seguinte ao fim, para continuidade da integração na última hora
+            following = self._neighbor(db, inverter_id, end_hour, before=False)
+        if start is not None:
+            start_hour = start.replace(minute=0, second=0, microsecond=0)
+
+        # Ponto anterior ao início, para continuidade da integração
+        previous = None
+        if start_hour is not None:
+            previous = self._neighbor(db, inverter_id, start_hour, before=True)
+
+        data = load_measurement_columns(
+            db,
+            ["power_output"],
+            start_time=start_hour,
+            end_time=end_hour,
+            inverter_id=inverter_id,
+            not_null=["power_output"]
+        )
+        times, powers = data["timestamp"], data["power_output"]
+
+        delete_query = db.query(HourlyEnergySummary)\
+            .filter(HourlyEnergySummary.inverter_id == inverter_id)
+        if start_hour is not None:
+            delete_query = delete_query.filter(HourlyEnergySummary.hour >= start_hour)
+        if end_hour is not None:
+            delete_query = delete_query.filter(HourlyEnergySummary.hour < end_hour)
+        deleted = [row.id for row in delete_query.with_entities(HourlyEnergySummary.id)]
+        delete_query.delete(synchronize_session=False)
+        record_changes(db, "hourly_energy", deleted, "delete")
+
+        if times.size == 0:
+            return 0
+
+        series_times, series_powers = times, powers
+        if previous is not None:
+            series_times = np.concatenate([np.array([previous[0]], dtype="datetime64[us]"), series_times])
+            series_powers = np.concatenate([[previous[1]], series_powers])
+        if following is not None:
+            series_times = np.concatenate([series_times, np.array([following[0]], dtype="datetime64[us]")])
+            series_powers = np.concatenate([series_powers, [following[1]]])
+        integrated = integrate_power(series_times, series_powers, self.max_gap_seconds)
+        samples = sample_statistics(times, powers)
+
+        # Somente as horas apagadas (as de fora do intervalo continuam gravadas)
+        hours = np.union1d(integrated["hours"], samples["hours"])
+        if start_hour is not None:
+            hours = hours[hours >= np.datetime64(start_hour, "h")]
+        if end_hour is not None:
+            hours = hours[hours < np.datetime64(end_hour, "h")]
+
+        def column(source, name, default=0.0):
+            values = np.full(hours.size, default, dtype=object if default is None else np.float64)
+            mask = np.isin(source["hours"], hours)
+            values[np.searchsorted(hours, source["hours"][mask])] = source[name][mask]
+            return values
+
+        energy = column(integrated, "energy_wh")
+        producing = column(integrated, "producing_seconds")
+        covered = column(integrated, "covered_seconds")
+        gap_count = column(integrated, "gap_count")
+        gap_seconds = column(integrated, "gap_seconds")
+        sample_count = column(samples, "sample_count")
+        power_sum = column(samples, "power_sum")
+        power_min = column(samples, "power_min", default=None)
+        power_max = column(samples, "power_max", default=None)
+
+        now = datetime.utcnow()
+        mappings = [
+            {
+                "inverter_id": inverter_id,
+                "hour": _to_datetime(hour),
+                "energy_wh": float(energy[i]),
+                "producing_seconds": float(producing[i]),
+                "covered_seconds": float(covered[i]),
+                "gap_count": int(gap_count[i]),
+                "gap_seconds": float(gap_seconds[i]),
+                "sample_count": int(sample_count[i]),
+                "power_sum": float(power_sum[i]),
+                "power_min": None if power_min[i] is None else float(power_min[i]),
+                "power_max": None if power_max[i] is None else float(power_max[i]),
+                "updated_at": now
+            }
+            for i, hour in enumerate(hours)
+        ]
+        db.bulk_insert_mappings(HourlyEnergySummary, mappings)
+        # As horas do intervalo são exatamente as recém-gravadas
+        record_changes(db, "hourly_energy", [row.id for row in delete_query.with_entities(HourlyEnergySummary.id)])
+
+        last_index = int(np.argmax(times))
+        last = self._last_sample.get(inverter_id)
+        last_time = _to_datetime(times[last_index])
+        if last is None or last_time >= last[0]:
+            self._last_sample[inverter_id] = (last_time, float(powers[last_index]))
+        return int(hours.size)
+
+    def restore(self, db: Session):
+        """Retomar os acumuladores ao iniciar o serviço
+
+        Recalcula a partir da última hora resumida de cada inversor (ou todo o
+        histórico, na primeira execução), cobrindo medições gravadas enquanto
+        o serviço estava parado.
+        """
+        for (inverter_id,) in db.query(Inverter.id).all():
+            latest = db.query(HourlyEnergySummary.hour)\
+                .filter(HourlyEnergySummary.inverter_id == inverter_id)\
+                .order_by(HourlyEnergySummary.hour.desc())\
+                .first()
+            hours = self.rebuild(db, inverter_id, latest[0] if latest else None)
+            logger.info(f"Acumulador de energia do inversor {inverter_id} retomado ({hours} horas recalculadas)")
+        db.commit()
+
+
+# Instância global dos acumuladores
+energy_accumulator = EnergyAccumulator(settings.ENERGY_MAX_GAP_SECONDS)
@@ -0,0 +1,217 @@
+"""
+Serialização rápida de listagens grandes
+
+As listagens selecionam só as colunas do schema de resposta e convertem as
+linhas do resultado direto em bytes JSON (orjson), sem criar objetos ORM
+nem validar um modelo Pydantic por linha. O schema continua declarado no
+endpoint (response_model), então a documentação OpenAPI não muda; o JSON
+gerado tem os mesmos campos, na mesma ordem.
+
+Pelo cabeçalho Accept o cliente pode pedir os mesmos dados em Arrow IPC
+(colunar, requer pyarrow) ou MessagePack (requer msgpack).
+"""
+
+import json
+import typing
+from datetime import date, datetime
+from typing import Any, Dict, List, Optional, Sequence, Type
+
+from fastapi import Response
+from pydantic import BaseModel
+from sqlalchemy.orm import Query, Session
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - dependência opcional
+    orjson = None
+
+try:
+    import pyarrow as pa
+except ImportError:  # pragma: no cover - dependência opcional
+    pa = None
+
+try:
+    import msgpack
+except ImportError:  # pragma: no cover - dependência opcional
+    msgpack = None
+
+JSON_MEDIA_TYPE = "application/json"
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+
+# Documentação OpenAPI dos formatos binários das listagens
+BINARY_RESPONSES = {
+    200: {
+        "content": {
+            ARROW_MEDIA_TYPE: {"schema": {"type": "string", "format": "binary"}},
+            MSGPACK_MEDIA_TYPE: {"schema": {"type": "string", "format": "binary"}},
+        },
+        "description": "JSON por padrão; Arrow IPC ou MessagePack conforme o cabeçalho Accept",
+    }
+}
+
+
+def orjson_available() -> bool:
+    return orjson is not None
+
+
+def _available_media_types() -> Dict[str, str]:
+    """Tipos aceitos no Accept -> formato"""
+    media_types = {JSON_MEDIA_TYPE: "json", "*/*": "json", "application/*": "json"}
+    if pa is not None:
+        media_types[ARROW_MEDIA_TYPE] = "arrow"
+    if msgpack is not None:
+        media_types[MSGPACK_MEDIA_TYPE] = "msgpack"
+        media_types["application/x-msgpack"] = "msgpack"
+    return media_types
+
+
+def negotiate_format(accept: Optional[str]) -> str:
+    """Formato da resposta pelo cabeçalho Accept ("json", "arrow" ou "msgpack")"""
+    if not accept:
+        return "json"
+    available = _available_media_types()
+    best = ("json", 0.0)
+    for part in accept.split(","):
+        media_type, _, params = part.strip().partition(";")
+        quality = 1.0
+        for param in params.split(";"):
+            name, _, value = param.strip().partition("=")
+            if name == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        format = available.get(media_type.strip().lower())
+        if format is None or quality <= 0:
+            continue
+        # Em empate, preferir o formato binário pedido explicitamente
+        if quality > best[1] or (quality == best[1] and format != "json"):
+            best = (format, quality)
+    return best[0]
+
+
+_ARROW_TYPES = {float: "float64", int: "int64", bool: "bool_", str: "string"}
+
+
+def _arrow_type(annotation: Any):
+    """Tipo Arrow de um campo Pydantic (Optional é removido)"""
+    args = [arg for arg in typing.get_args(annotation) if arg is not type(None)]
+    if typing.get_origin(annotation) is typing.Union and len(args) == 1:
+        annotation = args[0]
+    if annotation is datetime:
+        return pa.timestamp("us")
+    if annotation in _ARROW_TYPES:
+        return getattr(pa, _ARROW_TYPES[annotation])()
+    raise ValueError(f"Campo sem tipo Arrow correspondente: {annotation}")
+
+
+class SchemaColumns:
+    """Colunas de um modelo ORM correspondentes aos campos de um schema
+
+    Campos do schema sem coluna no modelo saem como null (como faz a
+    validação from_attributes com o valor padrão None). As colunas-chave
+    (usadas na paginação) são sempre selecionadas, mesmo fora de `fields`.
+    """
+
+    def __init__(
+        self,
+        model: Any,
+        schema: Type[BaseModel],
+        fields: Optional[Sequence[str]] = None,
+        keys: Sequence[str] = ("id", "timestamp")
+    ):
+        table_columns = model.__table__.columns
+        self.model = model
+        self.schema = schema
+        self.keys = tuple(keys)
+        self.fields = list(schema.model_fields) if fields is None else list(fields)
+        names = [name for name in self.fields if name in table_columns]
+        names += [key for key in self.keys if key in table_columns and key not in names]
+        self.columns = [getattr(model, name) for name in names]
+        self._positions = [names.index(name) if name in names else None for name in self.fields]
+        self._complete = all(position == i for i, position in enumerate(self._positions))
+
+    def project(self, fields: Optional[str]) -> "SchemaColumns":
+        """Apenas os campos pedidos ("timestamp,power_output"); vazio = todos
+
+        ValueError se algum campo não existir no schema.
+        """
+        if not fields:
+            return self
+        requested = {name.strip() for name in fields.split(",") if name.strip()}
+        unknown = sorted(requested - set(self.schema.model_fields))
+        if unknown:
+            raise ValueError(f"Campos inválidos: {', '.join(unknown)}")
+        return SchemaColumns(
+            self.model,
+            self.schema,
+            [name for name in self.schema.model_fields if name in requested],
+            self.keys
+        )
+
+    def query(self, db: Session) -> Query:
+        return db.query(*self.columns)
+
+    def records(self, rows: Sequence[Sequence[Any]]) -> List[Dict[str, Any]]:
+        fields = self.fields
+        if self._complete:
+            return [dict(zip(fields, row)) for row in rows]
+        positions = self._positions
+        return [
+            dict(zip(fields, [None if position is None else row[position] for position in positions]))
+            for row in rows
+        ]
+
+    def arrow_table(self, rows: Sequence[Sequence[Any]]):
+        """Tabela Arrow (uma coluna por campo do schema)"""
+        values = list(zip(*rows)) if rows else [()] * len(self.columns)
+        arrays, names = [], []
+        for name, position in zip(self.fields, self._positions):
+            arrow_type = _arrow_type(self.schema.model_fields[name].annotation)
+            if position is None:
+                arrays.append(pa.nulls(len(rows), arrow_type))
+            else:
+                arrays.append(pa.array(values[position], type=arrow_type))
+            names.append(name)
+        return pa.Table.from_arrays(arrays, names=names)
+
+
+def _default(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Tipo não serializável: {type(value).__name__}")
+
+
+def dumps(data: Any) -> bytes:
+    """JSON em bytes (orjson quando disponível)"""
+    if orjson is not None:
+        return orjson.dumps(data)
+    return json.dumps(data, default=_default, separators=(",", ":")).encode("utf-8")
+
+
+def _arrow_bytes(table) -> bytes:
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def rows_response(
+    columns: SchemaColumns,
+    rows: Sequence[Sequence[Any]],
+    headers: Optional[Dict[str, str]] = None,
+    accept: Optional[str] = None
+) -> Response:
+    """Resposta de uma lista de linhas selecionadas com `columns.query`
+
+    JSON por padrão; Arrow IPC ou MessagePack quando pedidos no Accept.
+    """
+    headers = {**(headers or {}), "Vary": "Accept"}
+    format = negotiate_format(accept)
+    if format == "arrow":
+        return Response(content=_arrow_bytes(columns.arrow_table(rows)), media_type=ARROW_MEDIA_TYPE, headers=headers)
+    if format == "msgpack":
+        content = msgpack.packb(columns.records(rows), default=_default)
+        return Response(content=content, media_type=MSGPACK_MEDIA_TYPE, headers=headers)
+    return Response(content=dumps(columns.records(rows)), media_type=JSON_MEDIA_TYPE, headers=headers)
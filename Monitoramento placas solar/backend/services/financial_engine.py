@@ -0,0 +1,223 @@
+"""
+Motor financeiro (economia e retorno do investimento)
+
+Lê a energia dos resumos horários e aplica a tabela de tarifas por posto
+horário (TARIFF_CONFIG) de forma vetorizada. A série horária do último ano
+é mantida em memória por inversor e atualizada incrementalmente (só as horas
+a partir da última hora conhecida são relidas). O resultado anual fica em
+cache por inversor e tarifa, junto com a projeção da economia acumulada com
+degradação, de modo que variar o custo do sistema não exige novo cálculo.
+"""
+
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from ..config import settings, TARIFF_CONFIG
+from ..models import Inverter, HourlyEnergySummary
+
+logger = logging.getLogger(__name__)
+
+DAYS_PER_WEEK = 7
+HOURS_PER_DAY = 24
+BASE_PERIOD = "fora_ponta"
+
+
+def build_price_table(tariff: Dict[str, Any]) -> Tuple[np.ndarray, np.ndarray, List[str]]:
+    """Tabela de preços (dia da semana x hora local) e índice do posto horário"""
+    prices = np.full((DAYS_PER_WEEK, HOURS_PER_DAY), float(tariff["base_price"]))
+    periods = np.zeros((DAYS_PER_WEEK, HOURS_PER_DAY), dtype=np.int64)
+    names = [BASE_PERIOD]
+
+    # Postos definidos depois têm prioridade sobre os anteriores
+    for period in tariff.get("periods", []):
+        names.append(period["name"])
+        weekdays = np.asarray(period.get("weekdays", range(DAYS_PER_WEEK)), dtype=np.int64)
+        hours = np.asarray(period["hours"], dtype=np.int64)
+        prices[np.ix_(weekdays, hours)] = float(period["price"])
+        periods[np.ix_(weekdays, hours)] = len(names) - 1
+    return prices, periods, names
+
+
+class _EnergySeries:
+    """Energia horária (Wh) do último ano de um inversor"""
+
+    def __init__(self):
+        self.hours = np.array([], dtype="datetime64[h]")
+        self.energy_wh = np.array([], dtype=np.float64)
+
+    def signature(self) -> tuple:
+        if self.hours.size == 0:
+            return (0,)
+        return (int(self.hours.size), self.hours[0], self.hours[-1], float(self.energy_wh.sum()))
+
+
+class FinancialEngine:
+    """Economia anual por tarifa e projeção de retorno do investimento"""
+
+    def __init__(self, utc_offset_hours: int):
+        self.utc_offset = np.timedelta64(utc_offset_hours, "h")
+        self._series: Dict[int, _EnergySeries] = {}
+        self._results: Dict[tuple, tuple] = {}
+        self._lock = threading.Lock()
+
+    def resolve_tariff(
+        self,
+        name: Optional[str] = None,
+        flat_price: Optional[float] = None
+    ) -> Tuple[tuple, Dict[str, Any]]:
+        """Obter (chave, definição) da tarifa pedida ou de preço único"""
+        if flat_price is not None:
+            return ("flat", float(flat_price)), {"base_price": flat_price, "periods": []}
+
+        name = name or TARIFF_CONFIG["default_tariff"]
+        tariff = TARIFF_CONFIG["tariffs"].get(name)
+        if tariff is None:
+            raise ValueError(f"Tarifa desconhecida: {name}")
+        return ("tariff", name), tariff
+
+    def annual_summary(
+        self,
+        db: Session,
+        tariff_name: Optional[str] = None,
+        flat_price: Optional[float] = None,
+        inverter_id: Optional[int] = None,
+        degradation_rate: Optional[float] = None
+    ) -> Dict[str, Any]:
+        """Produção e economia dos últimos 365 dias com a projeção acumulada"""
+        tariff_key, tariff = self.resolve_tariff(tariff_name, flat_price)
+        if degradation_rate is None:
+            degradation_rate = TARIFF_CONFIG["degradation_rate"]
+        start = datetime.utcnow() - timedelta(days=365)
+
+        query = db.query(Inverter.id)
+        if inverter_id:
+            query = query.filter(Inverter.id == inverter_id)
+        inverter_ids = [row[0] for row in query.all()]
+
+        with self._lock:
+            signatures = tuple(
+                (i, self._refresh_series(db, i, start).signature()) for i in inverter_ids
+            )
+            key = (inverter_id, tariff_key, degradation_rate)
+            cached = self._results.get(key)
+            if cached is not None and cached[0] == signatures:
+                return cached[1]
+
+            summary = self._compute(inverter_ids, tariff, degradation_rate)
+            self._results[key] = (signatures, summary)
+            return summary
+
+    def invalidate(self, inverter_id: Optional[int] = None):
+        """Descartar séries e resultados (após reconstrução dos resumos)"""
+        with self._lock:
+            if inverter_id is None:
+                self._series.clear()
+            else:
+                self._series.pop(inverter_id, None)
+            self._results.clear()
+
+    def _refresh_series(self, db: Session, inverter_id: int, start: datetime) -> _EnergySeries:
+        series = self._series.get(inverter_id)
+        if series is None:
+            series = self._series[inverter_id] = _EnergySeries()
+            since = start
+        else:
+            # A última hora conhecida pode ainda estar aberta: reler a partir dela
+            since = series.hours[-1].item() if series.hours.size else start
+
+        rows = db.query(HourlyEnergySummary.hour, HourlyEnergySummary.energy_wh)\
+            .filter(
+                HourlyEnergySummary.inverter_id == inverter_id,
+                HourlyEnergySummary.hour >= since
+            )\
+            .order_by(HourlyEnergySummary.hour.asc())\
+            .all()
+
+        if rows:
+            hours, energy = zip(*rows)
+            keep = series.hours < np.datetime64(since, "h")
+            series.hours = np.concatenate([series.hours[keep], np.array(hours, dtype="datetime64[h]")])
+            series.energy_wh = np.concatenate([
+                series.energy_wh[keep],
+                np.array([e or 0.0 for e in energy], dtype=np.float64)
+            ])
+
+        # Descartar as horas que saíram da janela de um ano
+        in_window = series.hours >= np.datetime64(start)
+        if not in_window.all():
+            series.hours = series.hours[in_window]
+            series.energy_wh = series.energy_wh[in_window]
+        return series
+
+    def _compute(self, inverter_ids: List[int], tariff: Dict[str, Any], degradation_rate: float) -> Dict[str, Any]:
+        prices, periods, names = build_price_table(tariff)
+        energy_by_period = np.zeros(len(names))
+        savings_by_period = np.zeros(len(names))
+
+        for inverter_id in inverter_ids:
+            series = self._series[inverter_id]
+            if series.hours.size == 0:
+                continue
+            local = series.hours + self.utc_offset
+            days = local.astype("datetime64[D]")
+            # 1970-01-01 foi quinta-feira (3 com segunda = 0)
+            weekday = (days.astype(np.int64) + 3) % DAYS_PER_WEEK
+            hour = (local - days).astype(np.int64)
+
+            energy_kwh = series.energy_wh / 1000
+            period = periods[weekday, hour]
+            energy_by_period += np.bincount(period, weights=energy_kwh, minlength=len(names))
+            savings_by_period += np.bincount(period, weights=energy_kwh * prices[weekday, hour], minlength=len(names))
+
+        annual_production = float(energy_by_period.sum())
+        annual_savings = float(savings_by_period.sum())
+
+        # Economia de cada ano da vida útil, com perda de produção anual
+        lifetime_years = TARIFF_CONFIG["lifetime_years"]
+        yearly = annual_savings * (1 - degradation_rate) ** np.arange(lifetime_years)
+
+        return {
+            "annual_production": annual_production,
+            "annual_savings": annual_savings,
+            "average_price": annual_savings / annual_production if annual_production > 0 else 0.0,
+            "energy_by_period": {
+                name: {"energy": float(energy_by_period[i]), "savings": float(savings_by_period[i])}
+                for i, name in enumerate(names)
+            },
+            "degradation_rate": degradation_rate,
+            "yearly_savings": yearly,
+            "cumulative_savings": np.cumsum(yearly)
+        }
+
+    @staticmethod
+    def payback(summary: Dict[str, Any], system_cost: float) -> Dict[str, Any]:
+        """Payback, ROI em 10 anos e saldo na vida útil para um custo de sistema"""
+        yearly = summary["yearly_savings"]
+        cumulative = summary["cumulative_savings"]
+        if summary["annual_savings"] <= 0:
+            payback_years = 0
+        else:
+            # Primeiro ano em que a economia acumulada cobre o custo
+            year = int(np.searchsorted(cumulative, system_cost))
+            if year >= cumulative.size:
+                payback_years = None
+            else:
+                previous = cumulative[year - 1] if year > 0 else 0.0
+                payback_years = year + (system_cost - previous) / yearly[year]
+
+        savings_10_years = cumulative[min(10, cumulative.size) - 1]
+        roi_10_years = ((savings_10_years - system_cost) / system_cost) * 100 if system_cost > 0 else 0
+        return {
+            "payback_period_years": payback_years,
+            "roi_10_years": float(roi_10_years),
+            "lifetime_savings": float(cumulative[-1] - system_cost)
+        }
+
+
+# Instância global do motor financeiro
+financial_engine = FinancialEngine(settings.SITE_UTC_OFFSET)
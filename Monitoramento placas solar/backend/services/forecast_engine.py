@@ -0,0 +1,193 @@
+"""
+Motor de previsão de produção baseado em céu claro
+
+A irradiância de céu claro é calculada a partir das coordenadas da usina
+(geometria solar vetorizada + modelo de Haurwitz), sem acesso à rede. Para
+cada inversor é ajustado um índice de céu claro por hora do dia
+(potência medida / potência de céu claro), mantido como somas suficientes
+que são atualizadas incrementalmente conforme chegam novas medições.
+"""
+
+import logging
+import threading
+from datetime import date, datetime, timedelta
+from typing import Dict, List, Optional
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from ..config import settings, EQUIPMENT_CONFIG
+from ..models import Inverter
+from .measurement_loader import load_measurement_columns
+
+logger = logging.getLogger(__name__)
+
+HOURS_PER_DAY = 24
+HISTORY_DAYS = 30          # Histórico usado no primeiro ajuste
+HALF_LIFE_DAYS = 30.0      # Meia-vida do peso das medições antigas
+MIN_HOUR_WEIGHT = 1e-3     # Peso mínimo para confiar no índice de uma hora
+MAX_CLEAR_SKY_INDEX = 1.5
+
+
+def clear_sky_irradiance(timestamps: np.ndarray, latitude: float, longitude: float) -> np.ndarray:
+    """Irradiância global horizontal de céu claro (W/m²) para instantes UTC"""
+    timestamps = np.asarray(timestamps, dtype="datetime64[s]")
+    days = timestamps.astype("datetime64[D]")
+    day_of_year = (days - timestamps.astype("datetime64[Y]")).astype(np.int64) + 1
+    hour = (timestamps - days).astype(np.int64) / 3600.0
+
+    # Ângulo diário (Spencer) e equação do tempo
+    gamma = 2 * np.pi / 365 * (day_of_year - 1 + (hour - 12) / 24)
+    equation_of_time = 229.18 * (
+        0.000075 + 0.001868 * np.cos(gamma) - 0.032077 * np.sin(gamma)
+        - 0.014615 * np.cos(2 * gamma) - 0.040849 * np.sin(2 * gamma)
+    )
+    declination = (
+        0.006918 - 0.399912 * np.cos(gamma) + 0.070257 * np.sin(gamma)
+        - 0.006758 * np.cos(2 * gamma) + 0.000907 * np.sin(2 * gamma)
+        - 0.002697 * np.cos(3 * gamma) + 0.00148 * np.sin(3 * gamma)
+    )
+
+    # Ângulo horário a partir do tempo solar verdadeiro
+    true_solar_minutes = hour * 60 + equation_of_time + 4 * longitude
+    hour_angle = np.radians(true_solar_minutes / 4 - 180)
+
+    lat = np.radians(latitude)
+    cos_zenith = np.sin(lat) * np.sin(declination) + \
+        np.cos(lat) * np.cos(declination) * np.cos(hour_angle)
+
+    # Modelo de Haurwitz
+    irradiance = np.zeros_like(cos_zenith)
+    day_light = cos_zenith > 0.01
+    irradiance[day_light] = 1098 * cos_zenith[day_light] * np.exp(-0.059 / cos_zenith[day_light])
+    return irradiance
+
+
+def predict_power(
+    index: np.ndarray,
+    rated: np.ndarray,
+    start: date,
+    days_ahead: int,
+    latitude: float,
+    longitude: float
+) -> Dict[str, np.ndarray]:
+    """Previsão horária a partir dos índices de céu claro (inversores x 24)
+
+    Retorna "hours" (T,), "power" (inversores x T) em W e
+    "daily_energy" (inversores x dias) em kWh.
+    """
+    hours = np.datetime64(start, "h") + np.arange(days_ahead * HOURS_PER_DAY)
+    irradiance = clear_sky_irradiance(hours + np.timedelta64(30, "m"), latitude, longitude)
+    hour_of_day = np.arange(hours.size) % HOURS_PER_DAY
+
+    power = index[:, hour_of_day] * rated[:, None] * irradiance[None, :] / 1000
+    daily_energy = power.reshape(len(rated), days_ahead, HOURS_PER_DAY).sum(axis=2) / 1000
+    return {"hours": hours, "power": power, "daily_energy": daily_energy}
+
+
+class _InverterFit:
+    """Somas suficientes do ajuste de um inversor"""
+
+    def __init__(self, rated_power: float):
+        self.rated_power = rated_power
+        self.sxy = np.zeros(HOURS_PER_DAY)
+        self.sxx = np.zeros(HOURS_PER_DAY)
+        self.samples = 0
+        self.last_id: Optional[int] = None
+        self.first_time: Optional[np.datetime64] = None
+        self.last_time: Optional[np.datetime64] = None
+
+    def history_days(self) -> float:
+        if self.first_time is None:
+            return 0.0
+        return (self.last_time - self.first_time) / np.timedelta64(1, "D")
+
+    def clear_sky_index(self) -> np.ndarray:
+        """Índice de céu claro por hora do dia (global nas horas sem dados)"""
+        total_xx = self.sxx.sum()
+        overall = self.sxy.sum() / total_xx if total_xx > 0 else 0.0
+        with np.errstate(divide="ignore", invalid="ignore"):
+            index = np.where(self.sxx > MIN_HOUR_WEIGHT * max(total_xx, 1e-12), self.sxy / self.sxx, overall)
+        return np.clip(index, 0.0, MAX_CLEAR_SKY_INDEX)
+
+
+class ForecastEngine:
+    """Ajuste e previsão em lote do índice de céu claro por inversor"""
+
+    def __init__(self, latitude: float, longitude: float):
+        self.latitude = latitude
+        self.longitude = longitude
+        self._fits: Dict[int, _InverterFit] = {}
+        # Ajustes podem ser atualizados pelo pré-cálculo (thread) e por requisições
+        self._lock = threading.Lock()
+
+    def refit(self, db: Session, inverter_ids: Optional[List[int]] = None) -> Dict[int, _InverterFit]:
+        """Atualizar o ajuste com as medições que chegaram desde o último ajuste"""
+        query = db.query(Inverter.id, Inverter.rated_power)
+        if inverter_ids:
+            query = query.filter(Inverter.id.in_(inverter_ids))
+        default_rated = EQUIPMENT_CONFIG["inverter"]["rated_power"]
+
+        fits = {}
+        with self._lock:
+            for inverter_id, rated_power in query.all():
+                fit = self._fits.get(inverter_id)
+                if fit is None:
+                    fit = self._fits[inverter_id] = _InverterFit(rated_power or default_rated)
+                fit.rated_power = rated_power or default_rated
+                self._update_fit(db, inverter_id, fit)
+                fits[inverter_id] = fit
+        return fits
+
+    def _update_fit(self, db: Session, inverter_id: int, fit: _InverterFit):
+        start_time = None
+        if fit.last_id is None:
+            start_time = datetime.utcnow() - timedelta(days=HISTORY_DAYS)
+
+        data = load_measurement_columns(
+            db,
+            ["id", "power_output"],
+            start_time=start_time,
+            inverter_id=inverter_id,
+            not_null=["power_output"],
+            min_id=fit.last_id
+        )
+        timestamps = data["timestamp"]
+        if timestamps.size == 0:
+            return
+
+        # Decaimento das somas antigas para acompanhar a sazonalidade
+        newest = timestamps.max()
+        if fit.last_time is not None and newest > fit.last_time:
+            elapsed_days = (newest - fit.last_time) / np.timedelta64(1, "D")
+            decay = 0.5 ** (elapsed_days / HALF_LIFE_DAYS)
+            fit.sxy *= decay
+            fit.sxx *= decay
+
+        expected = fit.rated_power * clear_sky_irradiance(timestamps, self.latitude, self.longitude) / 1000
+        hours = ((timestamps - timestamps.astype("datetime64[D]")) // np.timedelta64(1, "h")).astype(np.int64)
+        fit.sxy += np.bincount(hours, weights=data["power_output"] * expected, minlength=HOURS_PER_DAY)
+        fit.sxx += np.bincount(hours, weights=expected * expected, minlength=HOURS_PER_DAY)
+
+        fit.samples += int(timestamps.size)
+        fit.last_id = int(data["id"].max())
+        fit.first_time = timestamps.min() if fit.first_time is None else fit.first_time
+        fit.last_time = newest if fit.last_time is None else max(fit.last_time, newest)
+
+    @staticmethod
+    def fit_arrays(fits: Dict[int, _InverterFit]):
+        """Índices de céu claro (inversores x 24) e potências nominais dos ajustes"""
+        if not fits:
+            return np.zeros((0, HOURS_PER_DAY)), np.zeros(0)
+        index = np.stack([fit.clear_sky_index() for fit in fits.values()])
+        rated = np.array([fit.rated_power for fit in fits.values()], dtype=np.float64)
+        return index, rated
+
+    def predict(self, fits: Dict[int, _InverterFit], start: date, days_ahead: int) -> Dict[str, np.ndarray]:
+        """Previsão horária de todos os inversores numa única operação vetorizada"""
+        index, rated = self.fit_arrays(fits)
+        return predict_power(index, rated, start, days_ahead, self.latitude, self.longitude)
+
+
+# Instância global do motor de previsão
+forecast_engine = ForecastEngine(settings.SITE_LATITUDE, settings.SITE_LONGITUDE)
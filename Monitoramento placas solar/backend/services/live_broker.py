@@ -0,0 +1,135 @@
+"""
+Distribuição das medições ao vivo para WebSocket e SSE
+
+O coletor publica cada medição gravada uma única vez; a mensagem é
+serializada uma vez e entregue a todos os clientes inscritos no inversor,
+sem consultas ao banco por cliente. Cada cliente guarda no máximo uma
+mensagem pendente por inversor: um consumidor lento recebe só a medição
+mais recente, em vez de acumular uma fila.
+"""
+
+import asyncio
+import json
+import logging
+from typing import Any, Dict, List, Optional, Set
+
+from ..schemas.data_schemas import MeasurementResponse
+
+logger = logging.getLogger(__name__)
+
+
+def parse_inverter_ids(value: Optional[str]) -> Optional[Set[int]]:
+    """Lista "1,2,3" -> {1, 2, 3}; vazio = todos os inversores"""
+    if not value:
+        return None
+    try:
+        return {int(part) for part in value.split(",") if part.strip()}
+    except ValueError:
+        raise ValueError("Lista de inversores inválida")
+
+
+class LiveSubscription:
+    """Inscrição de um cliente: filtro de inversores e mensagens pendentes"""
+
+    def __init__(self, inverter_ids: Optional[Set[int]] = None):
+        self.inverter_ids = inverter_ids  # None = todos
+        self.excluded: Set[int] = set()  # removidos de "todos"
+        self.coalesced = 0  # mensagens substituídas antes de serem enviadas
+        self._pending: Dict[int, str] = {}
+        self._event = asyncio.Event()
+
+    def wants(self, inverter_id: int) -> bool:
+        if self.inverter_ids is None:
+            return inverter_id not in self.excluded
+        return inverter_id in self.inverter_ids
+
+    def subscribe(self, inverter_ids: Set[int]):
+        if self.inverter_ids is None:
+            self.excluded -= inverter_ids
+        else:
+            self.inverter_ids |= inverter_ids
+
+    def unsubscribe(self, inverter_ids: Set[int]):
+        # Inscrito em todos: passa a receber todos exceto os removidos,
+        # inclusive inversores que só aparecerem depois
+        if self.inverter_ids is None:
+            self.excluded |= inverter_ids
+        else:
+            self.inverter_ids -= inverter_ids
+        for inverter_id in inverter_ids:
+            self._pending.pop(inverter_id, None)
+
+    def push(self, inverter_id: int, payload: str):
+        if inverter_id in self._pending:
+            self.coalesced += 1
+        self._pending[inverter_id] = payload
+        self._event.set()
+
+    async def next(self, timeout: Optional[float] = None) -> List[str]:
+        """Aguardar e retirar as mensagens pendentes ([] se o tempo esgotar)"""
+        try:
+            await asyncio.wait_for(self._event.wait(), timeout)
+        except asyncio.TimeoutError:
+            return []
+        self._event.clear()
+        payloads = list(self._pending.values())
+        self._pending = {}
+        return payloads
+
+
+class LiveBroker:
+    """Publica medições para as inscrições ativas"""
+
+    def __init__(self):
+        self._subscriptions: Set[LiveSubscription] = set()
+        self._latest: Dict[int, str] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._published = 0
+
+    def subscribe(self, inverter_ids: Optional[Set[int]] = None) -> LiveSubscription:
+        """Nova inscrição, já com a última medição conhecida de cada inversor"""
+        self._loop = asyncio.get_running_loop()
+        subscription = LiveSubscription(inverter_ids)
+        for inverter_id, payload in self._latest.items():
+            if subscription.wants(inverter_id):
+                subscription.push(inverter_id, payload)
+        self._subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: LiveSubscription):
+        self._subscriptions.discard(subscription)
+
+    def publish_measurement(self, inverter_id: int, measurement: Any):
+        """Publicar uma medição do inversor (objeto ORM ou equivalente)"""
+        data = MeasurementResponse.model_validate(measurement).model_dump(mode="json")
+        payload = json.dumps({"type": "measurement", "inverter_id": inverter_id, "data": data})
+        self._dispatch_threadsafe(inverter_id, payload)
+
+    def _dispatch_threadsafe(self, inverter_id: int, payload: str):
+        # asyncio.Event só pode ser acionado na thread do loop dos clientes
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if self._loop is not None and running is not self._loop and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._dispatch, inverter_id, payload)
+        else:
+            self._dispatch(inverter_id, payload)
+
+    def _dispatch(self, inverter_id: int, payload: str):
+        self._latest[inverter_id] = payload
+        self._published += 1
+        for subscription in list(self._subscriptions):
+            if subscription.wants(inverter_id):
+                subscription.push(inverter_id, payload)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "subscribers": len(self._subscriptions),
+            "published": self._published,
+            "coalesced": sum(subscription.coalesced for subscription in self._subscriptions)
+        }
+
+
+# Instância global do distribuidor
+live_broker = LiveBroker()
@@ -0,0 +1,104 @@
+"""
+Carregamento colunar de medições do inversor
+
+Executa um SELECT apenas com as colunas pedidas e preenche arrays NumPy
+diretamente a partir do cursor, em blocos, sem criar objetos ORM.
+"""
+
+import logging
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from ..models import InverterMeasurement
+
+logger = logging.getLogger(__name__)
+
+# Colunas que podem ser carregadas (nome -> coluna do modelo)
+MEASUREMENT_FIELDS = {
+    "id": InverterMeasurement.id,
+    "inverter_id": InverterMeasurement.inverter_id,
+    "power_output": InverterMeasurement.power_output,
+    "energy_daily": InverterMeasurement.energy_daily,
+    "energy_total": InverterMeasurement.energy_total,
+    "voltage_dc": InverterMeasurement.voltage_dc,
+    "current_dc": InverterMeasurement.current_dc,
+    "voltage_ac": InverterMeasurement.voltage_ac,
+    "current_ac": InverterMeasurement.current_ac,
+    "frequency": InverterMeasurement.frequency,
+    "temperature": InverterMeasurement.temperature,
+    "efficiency": InverterMeasurement.efficiency,
+    "status_code": InverterMeasurement.status_code,
+    "fault_code": InverterMeasurement.fault_code,
+    "uptime": InverterMeasurement.uptime,
+}
+
+# Identificadores (não são séries de valores)
+KEY_FIELDS = {"id", "inverter_id"}
+
+# Colunas sem NULL que podem manter tipo inteiro; inverter_id aceita NULL
+# e é carregado como float (NaN)
+INTEGER_FIELDS = {"id"}
+
+DEFAULT_CHUNK_SIZE = 10000
+
+
+def load_measurement_columns(
+    db: Session,
+    fields: Iterable[str],
+    start_time: Optional[datetime] = None,
+    end_time: Optional[datetime] = None,
+    inverter_id: Optional[int] = None,
+    not_null: Iterable[str] = (),
+    min_id: Optional[int] = None,
+    chunk_size: int = DEFAULT_CHUNK_SIZE
+) -> Dict[str, np.ndarray]:
+    """Carregar medições como arrays NumPy (timestamp + campos pedidos)
+
+    O intervalo é fechado no início e aberto no fim. Valores NULL viram NaN
+    (inclusive em inverter_id).
+    """
+    fields = [f for f in dict.fromkeys(fields) if f != "timestamp"]
+    unknown = [f for f in fields if f not in MEASUREMENT_FIELDS]
+    if unknown:
+        raise ValueError(f"Campos desconhecidos: {', '.join(unknown)}")
+
+    stmt = select(
+        InverterMeasurement.timestamp,
+        *[MEASUREMENT_FIELDS[f] for f in fields]
+    )
+    if inverter_id is not None:
+        stmt = stmt.where(InverterMeasurement.inverter_id == inverter_id)
+    if start_time is not None:
+        stmt = stmt.where(InverterMeasurement.timestamp >= start_time)
+    if end_time is not None:
+        stmt = stmt.where(InverterMeasurement.timestamp < end_time)
+    if min_id is not None:
+        stmt = stmt.where(InverterMeasurement.id > min_id)
+    for field in not_null:
+        stmt = stmt.where(MEASUREMENT_FIELDS[field].isnot(None))
+    stmt = stmt.order_by(InverterMeasurement.timestamp.asc())
+
+    names = ["timestamp"] + fields
+    chunks: Dict[str, List[np.ndarray]] = {name: [] for name in names}
+
+    result = db.execute(stmt.execution_options(yield_per=chunk_size))
+    for partition in result.partitions():
+        columns = list(zip(*partition))
+        chunks["timestamp"].append(np.array(columns[0], dtype="datetime64[us]"))
+        for name, values in zip(fields, columns[1:]):
+            dtype = np.int64 if name in INTEGER_FIELDS else np.float64
+            chunks[name].append(np.array(values, dtype=dtype))
+
+    arrays = {}
+    for name in names:
+        if chunks[name]:
+            arrays[name] = np.concatenate(chunks[name])
+        elif name == "timestamp":
+            arrays[name] = np.array([], dtype="datetime64[us]")
+        else:
+            arrays[name] = np.array([], dtype=np.int64 if name in INTEGER_FIELDS else np.float64)
+    return arrays
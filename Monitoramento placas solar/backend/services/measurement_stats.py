@@ -0,0 +1,200 @@
+"""
+Estatísticas diárias das medições por inversor
+
+Para potência, energia diária, temperatura e eficiência cada dia guarda
+contagem, soma, mínimo, máximo e um sketch de quantis. As linhas são
+atualizadas a cada medição na ingestão; estatísticas de qualquer intervalo
+de dias saem de uma única consulta agregada sobre essas linhas, com custo
+proporcional ao número de dias e não ao de medições.
+"""
+
+import logging
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from ..models import DailyMeasurementStats, Inverter, InverterMeasurement
+from .measurement_loader import load_measurement_columns
+from .quantile_sketch import QuantileSketch
+
+logger = logging.getLogger(__name__)
+
+# Prefixo das colunas de DailyMeasurementStats -> campo da medição
+STAT_FIELDS = {
+    "power": "power_output",
+    "energy": "energy_daily",
+    "temperature": "temperature",
+    "efficiency": "efficiency",
+}
+
+
+def _field_values(values: np.ndarray) -> Dict[str, Any]:
+    """Colunas de um campo para um conjunto de valores (NaN ignorados)"""
+    values = values[~np.isnan(values)]
+    sketch = QuantileSketch()
+    sketch.add(values)
+    return {
+        "count": int(values.size),
+        "sum": float(values.sum()),
+        "min": float(values.min()) if values.size else None,
+        "max": float(values.max()) if values.size else None,
+        "sketch": sketch.to_json()
+    }
+
+
+class MeasurementStatsAccumulator:
+    """Atualiza as estatísticas diárias das medições na ingestão"""
+
+    def add_measurement(self, db: Session, measurement: InverterMeasurement):
+        """Somar uma nova medição ao dia (a transação fica a cargo do chamador)"""
+        if measurement.timestamp is None:
+            return
+
+        timestamp = measurement.timestamp
+        day = datetime(timestamp.year, timestamp.month, timestamp.day)
+        row = db.query(DailyMeasurementStats)\
+            .filter(DailyMeasurementStats.inverter_id == measurement.inverter_id)\
+            .filter(DailyMeasurementStats.day == day)\
+            .first()
+        if not row:
+            row = DailyMeasurementStats(inverter_id=measurement.inverter_id, day=day, measurement_count=0)
+            for prefix in STAT_FIELDS:
+                setattr(row, f"{prefix}_count", 0)
+                setattr(row, f"{prefix}_sum", 0.0)
+            db.add(row)
+
+        row.measurement_count += 1
+        for prefix, field in STAT_FIELDS.items():
+            value = getattr(measurement, field)
+            if value is None:
+                continue
+            value = float(value)
+            setattr(row, f"{prefix}_count", getattr(row, f"{prefix}_count") + 1)
+            setattr(row, f"{prefix}_sum", getattr(row, f"{prefix}_sum") + value)
+            current_min = getattr(row, f"{prefix}_min")
+            current_max = getattr(row, f"{prefix}_max")
+            setattr(row, f"{prefix}_min", value if current_min is None else min(current_min, value))
+            setattr(row, f"{prefix}_max", value if current_max is None else max(current_max, value))
+
+            sketch = QuantileSketch.from_json(getattr(row, f"{prefix}_sketch"))
+            sketch.add([value])
+            setattr(row, f"{prefix}_sketch", sketch.to_json())
+
+    def rebuild(
+        self,
+        db: Session,
+        inverter_id: int,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None
+    ) -> int:
+        """Recalcular os dias a partir de `start` (ou todo o histórico)
+
+        Com `end`, só até o dia de `end`. Retorna o número de dias gravados.
+        A transação fica a cargo do chamador.
+        """
+        start_day = datetime(start.year, start.month, start.day) if start else None
+        end_day = datetime(end.year, end.month, end.day) + timedelta(days=1) if end else None
+
+        data = load_measurement_columns(
+            db,
+            list(STAT_FIELDS.values()),
+            start_time=start_day,
+            end_time=end_day,
+            inverter_id=inverter_id
+        )
+
+        delete_query = db.query(DailyMeasurementStats)\
+            .filter(DailyMeasurementStats.inverter_id == inverter_id)
+        if start_day is not None:
+            delete_query = delete_query.filter(DailyMeasurementStats.day >= start_day)
+        if end_day is not None:
+            delete_query = delete_query.filter(DailyMeasurementStats.day < end_day)
+        delete_query.delete(synchronize_session=False)
+
+        # Medições ordenadas por tempo: cada dia é uma faixa contígua
+        days, starts = np.unique(data["timestamp"].astype("datetime64[D]"), return_index=True)
+        ends = np.append(starts[1:], data["timestamp"].size)
+
+        now = datetime.utcnow()
+        rows = []
+        for day, first, last in zip(days, starts, ends):
+            row = {
+                "inverter_id": inverter_id,
+                "day": day.astype("datetime64[us]").astype(datetime),
+                "measurement_count": int(last - first),
+                "updated_at": now
+            }
+            for prefix, field in STAT_FIELDS.items():
+                for name, value in _field_values(data[field][first:last]).items():
+                    row[f"{prefix}_{name}"] = value
+            rows.append(row)
+        db.bulk_insert_mappings(DailyMeasurementStats, rows)
+        return len(rows)
+
+    def restore(self, db: Session):
+        """Recalcular a partir do último dia acumulado de cada inversor ao iniciar o serviço"""
+        for (inverter_id,) in db.query(Inverter.id).all():
+            latest = db.query(DailyMeasurementStats.day)\
+                .filter(DailyMeasurementStats.inverter_id == inverter_id)\
+                .order_by(DailyMeasurementStats.day.desc())\
+                .first()
+            days = self.rebuild(db, inverter_id, latest[0] if latest else None)
+            logger.info(f"Estatísticas das medições do inversor {inverter_id} retomadas ({days} dias recalculados)")
+        db.commit()
+
+    def period_statistics(
+        self,
+        db: Session,
+        start: datetime,
+        inverter_id: Optional[int] = None,
+        quantiles: Sequence[float] = ()
+    ) -> Dict[str, Any]:
+        """Estatísticas dos dias a partir do dia de `start` numa única consulta agregada
+
+        Retorna "total_measurements" e, por campo, count/sum/min/max e os
+        quantis pedidos (combinando os sketches diários).
+        """
+        start_day = datetime(start.year, start.month, start.day)
+        columns = [func.sum(DailyMeasurementStats.measurement_count)]
+        for prefix in STAT_FIELDS:
+            columns += [
+                func.sum(getattr(DailyMeasurementStats, f"{prefix}_count")),
+                func.sum(getattr(DailyMeasurementStats, f"{prefix}_sum")),
+                func.min(getattr(DailyMeasurementStats, f"{prefix}_min")),
+                func.max(getattr(DailyMeasurementStats, f"{prefix}_max")),
+            ]
+        query = db.query(*columns).filter(DailyMeasurementStats.day >= start_day)
+        if inverter_id:
+            query = query.filter(DailyMeasurementStats.inverter_id == inverter_id)
+        totals = query.one()
+
+        result: Dict[str, Any] = {"total_measurements": int(totals[0] or 0)}
+        for i, prefix in enumerate(STAT_FIELDS):
+            count, total, minimum, maximum = totals[1 + 4 * i:5 + 4 * i]
+            result[prefix] = {"count": int(count or 0), "sum": total or 0.0, "min": minimum, "max": maximum}
+
+        if quantiles:
+            sketch_columns = [getattr(DailyMeasurementStats, f"{prefix}_sketch") for prefix in STAT_FIELDS]
+            query = db.query(*sketch_columns).filter(DailyMeasurementStats.day >= start_day)
+            if inverter_id:
+                query = query.filter(DailyMeasurementStats.inverter_id == inverter_id)
+            sketches = {prefix: QuantileSketch() for prefix in STAT_FIELDS}
+            for row in query.all():
+                for prefix, data in zip(STAT_FIELDS, row):
+                    sketches[prefix].merge(QuantileSketch.from_json(data))
+            for prefix, sketch in sketches.items():
+                field = result[prefix]
+                # Estimativas limitadas aos extremos exatos
+                field["quantiles"] = {
+                    q: None if sketch.count == 0 else min(max(sketch.quantile(q), field["min"]), field["max"])
+                    for q in quantiles
+                }
+
+        return result
+
+
+# Instância global dos acumuladores
+measurement_stats = MeasurementStatsAccumulator()
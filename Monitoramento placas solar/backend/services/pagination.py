@@ -0,0 +1,60 @@
+"""
+Paginação por chave (keyset) para listagens de medições
+
+A posição é o par (timestamp, id) da última linha da página, codificado num
+cursor opaco. A próxima página é obtida com uma comparação de tupla sobre o
+índice (timestamp, id), com custo de uma busca no índice em qualquer
+profundidade, ao contrário de OFFSET.
+"""
+
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Tuple
+
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Query
+
+PAGE_ORDERS = ("desc", "asc")
+
+
+def encode_cursor(timestamp: datetime, row_id: int) -> str:
+    """Cursor opaco para a posição (timestamp, id)"""
+    payload = json.dumps([timestamp.isoformat(), row_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Posição (timestamp, id) de um cursor; ValueError se inválido"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        timestamp, row_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.fromisoformat(timestamp), int(row_id)
+    except Exception:
+        raise ValueError("Cursor de paginação inválido")
+
+
+def paginate(query: Query, model: Any, limit: int, cursor: Optional[str] = None, order: str = "desc") -> Tuple[List[Any], Optional[str]]:
+    """Obter uma página ordenada por (timestamp, id) e o cursor da próxima
+
+    O cursor é None quando não há mais linhas.
+    """
+    if order not in PAGE_ORDERS:
+        raise ValueError("Ordem de paginação inválida")
+
+    key = tuple_(model.timestamp, model.id)
+    if cursor:
+        position = tuple_(*decode_cursor(cursor))
+        query = query.filter(key < position if order == "desc" else key > position)
+
+    if order == "desc":
+        query = query.order_by(model.timestamp.desc(), model.id.desc())
+    else:
+        query = query.order_by(model.timestamp.asc(), model.id.asc())
+
+    # Uma linha a mais indica se existe próxima página
+    rows = query.limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+    rows = rows[:limit]
+    return rows, encode_cursor(rows[-1].timestamp, rows[-1].id)
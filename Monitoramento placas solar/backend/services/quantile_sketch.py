@@ -0,0 +1,95 @@
+"""
+Sketch de quantis com erro relativo garantido (estilo DDSketch)
+
+Os valores são contados em baldes logarítmicos: o balde i cobre
+(gamma^(i-1), gamma^i], com gamma = (1 + a) / (1 - a). Qualquer quantil é
+estimado com erro relativo de no máximo `a`. Sketches são combinados
+somando as contagens dos baldes, o que permite guardar um por dia e juntar
+qualquer intervalo de dias na consulta.
+"""
+
+import json
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+
+DEFAULT_RELATIVE_ACCURACY = 0.01
+
+
+class QuantileSketch:
+    """Sketch de quantis combinável"""
+
+    def __init__(self, relative_accuracy: float = DEFAULT_RELATIVE_ACCURACY):
+        self.relative_accuracy = relative_accuracy
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = np.log(self.gamma)
+        self.positive: Dict[int, int] = {}
+        self.negative: Dict[int, int] = {}
+        self.zero_count = 0
+
+    @property
+    def count(self) -> int:
+        return self.zero_count + sum(self.positive.values()) + sum(self.negative.values())
+
+    def _add_to(self, store: Dict[int, int], values: np.ndarray):
+        indexes, counts = np.unique(np.ceil(np.log(values) / self._log_gamma).astype(np.int64), return_counts=True)
+        for index, count in zip(indexes.tolist(), counts.tolist()):
+            store[index] = store.get(index, 0) + count
+
+    def add(self, values: Iterable[float]):
+        """Adicionar valores (NaN são ignorados)"""
+        values = np.asarray(values, dtype=np.float64)
+        values = values[~np.isnan(values)]
+        self._add_to(self.positive, values[values > 0])
+        self._add_to(self.negative, -values[values < 0])
+        self.zero_count += int(np.count_nonzero(values == 0))
+
+    def merge(self, other: "QuantileSketch"):
+        """Somar as contagens de outro sketch (mesma precisão)"""
+        for store, other_store in ((self.positive, other.positive), (self.negative, other.negative)):
+            for index, count in other_store.items():
+                store[index] = store.get(index, 0) + count
+        self.zero_count += other.zero_count
+
+    def _bucket_value(self, index: int) -> float:
+        return 2 * self.gamma ** index / (self.gamma + 1)
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimativa do quantil q (0 a 1); None se vazio"""
+        total = self.count
+        if total == 0:
+            return None
+        rank = q * (total - 1)
+
+        seen = 0
+        for index in sorted(self.negative, reverse=True):
+            seen += self.negative[index]
+            if seen > rank:
+                return -self._bucket_value(index)
+        seen += self.zero_count
+        if seen > rank:
+            return 0.0
+        for index in sorted(self.positive):
+            seen += self.positive[index]
+            if seen > rank:
+                return self._bucket_value(index)
+        return self._bucket_value(max(self.positive))
+
+    def to_json(self) -> str:
+        return json.dumps({
+            "a": self.relative_accuracy,
+            "p": self.positive,
+            "n": self.negative,
+            "z": self.zero_count
+        }, separators=(",", ":"))
+
+    @classmethod
+    def from_json(cls, data: Optional[str]) -> "QuantileSketch":
+        if not data:
+            return cls()
+        payload = json.loads(data)
+        sketch = cls(payload.get("a", DEFAULT_RELATIVE_ACCURACY))
+        sketch.positive = {int(k): v for k, v in payload["p"].items()}
+        sketch.negative = {int(k): v for k, v in payload["n"].items()}
+        sketch.zero_count = payload["z"]
+        return sketch
@@ -0,0 +1,90 @@
+"""
+Agendador de tarefas diárias (pré-cálculo das análises, limpezas)
+
+Executa a tarefa ao iniciar o serviço e depois uma vez por dia, na hora
+local configurada (fora do horário de pico, após o fechamento do dia). O
+pré-cálculo faz as visões padrão do painel encontrarem o cache aquecido.
+A tarefa é síncrona (consultas ORM) e roda numa thread do pool, sem
+bloquear o loop de eventos.
+"""
+
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Callable, Optional
+
+from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+
+from ..database import SessionLocal
+
+logger = logging.getLogger(__name__)
+
+
+class ReportScheduler:
+    """Executa `job(db)` diariamente numa hora local fixa"""
+
+    def __init__(self, job: Callable[[Session], int], hour: int, utc_offset: int, name: str = "Pré-cálculo das análises"):
+        self.job = job
+        self.name = name
+        self.hour = hour
+        self.utc_offset = timedelta(hours=utc_offset)
+        self.running = False
+        self.last_run: Optional[datetime] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def next_run(self, now: Optional[datetime] = None) -> datetime:
+        """Próxima execução (UTC)"""
+        now = now or datetime.utcnow()
+        local_now = now + self.utc_offset
+        local_run = local_now.replace(hour=self.hour, minute=0, second=0, microsecond=0)
+        if local_run <= local_now:
+            local_run += timedelta(days=1)
+        return local_run - self.utc_offset
+
+    async def start(self):
+        """Iniciar o agendador em background"""
+        if self.running:
+            return
+        self.running = True
+        self._task = asyncio.create_task(self._loop())
+
+    async def stop(self):
+        """Parar o agendador"""
+        self.running = False
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def run_once(self) -> int:
+        """Executar a tarefa agora"""
+        try:
+            started = datetime.utcnow()
+            count = await run_in_threadpool(self._run_job)
+            self.last_run = datetime.utcnow()
+            elapsed = (self.last_run - started).total_seconds()
+            logger.info(f"{self.name}: {count} itens em {elapsed:.1f}s")
+            return count
+        except Exception as e:
+            logger.error(f"Erro na tarefa diária ({self.name}): {e}")
+            return 0
+
+    def _run_job(self) -> int:
+        db = SessionLocal()
+        try:
+            return self.job(db)
+        finally:
+            db.close()
+
+    async def _loop(self):
+        # Executar logo após iniciar (ex.: aquecer o cache)
+        await self.run_once()
+        while self.running:
+            delay = (self.next_run() - datetime.utcnow()).total_seconds()
+            await asyncio.sleep(max(delay, 1))
+            if self.running:
+                await self.run_once()
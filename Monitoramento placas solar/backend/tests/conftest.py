@@ -0,0 +1,44 @@
+"""
+Configuração dos testes do backend
+
+Os testes usam um banco SQLite em memória, recriado a cada teste; execute
+com `python -m pytest backend/tests` a partir da raiz do projeto.
+"""
+
+import os
+
+os.environ["DATABASE_URL"] = "sqlite://"
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.config import ALARM_CONFIG
+from backend.database import SessionLocal, engine
+from backend.models import Base
+from backend.routers import alerts_router, data_router
+from backend.services import bulk_ingest
+from backend.services.alert_index import alert_index
+from backend.services.alert_rules import AlertEngine, compile_rules
+
+
+@pytest.fixture
+def db(monkeypatch):
+    """Sessão num banco vazio, com índice e motor de alertas zerados"""
+    Base.metadata.drop_all(bind=engine)
+    Base.metadata.create_all(bind=engine)
+    session = SessionLocal()
+    alert_index.restore(session)
+    monkeypatch.setattr(bulk_ingest, "alert_engine", AlertEngine(compile_rules(ALARM_CONFIG)))
+    try:
+        yield session
+    finally:
+        session.close()
+
+
+@pytest.fixture
+def client(db):
+    app = FastAPI()
+    app.include_router(data_router.router, prefix="/api/v1/data")
+    app.include_router(alerts_router.router, prefix="/api/v1/alerts")
+    return TestClient(app)
@@ -0,0 +1,39 @@
+"""
+Agregação por intervalos sobre os resumos
+"""
+
+from datetime import datetime, timedelta
+
+from backend.models import HourlyEnergySummary, Inverter
+from backend.services.aggregation import aggregate_measurements
+
+START = datetime(2024, 3, 1)
+
+
+def _hour(offset, sample_count, power_sum):
+    return HourlyEnergySummary(
+        inverter_id=1,
+        hour=START + timedelta(hours=offset),
+        energy_wh=10.0,
+        producing_seconds=60.0,
+        covered_seconds=60.0,
+        gap_count=0,
+        gap_seconds=0.0,
+        sample_count=sample_count,
+        power_sum=power_sum,
+        power_min=None if not sample_count else power_sum / sample_count,
+        power_max=None if not sample_count else power_sum / sample_count
+    )
+
+
+def test_hourly_tier_returns_only_populated_buckets(db):
+    db.add(Inverter(id=1, serial_number="SN-1"))
+    db.add_all([_hour(0, 2, 200.0), _hour(1, 0, 0.0), _hour(2, 1, 50.0)])
+    db.commit()
+
+    (series,) = aggregate_measurements(
+        db, 3600, ["power_output"], ["mean", "count"], START, START + timedelta(hours=3)
+    )
+    assert series["source"] == "hourly"
+    assert series["timestamps"] == [START, START + timedelta(hours=2)]
+    assert series["values"]["power_output"] == {"mean": [100.0, 50.0], "count": [2, 1]}
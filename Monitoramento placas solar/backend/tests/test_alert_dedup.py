@@ -0,0 +1,75 @@
+"""
+Deduplicação de alertas na ingestão em lote
+"""
+
+import json
+from collections import Counter
+from datetime import datetime, timedelta
+
+from backend.models import Alert
+from backend.services.alert_index import alert_index, alert_key
+
+
+def _post(client, samples):
+    body = "\n".join(json.dumps(sample) for sample in samples)
+    response = client.post(
+        "/api/v1/data/ingest",
+        content=body,
+        headers={"Content-Type": "application/x-ndjson"}
+    )
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def _solar_day(days, fault_code=0):
+    """Amostras de 5 em 5 minutos com produção baixa de dia e zero à noite"""
+    start = (datetime.utcnow() - timedelta(days=days)).replace(hour=0, minute=0, second=0, microsecond=0)
+    samples = []
+    for step in range(days * 24 * 12):
+        timestamp = start + timedelta(minutes=5 * step)
+        daylight = 9 <= timestamp.hour < 21
+        samples.append({
+            "device": "SN-1",
+            "timestamp": timestamp.isoformat() + "Z",
+            "power_output": 150.0 if daylight else 0.0,
+            "temperature": 30.0,
+            "status_code": 1,
+            "fault_code": fault_code
+        })
+    return samples
+
+
+def _open_alerts(db):
+    rows = db.query(Alert.inverter_id, Alert.alert_type, Alert.value).filter(Alert.resolved == False).all()
+    return Counter(alert_key(row.alert_type, row.inverter_id, value=row.value) for row in rows)
+
+
+def test_batch_creates_one_open_alert_per_key(client, db):
+    result = _post(client, _solar_day(10))
+    assert result["inserted"] == 10 * 24 * 12
+
+    open_alerts = _open_alerts(db)
+    assert open_alerts[alert_key("low_production", 1)] == 1
+    assert all(count == 1 for count in open_alerts.values())
+    assert alert_index.is_active(alert_key("low_production", 1))
+
+
+def test_repeated_batch_does_not_duplicate_alerts(client, db):
+    samples = _solar_day(2, fault_code=7)
+    _post(client, samples)
+    result = _post(client, samples)
+
+    assert result["inserted"] == 0
+    open_alerts = _open_alerts(db)
+    assert open_alerts[alert_key("fault_detected", 1, value=7)] == 1
+    assert all(count == 1 for count in open_alerts.values())
+
+
+def test_rollback_releases_reserved_keys(db):
+    key = alert_key("low_production", 42)
+    alert_index.reserve(db, key)
+    assert alert_index.is_active(key, db)
+
+    db.rollback()
+    assert not alert_index.is_active(key, db)
+    assert not alert_index.is_active(key)
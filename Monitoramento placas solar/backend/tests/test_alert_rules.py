@@ -0,0 +1,70 @@
+"""
+Motor de regras de alerta
+"""
+
+from datetime import datetime, timedelta
+
+from backend.config import ALARM_CONFIG
+from backend.services.alert_rules import AlertEngine, compile_rules
+
+START = datetime(2024, 1, 10)
+
+
+def _run(engine, db, samples, commit=True):
+    """Avaliar (minuto, amostra) do inversor 1; retorna os tipos criados"""
+    created = []
+    for minute, sample in samples:
+        alerts = engine.evaluate(db, 1, START + timedelta(minutes=minute), sample)
+        created += [(alert.alert_type, alert.value) for alert in alerts]
+    if commit:
+        db.commit()
+    return created
+
+
+def test_rule_check_treats_idle_readings_as_no_evidence():
+    rules = {rule.alert_type: rule for rule in compile_rules(ALARM_CONFIG)}
+    assert rules["low_production"].check(100.0) is True
+    assert rules["low_production"].check(1000.0) is False
+    assert rules["low_production"].check(0.0) is None
+    assert rules["low_production"].check(None) is None
+    assert rules["low_production"].check(float("nan")) is None
+    # Código de falha zero é leitura normal e encerra a condição
+    assert rules["fault_detected"].check(0) is False
+
+
+def test_night_does_not_restart_low_production(db):
+    engine = AlertEngine(compile_rules(ALARM_CONFIG))
+    day = [(0, {"power_output": 100.0}), (60, {"power_output": 120.0})]
+    night = [(600, {"power_output": 0.0}), (900, {"power_output": None})]
+    dawn = [(1440, {"power_output": 90.0})]
+
+    assert _run(engine, db, day) == [("low_production", 100.0)]
+    assert _run(engine, db, night + dawn) == []
+
+
+def test_condition_clears_and_fires_again(db):
+    engine = AlertEngine(compile_rules(ALARM_CONFIG))
+    created = _run(engine, db, [
+        (0, {"fault_code": 3}),
+        (5, {"fault_code": 3}),
+        (10, {"fault_code": 4}),
+        (15, {"fault_code": 0}),
+    ])
+    assert created == [("fault_detected", 3.0), ("fault_detected", 4.0)]
+    # Alertas 3 e 4 continuam ativos (não resolvidos): não há duplicata
+    assert _run(engine, db, [(20, {"fault_code": 3})]) == []
+
+
+def test_rollback_discards_engine_state(db):
+    engine = AlertEngine(compile_rules(ALARM_CONFIG))
+    assert _run(engine, db, [(0, {"temperature": 80.0})], commit=False) == [("high_temperature", 80.0)]
+    db.rollback()
+
+    # Nada foi gravado: a mesma medição volta a gerar o alerta
+    assert _run(engine, db, [(0, {"temperature": 80.0})]) == [("high_temperature", 80.0)]
+
+
+def test_older_samples_are_ignored(db):
+    engine = AlertEngine(compile_rules(ALARM_CONFIG))
+    _run(engine, db, [(60, {"temperature": 30.0})])
+    assert _run(engine, db, [(0, {"temperature": 90.0})]) == []
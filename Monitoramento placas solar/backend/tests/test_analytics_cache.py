@@ -0,0 +1,49 @@
+"""
+Testes do cache de agregados diários
+"""
+
+from datetime import datetime, timedelta
+from unittest import mock
+
+from backend.services import analytics_cache as module
+from backend.services.analytics_cache import AnalyticsCache
+
+
+def _compute_days(calls):
+    def compute(start, end):
+        calls.append((start, end))
+        rows, day = [], datetime(start.year, start.month, start.day)
+        while day < end:
+            rows.append({"date": day.date().isoformat()})
+            day += timedelta(days=1)
+        return rows
+    return compute
+
+
+def test_day_ending_within_max_gap_is_not_cached():
+    """O dia anterior só vai para o cache depois da lacuna máxima de integração"""
+    cache = AnalyticsCache(max_entries=100, max_bytes=1 << 20, ttl=60)
+    start = datetime(2024, 5, 1, 12)
+    midnight = datetime(2024, 5, 4)
+
+    class Clock(datetime):
+        now = midnight + timedelta(seconds=60)
+
+        @classmethod
+        def utcnow(cls):
+            return cls.now
+
+    calls = []
+    compute = _compute_days(calls)
+    with mock.patch.object(module, "datetime", Clock):
+        cache.get_daily_rows("energy", 1, start, Clock.now, compute)
+        assert cache.get(("day", "energy", 1, "2024-05-02")) is not None
+        assert cache.get(("day", "energy", 1, "2024-05-03")) is None
+
+        Clock.now = midnight + timedelta(seconds=module.settings.ENERGY_MAX_GAP_SECONDS)
+        rows = cache.get_daily_rows("energy", 1, start, Clock.now, compute)
+        assert cache.get(("day", "energy", 1, "2024-05-03")) is not None
+
+    assert [row["date"] for row in rows] == ["2024-05-01", "2024-05-02", "2024-05-03", "2024-05-04"]
+    # Segunda leitura: 02 veio do cache, 03 em diante foi recalculado
+    assert calls[-1][0] == datetime(2024, 5, 3)
@@ -0,0 +1,78 @@
+"""
+Ingestão em lote: validação e idempotência
+"""
+
+import json
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pytest
+
+from backend.models import InverterMeasurement
+from backend.services import bulk_ingest
+from backend.services.bulk_ingest import UNIQUE_INDEX, ingest_batch, validate_batch
+
+START = datetime(2024, 3, 1, 12, 0)
+
+
+def _samples(minutes, device="SN-1"):
+    frame = pd.DataFrame([
+        {
+            "device": device,
+            "timestamp": (START + timedelta(minutes=minute)).isoformat() + "Z",
+            "power_output": 1000.0 + minute,
+            "status_code": 1
+        }
+        for minute in minutes
+    ])
+    samples, rejected, errors = validate_batch(frame)
+    assert rejected == 0, errors
+    return samples
+
+
+def test_validate_batch_rejects_bad_rows():
+    frame = pd.DataFrame([
+        {"device": "SN-1", "timestamp": "2024-03-01T12:00:00Z", "power_output": 10},
+        {"device": "", "timestamp": "2024-03-01T12:05:00Z", "power_output": 10},
+        {"device": "SN-1", "timestamp": "ontem", "power_output": 10},
+        {"device": "SN-1", "timestamp": 1709294700, "power_output": "x"},
+        {"device": "SN-1", "timestamp": 1709294700, "status": 1.5},
+        {"device": "SN-1", "timestamp": "2024-03-01T12:00:00Z", "power_output": 20},
+    ])
+    samples, rejected, errors = validate_batch(frame)
+
+    assert rejected == 4
+    assert [error["line"] for error in errors] == [2, 3, 4, 5]
+    # Duplicata no próprio lote: vale a última
+    assert len(samples) == 1
+    assert samples["power_output"].iloc[0] == 20
+
+
+@pytest.mark.parametrize("precheck", [False, True])
+def test_ingest_is_idempotent(db, monkeypatch, precheck):
+    if precheck:
+        # Banco em que o índice único não pôde ser criado
+        monkeypatch.setattr(bulk_ingest, "missing_indexes", {UNIQUE_INDEX})
+
+    assert ingest_batch(db, _samples(range(0, 60, 5))) == {"inserted": 12, "duplicates": 0}
+    assert ingest_batch(db, _samples(range(0, 60, 5))) == {"inserted": 0, "duplicates": 12}
+    # Lote sobreposto: só as amostras novas são gravadas
+    assert ingest_batch(db, _samples(range(30, 90, 5))) == {"inserted": 6, "duplicates": 6}
+
+    stored = db.query(InverterMeasurement.timestamp).order_by(InverterMeasurement.timestamp).all()
+    assert [row.timestamp for row in stored] == [START + timedelta(minutes=m) for m in range(0, 90, 5)]
+
+
+def test_ingest_endpoint_counts(client):
+    body = "\n".join(
+        json.dumps({"device": "SN-1", "timestamp": (START + timedelta(minutes=m)).isoformat() + "Z", "power_output": 5})
+        for m in (0, 5, 5)
+    ) + "\n" + json.dumps({"device": "SN-1", "timestamp": "x"})
+    for expected_inserted in (2, 0):
+        response = client.post("/api/v1/data/ingest", content=body, headers={"Content-Type": "application/x-ndjson"})
+        assert response.status_code == 200, response.text
+        result = response.json()
+        assert result["received"] == 4
+        assert result["rejected"] == 1
+        assert result["inserted"] == expected_inserted
+        assert result["inserted"] + result["duplicates"] == 3
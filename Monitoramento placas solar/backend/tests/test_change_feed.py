@@ -0,0 +1,54 @@
+"""
+Registro de alterações: atraso de entrega, retenção e token expirado
+"""
+
+from datetime import datetime, timedelta
+
+from backend.config import settings
+from backend.models import ChangeLog, Inverter, InverterMeasurement
+from backend.services.change_feed import decode_token, prune_changes
+
+START = datetime(2024, 3, 1, 12)
+
+
+def _add_measurements(db, minutes):
+    for minute in minutes:
+        db.add(InverterMeasurement(inverter_id=1, timestamp=START + timedelta(minutes=minute), power_output=100.0))
+    db.commit()
+
+
+def _age(db, seconds):
+    """Recuar a data de gravação de todas as linhas do registro"""
+    for row in db.query(ChangeLog):
+        row.created_at -= timedelta(seconds=seconds)
+    db.commit()
+
+
+def test_changes_are_delivered_after_settle_delay(db, client):
+    db.add(Inverter(id=1, serial_number="SN-1"))
+    _add_measurements(db, [0, 1])
+
+    feed = client.get("/api/v1/data/changes", params={"entities": "measurement"}).json()
+    assert feed["changes"] == []
+    assert decode_token(feed["next_token"]) == 0
+
+    _age(db, settings.CHANGE_FEED_SETTLE_SECONDS)
+    feed = client.get("/api/v1/data/changes", params={"entities": "measurement"}).json()
+    assert [change["operation"] for change in feed["changes"]] == ["insert", "insert"]
+
+
+def test_expired_token_requires_resync(db, client):
+    db.add(Inverter(id=1, serial_number="SN-1"))
+    _add_measurements(db, [0, 1])
+    _age(db, 86400 * (settings.CHANGE_FEED_RETENTION_DAYS + 1))
+    _add_measurements(db, [2])
+    _age(db, settings.CHANGE_FEED_SETTLE_SECONDS)
+
+    old_token = client.get("/api/v1/data/changes", params={"limit": 1}).json()["next_token"]
+    assert prune_changes(db) > 0
+
+    response = client.get("/api/v1/data/changes", params={"since": old_token})
+    assert response.status_code == 410
+    resume = response.json()["detail"]["next_token"]
+    assert client.get("/api/v1/data/changes", params={"since": resume}).status_code == 200
+    assert db.query(InverterMeasurement).count() == 3
@@ -0,0 +1,48 @@
+"""
+Compressão de respostas: validadores ETag
+"""
+
+from fastapi import FastAPI, Request, Response
+from fastapi.testclient import TestClient
+
+from backend.services.compression import CompressionMiddleware
+from backend.services.data_versions import is_not_modified
+
+ETAG = '"abc"'
+
+
+def _client(body: str) -> TestClient:
+    app = FastAPI()
+    app.add_middleware(CompressionMiddleware, minimum_size=100)
+
+    @app.get("/x")
+    def resource(request: Request):
+        headers = {"ETag": ETAG}
+        if is_not_modified(headers, request.headers.get("if-none-match")):
+            return Response(status_code=304, headers=headers)
+        return Response(body, headers=headers)
+
+    return TestClient(app)
+
+
+def test_compressed_body_gets_weak_etag_and_304_keeps_it():
+    client = _client("y" * 5000)
+    full = client.get("/x", headers={"Accept-Encoding": "gzip"})
+    assert full.headers["content-encoding"] == "gzip"
+    assert full.headers["etag"] == f"W/{ETAG}"
+
+    again = client.get("/x", headers={"Accept-Encoding": "gzip", "If-None-Match": full.headers["etag"]})
+    assert again.status_code == 304
+    assert again.headers["etag"] == f"W/{ETAG}"
+
+
+def test_uncompressed_body_keeps_strong_etag_on_304():
+    """Corpo pequeno demais para comprimir: o 304 não pode enfraquecer o ETag"""
+    client = _client("curto")
+    full = client.get("/x", headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in full.headers
+    assert full.headers["etag"] == ETAG
+
+    again = client.get("/x", headers={"Accept-Encoding": "gzip", "If-None-Match": full.headers["etag"]})
+    assert again.status_code == 304
+    assert again.headers["etag"] == ETAG
@@ -0,0 +1,24 @@
+"""
+Exportação de medições: colunas
+"""
+
+from datetime import datetime
+
+from backend.models import Inverter, InverterMeasurement
+from backend.schemas.inverter_schemas import InverterMeasurementResponse
+from backend.services.data_export import EXPORT_COLUMNS, export_measurements
+
+
+def test_export_columns_match_measurement_fields():
+    """A exportação aceita os mesmos campos que /measurements?fields="""
+    assert EXPORT_COLUMNS == list(InverterMeasurementResponse.model_fields)
+    assert "uptime" in EXPORT_COLUMNS
+
+
+def test_csv_export_includes_uptime(db):
+    db.add(Inverter(id=1, serial_number="SN-1"))
+    db.add(InverterMeasurement(inverter_id=1, timestamp=datetime(2024, 3, 1, 12), power_output=10.0, uptime=1234))
+    db.commit()
+
+    content = b"".join(export_measurements("csv", fields="timestamp,uptime")).decode("utf-8")
+    assert content.splitlines() == ["timestamp,uptime", "2024-03-01T12:00:00,1234"]
@@ -0,0 +1,66 @@
+"""
+Seleção de pontos para gráficos (LTTB e mínimo/máximo)
+"""
+
+import numpy as np
+import pytest
+
+from backend.services.downsampling import _bucket_ids, downsample, lttb_indices, minmax_indices
+
+
+def _lttb_reference(x, y, threshold):
+    """LTTB ponto a ponto, com o vértice A na média do balde anterior"""
+    n = x.size
+    bucket = _bucket_ids(n - 2, threshold - 2) + 1
+    groups = [np.flatnonzero(bucket == b) + 1 for b in range(1, threshold - 1)]
+    chosen = [0]
+    for i, members in enumerate(groups):
+        previous = groups[i - 1] if i > 0 else np.array([0])
+        following = groups[i + 1] if i + 1 < len(groups) else np.array([n - 1])
+        ax, ay = x[previous].mean(), y[previous].mean()
+        cx, cy = x[following].mean(), y[following].mean()
+        area = np.abs((ax - cx) * (y[members] - ay) - (ax - x[members]) * (cy - ay))
+        chosen.append(members[np.argmax(area)])
+    return np.array(chosen + [n - 1])
+
+
+def test_lttb_matches_reference():
+    rng = np.random.default_rng(5)
+    x = np.cumsum(rng.uniform(1, 60, size=1000))
+    y = np.sin(x / 3000) * 1000 + rng.normal(0, 50, size=x.size)
+    for threshold in (3, 10, 97, 500):
+        indices = lttb_indices(x, y, threshold)
+        assert indices.size == threshold
+        assert np.array_equal(indices, _lttb_reference(x, y, threshold))
+
+
+def test_lttb_keeps_endpoints_and_spike():
+    y = np.zeros(500)
+    y[123] = 5000.0
+    indices = lttb_indices(np.arange(500.0), y, 20)
+    assert indices[0] == 0 and indices[-1] == 499
+    assert 123 in indices
+    assert np.all(np.diff(indices) > 0)
+
+
+def test_minmax_keeps_extremes_of_each_bucket():
+    rng = np.random.default_rng(6)
+    y = rng.normal(0, 1, size=1001)
+    threshold = 40
+    indices = minmax_indices(y, threshold)
+
+    assert indices.size <= threshold
+    assert np.all(np.diff(indices) > 0)
+    bucket = _bucket_ids(y.size, threshold // 2)
+    for b in range(threshold // 2):
+        members = np.flatnonzero(bucket == b)
+        assert members[np.argmin(y[members])] in indices
+        assert members[np.argmax(y[members])] in indices
+
+
+def test_small_series_and_unknown_method():
+    x, y = np.arange(5.0), np.arange(5.0)
+    assert np.array_equal(downsample(x, y, 10), np.arange(5))
+    assert np.array_equal(downsample(x, y, 10, method="minmax"), np.arange(5))
+    with pytest.raises(ValueError):
+        downsample(x, y, 3, method="media")
@@ -0,0 +1,63 @@
+"""
+Combinação dos estados diários de eficiência (fórmulas de Chan)
+"""
+
+import numpy as np
+
+from backend.services.efficiency_stats import STATE_FIELDS, day_statistics, merge_states
+
+
+def _measurements(rng, days=4, per_day=200):
+    start = np.datetime64("2024-06-01T00:00:00", "us")
+    times = start + np.sort(rng.integers(0, days * 86400, size=days * per_day)) * np.timedelta64(1, "s")
+    efficiency = rng.normal(96.0, 1.5, size=times.size)
+    temperature = rng.normal(40.0, 12.0, size=times.size)
+    efficiency[rng.random(times.size) < 0.05] = np.nan
+    temperature[rng.random(times.size) < 0.2] = np.nan
+    return times, efficiency, temperature
+
+
+def test_merged_days_match_direct_statistics():
+    """Combinar os dias dá o mesmo que calcular sobre todas as medições"""
+    rng = np.random.default_rng(3)
+    times, efficiency, temperature = _measurements(rng)
+    daily = day_statistics(times, efficiency, temperature)
+    assert daily["days"].size == 4
+
+    merged = merge_states(daily, np.zeros(daily["days"].size, dtype=np.int64), 1)
+
+    eff = efficiency[~np.isnan(efficiency)]
+    assert merged["efficiency_count"][0] == eff.size
+    assert np.isclose(merged["efficiency_mean"][0], eff.mean())
+    assert np.isclose(merged["efficiency_m2"][0], ((eff - eff.mean()) ** 2).sum())
+    assert merged["efficiency_min"][0] == eff.min()
+    assert merged["efficiency_max"][0] == eff.max()
+
+    paired = ~np.isnan(efficiency) & ~np.isnan(temperature)
+    temp, pair_eff = temperature[paired], efficiency[paired]
+    assert merged["pair_count"][0] == paired.sum()
+    assert np.isclose(merged["temperature_m2"][0], ((temp - temp.mean()) ** 2).sum())
+    assert np.isclose(merged["pair_efficiency_m2"][0], ((pair_eff - pair_eff.mean()) ** 2).sum())
+    assert np.isclose(merged["comoment"][0], ((temp - temp.mean()) * (pair_eff - pair_eff.mean())).sum())
+    assert merged["bin_count"].sum() == paired.sum()
+    assert np.isclose(merged["bin_efficiency_sum"].sum(), pair_eff.sum())
+
+
+def test_merge_into_groups_and_empty_states():
+    """Estados vazios não alteram o grupo; cada grupo combina só os seus"""
+    rng = np.random.default_rng(4)
+    times, efficiency, temperature = _measurements(rng, days=2)
+    daily = day_statistics(times, efficiency, temperature)
+    empty = {
+        name: np.zeros((1,) + daily[name].shape[1:]) if name not in ("efficiency_min", "efficiency_max") else np.full(1, np.nan)
+        for name in STATE_FIELDS + ["bin_count", "bin_efficiency_sum"]
+    }
+    state = {
+        name: np.concatenate([daily[name], empty[name]])
+        for name in STATE_FIELDS + ["bin_count", "bin_efficiency_sum"]
+    }
+
+    merged = merge_states(state, np.array([0, 1, 0]), 2)
+    for name in STATE_FIELDS:
+        assert np.isclose(merged[name][0], daily[name][0], equal_nan=True), name
+        assert np.isclose(merged[name][1], daily[name][1], equal_nan=True), name
@@ -0,0 +1,41 @@
+"""
+Testes das inscrições ao vivo
+"""
+
+import asyncio
+
+from backend.services.live_broker import LiveBroker
+
+
+def test_unsubscribe_from_all_excludes_only_removed():
+    """Inscrito em todos, remover um inversor mantém os demais, inclusive novos"""
+    async def scenario():
+        broker = LiveBroker()
+        subscription = broker.subscribe(None)
+        subscription.unsubscribe({2})
+        for inverter_id in (1, 2, 3):
+            broker._dispatch(inverter_id, f"m{inverter_id}")
+        received = await subscription.next(timeout=1)
+        subscription.subscribe({2})
+        broker._dispatch(2, "m2")
+        return received, await subscription.next(timeout=1)
+
+    received, after = asyncio.run(scenario())
+    assert sorted(received) == ["m1", "m3"]
+    assert after == ["m2"]
+
+
+def test_websocket_rejects_non_json_frame():
+    """Quadro que não é JSON recebe erro e a conexão continua"""
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+
+    from backend.routers import live_router
+
+    app = FastAPI()
+    app.include_router(live_router.router, prefix="/api/v1")
+    with TestClient(app).websocket_connect("/api/v1/live?inverters=999") as websocket:
+        websocket.send_text("não é json")
+        assert websocket.receive_json()["type"] == "error"
+        websocket.send_json({"unsubscribe": ["x"]})
+        assert websocket.receive_json()["type"] == "error"
@@ -0,0 +1,24 @@
+"""
+Carregamento colunar de medições
+"""
+
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from backend.models import Inverter, InverterMeasurement
+from backend.services.measurement_loader import load_measurement_columns
+
+
+def test_null_inverter_id_loads_as_nan(db):
+    db.add(Inverter(id=1, serial_number="SN-1"))
+    start = datetime(2024, 3, 1, 12)
+    db.add(InverterMeasurement(inverter_id=1, timestamp=start, power_output=10.0))
+    db.add(InverterMeasurement(inverter_id=None, timestamp=start + timedelta(minutes=1), power_output=None))
+    db.commit()
+
+    data = load_measurement_columns(db, ["id", "inverter_id", "power_output"], chunk_size=1)
+    assert data["id"].dtype == np.int64
+    assert data["inverter_id"][0] == 1
+    assert np.isnan(data["inverter_id"][1])
+    assert np.isnan(data["power_output"][1])
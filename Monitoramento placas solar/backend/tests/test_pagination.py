@@ -0,0 +1,48 @@
+"""
+Paginação por chave: cursor e percurso completo
+"""
+
+from datetime import datetime, timedelta
+
+import pytest
+
+from backend.models import Inverter, InverterMeasurement
+from backend.services.pagination import decode_cursor, encode_cursor, paginate
+
+
+def test_cursor_round_trip():
+    timestamp = datetime(2024, 2, 29, 23, 59, 59, 123456)
+    cursor = encode_cursor(timestamp, 42)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (timestamp, 42)
+    for invalid in ("", "xyz", encode_cursor(timestamp, 42)[:-3]):
+        with pytest.raises(ValueError):
+            decode_cursor(invalid)
+
+
+@pytest.mark.parametrize("order", ["desc", "asc"])
+def test_pages_cover_all_rows_once(db, order):
+    """Linhas com o mesmo timestamp são desempatadas pelo id"""
+    for inverter_id in (1, 2, 3):
+        db.add(Inverter(id=inverter_id, serial_number=f"SN-{inverter_id}"))
+    start = datetime(2024, 3, 1, 12)
+    for i in range(23):
+        db.add(InverterMeasurement(
+            inverter_id=3 - i % 3,
+            timestamp=start + timedelta(minutes=i // 3),
+            power_output=float(i)
+        ))
+    db.commit()
+
+    query = db.query(InverterMeasurement)
+    seen, cursor = [], None
+    while True:
+        rows, cursor = paginate(query, InverterMeasurement, limit=5, cursor=cursor, order=order)
+        seen += [(row.timestamp, row.id) for row in rows]
+        if cursor is None:
+            break
+
+    assert len(seen) == 23
+    assert seen == sorted(seen, reverse=(order == "desc"))
+    with pytest.raises(ValueError):
+        paginate(query, InverterMeasurement, limit=5, order="aleatoria")
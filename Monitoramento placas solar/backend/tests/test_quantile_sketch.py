@@ -0,0 +1,53 @@
+"""
+Sketch de quantis: precisão relativa, combinação e serialização
+"""
+
+import numpy as np
+
+from backend.services.quantile_sketch import QuantileSketch
+
+QUANTILES = (0.0, 0.01, 0.1, 0.25, 0.5, 0.75, 0.9, 0.99, 1.0)
+
+
+def _exact(values, q):
+    # Mesmo critério de posição do sketch: elemento floor(q * (n - 1))
+    ordered = np.sort(values)
+    return ordered[int(q * (ordered.size - 1))]
+
+
+def test_quantiles_within_relative_accuracy():
+    rng = np.random.default_rng(1)
+    values = np.concatenate([
+        rng.lognormal(mean=6, sigma=1.5, size=5000),
+        -rng.lognormal(mean=2, sigma=1, size=1000),
+        np.zeros(200)
+    ])
+    sketch = QuantileSketch(relative_accuracy=0.01)
+    sketch.add(np.concatenate([values, [np.nan]]))
+
+    assert sketch.count == values.size
+    for q in QUANTILES:
+        exact = _exact(values, q)
+        assert abs(sketch.quantile(q) - exact) <= 0.01 * abs(exact), q
+
+
+def test_merge_equals_sketch_of_all_values():
+    rng = np.random.default_rng(2)
+    days = [rng.gamma(2.0, 500.0, size=n) for n in (300, 1, 2000)]
+    merged = QuantileSketch()
+    for values in days:
+        day = QuantileSketch()
+        day.add(values)
+        merged.merge(QuantileSketch.from_json(day.to_json()))
+
+    whole = QuantileSketch()
+    whole.add(np.concatenate(days))
+    assert merged.positive == whole.positive
+    assert merged.count == whole.count
+    for q in QUANTILES:
+        assert merged.quantile(q) == whole.quantile(q)
+
+
+def test_empty_sketch():
+    assert QuantileSketch().quantile(0.5) is None
+    assert QuantileSketch.from_json(None).count == 0
@@ -0,0 +1,116 @@
+"""
+Recalculo parcial dos resumos na ingestão em lote
+"""
+
+import math
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pytest
+
+from backend.models import DailyEfficiencyStats, DailyMeasurementStats, HourlyEnergySummary
+from backend.services.bulk_ingest import ingest_batch, validate_batch
+from backend.services.efficiency_stats import efficiency_accumulator
+from backend.services.energy_accumulator import energy_accumulator
+from backend.services.measurement_stats import measurement_stats
+
+START = datetime(2024, 5, 1)
+
+
+def _batch(minutes):
+    frame = pd.DataFrame([
+        {
+            "device": "SN-1",
+            "timestamp": (START + timedelta(minutes=minute)).isoformat() + "Z",
+            "power_output": max(0.0, 2000.0 * math.sin(math.pi * ((minute / 60) % 24 - 6) / 12)),
+            "temperature": 25.0 + (minute % 97) / 10,
+            "efficiency": 90.0 + (minute % 13) / 10
+        }
+        for minute in minutes
+    ])
+    samples, rejected, _ = validate_batch(frame)
+    assert rejected == 0
+    return samples
+
+
+def _snapshot(db):
+    hourly = db.query(HourlyEnergySummary).order_by(HourlyEnergySummary.hour).all()
+    efficiency = db.query(DailyEfficiencyStats).order_by(DailyEfficiencyStats.day).all()
+    stats = db.query(DailyMeasurementStats).order_by(DailyMeasurementStats.day).all()
+    return (
+        [(r.hour, r.energy_wh, r.producing_seconds, r.covered_seconds, r.gap_count, r.gap_seconds,
+          r.sample_count, r.power_sum, r.power_min, r.power_max) for r in hourly],
+        [(r.day, r.efficiency_count, r.efficiency_mean, r.efficiency_m2) for r in efficiency],
+        [(r.day, r.measurement_count, r.power_count, r.power_sum, r.temperature_max) for r in stats],
+    )
+
+
+def test_partial_rebuild_matches_full_rebuild(db):
+    # Backlog fora de ordem: dias 1 e 3, depois o dia 2 (com uma lacuna)
+    day = [minute for minute in range(2, 1440, 5)]
+    ingest_batch(db, _batch(day))
+    ingest_batch(db, _batch([minute + 2880 for minute in day]))
+    ingest_batch(db, _batch([minute + 1440 for minute in day if not 600 < minute < 700]))
+    # Amostras atrasadas na virada de hora, no fim de hora e dentro da lacuna
+    ingest_batch(db, _batch([600, 718]))
+    ingest_batch(db, _batch([1440 + 650, 2879]))
+    partial = _snapshot(db)
+
+    energy_accumulator.rebuild(db, 1)
+    efficiency_accumulator.rebuild(db, 1)
+    measurement_stats.rebuild(db, 1)
+    db.commit()
+    full = _snapshot(db)
+
+    assert len(partial[0]) == len(full[0])
+    for partial_rows, full_rows in zip(partial, full):
+        for partial_row, full_row in zip(partial_rows, full_rows):
+            assert partial_row[0] == full_row[0]
+            assert partial_row[1:] == pytest.approx(full_row[1:])
+
+
+def test_sparse_replay_rebuilds_only_touched_hours(db, monkeypatch):
+    """Amostras esparsas recalculam só as horas e dias que as receberam"""
+    day = [minute for minute in range(2, 3 * 1440, 5)]
+    ingest_batch(db, _batch(day))
+
+    calls = {"energy": [], "daily": []}
+    for name, accumulator in (("energy", energy_accumulator), ("daily", measurement_stats)):
+        rebuild = accumulator.rebuild
+        monkeypatch.setattr(
+            accumulator, "rebuild",
+            lambda db, inverter_id, start=None, end=None, _name=name, _rebuild=rebuild:
+                calls[_name].append((start, end)) or _rebuild(db, inverter_id, start, end)
+        )
+
+    ingest_batch(db, _batch([60, 63, 3 * 1440 - 1]))
+    assert calls["energy"] == [
+        (START + timedelta(minutes=60), START + timedelta(minutes=63)),
+        (START + timedelta(minutes=3 * 1440 - 1),) * 2,
+    ]
+    assert calls["daily"] == [
+        (START + timedelta(minutes=60), START + timedelta(minutes=63)),
+        (START + timedelta(minutes=3 * 1440 - 1),) * 2,
+    ]
+
+    partial = _snapshot(db)
+    monkeypatch.undo()
+    energy_accumulator.rebuild(db, 1)
+    efficiency_accumulator.rebuild(db, 1)
+    measurement_stats.rebuild(db, 1)
+    db.commit()
+    full = _snapshot(db)
+    for partial_rows, full_rows in zip(partial, full):
+        assert len(partial_rows) == len(full_rows)
+        for partial_row, full_row in zip(partial_rows, full_rows):
+            assert partial_row[0] == full_row[0]
+            assert partial_row[1:] == pytest.approx(full_row[1:])
+
+
+def test_gap_hours_have_no_rows(db):
+    """Uma parada longa não grava linhas horárias vazias"""
+    ingest_batch(db, _batch([600, 601, 602, 600 + 7 * 1440, 601 + 7 * 1440]))
+    hours = [row.hour for row in db.query(HourlyEnergySummary).order_by(HourlyEnergySummary.hour)]
+    assert hours == [START + timedelta(hours=10), START + timedelta(days=7, hours=10)]
+    gap_row = db.query(HourlyEnergySummary).filter(HourlyEnergySummary.hour == hours[-1]).one()
+    assert gap_row.gap_count == 1
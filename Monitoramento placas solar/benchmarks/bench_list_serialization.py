@@ -0,0 +1,137 @@
+"""
+Benchmark da serialização de listagens de medições
+
+Compara, numa requisição completa (FastAPI + TestClient), o caminho antigo
+(objetos ORM validados com response_model e json.dumps) com o caminho
+atual (colunas selecionadas e serializadas direto das linhas com orjson).
+
+Uso:
+    python benchmarks/bench_list_serialization.py --rows 1000 10000
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import datetime, timedelta
+from typing import List
+
+# Adicionar o diretório do projeto ao path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi import Depends, FastAPI, Query
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from backend.models import Base, Inverter, InverterMeasurement
+from backend.schemas.data_schemas import MeasurementResponse
+from backend.services.fast_json import SchemaColumns, orjson_available, rows_response
+
+
+def create_sessionmaker(rows: int):
+    """Criar banco SQLite em memória com medições sintéticas"""
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(bind=engine)
+    db = SessionLocal()
+    db.add(Inverter(serial_number="BENCH", model="bench", rated_power=3000))
+    db.commit()
+
+    start = datetime.utcnow() - timedelta(minutes=rows)
+    db.execute(InverterMeasurement.__table__.insert(), [
+        {
+            "inverter_id": 1,
+            "timestamp": start + timedelta(minutes=i),
+            "power_output": 1500.0 + i % 700,
+            "energy_daily": i / 60.0,
+            "energy_total": 1000.0 + i / 60.0,
+            "voltage_dc": 380.5,
+            "current_dc": 4.2,
+            "voltage_ac": 220.1,
+            "current_ac": 6.8,
+            "frequency": 60.0,
+            "temperature": 35.5,
+            "efficiency": 96.3,
+            "status_code": 1,
+            "fault_code": 0,
+            "uptime": i
+        }
+        for i in range(rows)
+    ])
+    db.commit()
+    db.close()
+    return SessionLocal
+
+
+def create_app(SessionLocal) -> FastAPI:
+    """Mesmo endpoint nas duas implementações"""
+    app = FastAPI()
+    columns = SchemaColumns(InverterMeasurement, MeasurementResponse)
+
+    def get_db():
+        db = SessionLocal()
+        try:
+            yield db
+        finally:
+            db.close()
+
+    @app.get("/legacy", response_model=List[MeasurementResponse])
+    async def legacy(limit: int = Query(1000), db: Session = Depends(get_db)):
+        return db.query(InverterMeasurement)\
+            .order_by(InverterMeasurement.timestamp.desc(), InverterMeasurement.id.desc())\
+            .limit(limit)\
+            .all()
+
+    @app.get("/fast", response_model=List[MeasurementResponse])
+    async def fast(limit: int = Query(1000), db: Session = Depends(get_db)):
+        rows = columns.query(db)\
+            .order_by(InverterMeasurement.timestamp.desc(), InverterMeasurement.id.desc())\
+            .limit(limit)\
+            .all()
+        return rows_response(columns, rows)
+
+    return app
+
+
+def measure(client: TestClient, url: str, repeat: int) -> float:
+    """Mediana da latência (ms) de `repeat` requisições"""
+    client.get(url)  # aquecimento
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        response = client.get(url)
+        timings.append((time.perf_counter() - started) * 1000)
+        response.raise_for_status()
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    print(f"orjson disponível: {orjson_available()}\n")
+    print(f"{'linhas':>8} {'ORM + Pydantic':>16} {'linhas + orjson':>16} {'ganho':>8}")
+    for rows in args.rows:
+        client = TestClient(create_app(create_sessionmaker(rows)))
+
+        # As duas respostas devem ser idênticas
+        legacy_body = client.get(f"/legacy?limit={rows}").json()
+        fast_body = client.get(f"/fast?limit={rows}").json()
+        assert legacy_body == fast_body, "respostas diferentes"
+
+        legacy = measure(client, f"/legacy?limit={rows}", args.repeat)
+        fast = measure(client, f"/fast?limit={rows}", args.repeat)
+        print(f"{rows:>8} {legacy:>13.1f} ms {fast:>13.1f} ms {legacy / fast:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Benchmark da análise de produção (/analytics/production-analysis)
+
+Compara o caminho antigo (carregar todas as medições como objetos ORM e
+agregar com pandas) com a agregação diária feita no banco (GROUP BY data
+nas medições + resumos horários de energia).
+
+Uso:
+    python benchmarks/bench_production_analysis.py --days 365
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+import tracemalloc
+from datetime import datetime, timedelta
+
+# Adicionar o diretório do projeto ao path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pandas as pd
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from backend.models import Base, Inverter, InverterMeasurement
+from backend.routers.analytics_router import get_production_analysis
+from backend.services.energy_accumulator import energy_accumulator
+
+
+def create_session(days: int, interval_seconds: int):
+    """Criar banco SQLite em memória com medições sintéticas"""
+    engine = create_engine(
+        "sqlite://",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool
+    )
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(bind=engine)
+    db = Session()
+
+    db.add(Inverter(serial_number="BENCH", model="bench", rated_power=3000))
+    db.commit()
+
+    now = datetime.utcnow()
+    timestamp = now - timedelta(days=days)
+    step = timedelta(seconds=interval_seconds)
+    energy = 0.0
+    batch = []
+    while timestamp < now:
+        hour = timestamp.hour + timestamp.minute / 60
+        power = max(0.0, 3000 * (1 - ((hour - 12) / 6) ** 2))
+        if hour < 0.01:
+            energy = 0.0
+        energy += power * interval_seconds / 3600 / 1000
+        batch.append({
+            "inverter_id": 1,
+            "timestamp": timestamp,
+            "power_output": power,
+            "energy_daily": energy,
+            "temperature": 25 + power / 200,
+            "efficiency": 95.0 if power > 0 else 0.0,
+            "status_code": 1,
+            "fault_code": 0
+        })
+        if len(batch) >= 50000:
+            db.execute(InverterMeasurement.__table__.insert(), batch)
+            batch = []
+        timestamp += step
+    if batch:
+        db.execute(InverterMeasurement.__table__.insert(), batch)
+    db.commit()
+
+    # Resumos horários que a ingestão manteria
+    energy_accumulator.rebuild(db, 1)
+    db.commit()
+    return db
+
+
+def legacy_production_analysis(db, days: int):
+    """Implementação anterior: objetos ORM + DataFrame"""
+    start_date = datetime.utcnow() - timedelta(days=days)
+    measurements = db.query(InverterMeasurement)\
+        .filter(InverterMeasurement.timestamp >= start_date)\
+        .order_by(InverterMeasurement.timestamp.asc())\
+        .all()
+
+    data = []
+    for m in measurements:
+        if m.power_output is not None and m.energy_daily is not None:
+            data.append({
+                'timestamp': m.timestamp,
+                'power': m.power_output,
+                'energy': m.energy_daily,
+                'temperature': m.temperature or 0,
+                'efficiency': m.efficiency or 0
+            })
+
+    df = pd.DataFrame(data)
+    df['date'] = pd.to_datetime(df['timestamp']).dt.date
+    daily = df.groupby('date')['power'].agg(['max', 'mean', 'count']).reset_index()
+    return {
+        "total_energy": round(df['energy'].max() - df['energy'].min(), 2),
+        "peak_power": round(df['power'].max(), 2),
+        "average_power": round(df['power'].mean(), 2),
+        "average_daily_energy": round(daily['max'].mean(), 2),
+        "operating_hours": round(len(df[df['power'] > 0]) / 60, 1)
+    }
+
+
+def measure(label: str, func):
+    """Executar função medindo tempo e pico de memória"""
+    tracemalloc.start()
+    started = time.perf_counter()
+    result = func()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<28} {elapsed * 1000:>10.1f} ms {peak / 1024 / 1024:>10.2f} MiB")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--interval", type=int, default=60, help="intervalo de amostragem (s)")
+    args = parser.parse_args()
+
+    print(f"Gerando {args.days} dias de medições a cada {args.interval}s...")
+    db = create_session(args.days, args.interval)
+    total = db.query(InverterMeasurement).count()
+    print(f"{total} medições\n")
+
+    print(f"{'implementação':<28} {'latência':>13} {'pico memória':>14}")
+    legacy = measure("ORM + pandas (anterior)", lambda: legacy_production_analysis(db, args.days))
+    db.expunge_all()
+    current = measure(
+        "GROUP BY data (SQL)",
+        lambda: asyncio.run(get_production_analysis(days=args.days, inverter_id=None, db=db))
+    )
+
+    print("\nResultados:")
+    print(f"  anterior: {legacy}")
+    print(f"  atual:    {current.model_dump()}")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -5,9 +5,10 @@ Este script roda no local do equipamento e envia dados para a nuvem
 
 import asyncio
 import aiohttp
+import gzip
 import json
 import time
-from datetime import datetime
+from datetime import datetime, timezone
 import sys
 import os
 
@@ -24,6 +25,14 @@ class RemoteCollector:
         self.cloud_api_url = cloud_api_url
         self.collection_interval = 60  # segundos
         self.running = False
+        self.site = "solar_farm_1"  # Identificar localização
+        self.device = EQUIPMENT_CONFIG["inverter"]["serial_number"]
+        self.api_key = os.getenv("INGEST_API_KEY", "")
+        
+        # Amostras aguardando envio (enviadas em lote; reenvio é seguro)
+        self.batch_size = settings.REMOTE_BATCH_SIZE
+        self.max_pending = 10000
+        self.pending = []
         
     async def collect_solar_data(self):
         """Coletar dados do sistema solar via Modbus"""
@@ -40,10 +49,10 @@ class RemoteCollector:
             await client.disconnect()
             
             return {
-                "timestamp": datetime.now().isoformat(),
+                "timestamp": datetime.now(timezone.utc).isoformat(),
                 "inverter": inverter_data,
                 "logger": logger_data,
-                "location": "solar_farm_1"  # Identificar localização
+                "location": self.site
             }
             
         except Exception as e:
@@ -82,18 +91,43 @@ class RemoteCollector:
                 
         return logger_data
     
-    async def send_to_cloud(self, data):
-        """Enviar dados para API na nuvem"""
+    @staticmethod
+    def to_utc(timestamp):
+        """Timestamp ISO em UTC; sem fuso (backups antigos) é hora local desta máquina"""
+        parsed = datetime.fromisoformat(timestamp)
+        return parsed.astimezone(timezone.utc).isoformat()
+    
+    def to_sample(self, data):
+        """Converter uma coleta na amostra aceita pela ingestão em lote
+        
+        O site ("location") fica só no backup local: o servidor identifica o
+        inversor pelo número de série e descarta o campo.
+        """
+        return {
+            "device": self.device,
+            "timestamp": self.to_utc(data["timestamp"]),
+            **data["inverter"]
+        }
+    
+    async def send_to_cloud(self, samples):
+        """Enviar um lote de amostras para API na nuvem (NDJSON com gzip)"""
+        body = gzip.compress("\n".join(json.dumps(sample) for sample in samples).encode("utf-8"))
+        headers = {"Content-Type": "application/x-ndjson", "Content-Encoding": "gzip"}
+        if self.api_key:
+            headers["X-API-Key"] = self.api_key
+        
         try:
             async with aiohttp.ClientSession() as session:
                 async with session.post(
-                    f"{self.cloud_api_url}/solar-data",
-                    json=data,
-                    headers={"Content-Type": "application/json"},
-                    timeout=aiohttp.ClientTimeout(total=30)
+                    f"{self.cloud_api_url}/v1/data/ingest",
+                    data=body,
+                    headers=headers,
+                    timeout=aiohttp.ClientTimeout(total=60)
                 ) as response:
                     if response.status == 200:
-                        print(f"✅ Dados enviados: {data['timestamp']}")
+                        result = await response.json()
+                        print(f"✅ Lote enviado: {result['inserted']} novas, "
+                              f"{result['duplicates']} repetidas, {result['rejected']} rejeitadas")
                         return True
                     else:
                         print(f"❌ Erro ao enviar: {response.status}")
@@ -102,6 +136,29 @@ class RemoteCollector:
             print(f"❌ Erro de conexão com nuvem: {e}")
             return False
     
+    async def flush_pending(self):
+        """Enviar as amostras pendentes; mantidas para nova tentativa em caso de falha"""
+        if not self.pending:
+            return True
+        if await self.send_to_cloud(self.pending):
+            self.pending = []
+            return True
+        # Limitar a memória: as mais antigas continuam no backup local
+        self.pending = self.pending[-self.max_pending:]
+        return False
+    
+    async def replay_backups(self, paths, batch_size=5000):
+        """Reenviar arquivos de backup local (amostras já recebidas são ignoradas pela nuvem)"""
+        for path in paths:
+            with open(path) as f:
+                samples = [self.to_sample(json.loads(line)) for line in f if line.strip()]
+            print(f"📂 {path}: {len(samples)} amostras")
+            for start in range(0, len(samples), batch_size):
+                if not await self.send_to_cloud(samples[start:start + batch_size]):
+                    print(f"❌ Reenvio interrompido em {path}")
+                    return False
+        return True
+    
     async def save_local_backup(self, data):
         """Salvar backup local dos dados"""
         try:
@@ -131,13 +188,15 @@ class RemoteCollector:
                     # Salvar backup local
                     await self.save_local_backup(data)
                     
-                    # Enviar para nuvem
-                    success = await self.send_to_cloud(data)
-                    
-                    if success:
-                        print(f"📊 Dados coletados e enviados: {data['timestamp']}")
-                    else:
-                        print("⚠️  Dados coletados mas não enviados (salvos localmente)")
+                    # Enviar para nuvem em lotes
+                    self.pending.append(self.to_sample(data))
+                    if len(self.pending) >= self.batch_size:
+                        success = await self.flush_pending()
+                        
+                        if success:
+                            print(f"📊 Dados coletados e enviados: {data['timestamp']}")
+                        else:
+                            print(f"⚠️  {len(self.pending)} amostras pendentes (salvas localmente)")
                 else:
                     print("❌ Falha na coleta de dados")
                 
@@ -172,6 +231,8 @@ class RemoteCollector:
         """Parar o coletor"""
         self.running = False
         print("🛑 Parando coletor...")
+        if self.pending:
+            print(f"⚠️  {len(self.pending)} amostras não enviadas (use --replay com os backups)")
 
 # Configurações para diferentes ambientes
 CLOUD_ENDPOINTS = {
@@ -189,12 +250,22 @@ async def main():
                        default="development", help="Ambiente de deploy")
     parser.add_argument("--interval", type=int, default=60, 
                        help="Intervalo de coleta em segundos")
+    parser.add_argument("--batch-size", type=int, default=None,
+                       help="Amostras por lote enviado")
+    parser.add_argument("--replay", nargs="+", metavar="ARQUIVO",
+                       help="Reenviar arquivos de backup local e sair")
     
     args = parser.parse_args()
     
     # Configurar coletor
     collector = RemoteCollector(CLOUD_ENDPOINTS[args.env])
     collector.collection_interval = args.interval
+    if args.batch_size:
+        collector.batch_size = args.batch_size
+    
+    if args.replay:
+        await collector.replay_backups(args.replay)
+        return
     
     try:
         await collector.start()
@@ -212,6 +283,7 @@ if __name__ == "__main__":
     print("Para usar:")
     print("  python remote_collector.py --env development")
     print("  python remote_collector.py --env production --interval 30")
+    print("  python remote_collector.py --env production --replay backups/solar_data_*.json")
     print("=" * 50)
     
     asyncio.run(main())